@@ -0,0 +1,16 @@
+import tempfile
+
+import pytest
+from django.conf import settings
+from django.test import override_settings
+
+from core.test_runner import temporary_caches
+
+
+@pytest.fixture(autouse=True, scope='session')
+def temporary_cache_files():
+    with tempfile.TemporaryDirectory() as temp_directory:
+        with override_settings(
+            CACHES=temporary_caches(settings.CACHES, temp_directory)
+        ):
+            yield temp_directory
@@ -0,0 +1,139 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from posts.views import POST_DISPLAY
+
+MAX_LIMIT = 100
+
+
+class InvalidQuery(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """В отличие от DjangoJSONEncoder не обрезает микросекунды, иначе
+    посты, созданные в одну миллисекунду, выпадали бы из ленты."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor, model, names):
+    """Восстанавливает значения ключей сортировки из курсора."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(names):
+            raise ValueError
+        return [model._meta.get_field(name).to_python(value)
+                for name, value in zip(names, values)]
+    except (ValueError, TypeError, binascii.Error, ValidationError):
+        raise InvalidQuery('Некорректный курсор.')
+
+
+def keyset_filter(ordering, values):
+    """Условие "строго после" для сортировки по нескольким полям.
+
+    Для ('-pub_date', '-id') это pub_date < x OR (pub_date = x AND id < y),
+    что позволяет листать ленту по индексу без OFFSET.
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = '{}__{}'.format(name, 'lt' if field.startswith('-') else 'gt')
+        step = Q(**{lookup: values[index]})
+        for previous, value in zip(ordering[:index], values[:index]):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def parse_fields(param, fields):
+    """Список запрошенных в fields= полей; по умолчанию - все."""
+    if not param:
+        return list(fields)
+    names = [name.strip() for name in param.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise InvalidQuery(
+            'Неизвестные поля: {}.'.format(', '.join(unknown))
+        )
+    return names
+
+
+def parse_limit(param):
+    if not param:
+        return POST_DISPLAY
+    try:
+        limit = int(param)
+    except ValueError:
+        raise InvalidQuery('limit должен быть числом.')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+class Projection:
+    """Выборка только нужных колонок и сериализация из строк values().
+
+    fields сопоставляет имя поля в API с путём в ORM. Пути через связи
+    ('author__username') разворачиваются в JOIN того же запроса, так что
+    автор и группа подтягиваются без отдельных запросов и без создания
+    экземпляров моделей. converters преобразуют сырые значения колонок.
+    """
+
+    def __init__(self, fields, ordering, converters=None):
+        self.fields = fields
+        self.ordering = ordering
+        self.order_names = [field.lstrip('-') for field in ordering]
+        self.converters = converters or {}
+
+    def lookups(self, names):
+        return {self.fields[name] for name in names} | set(self.order_names)
+
+    def serialize(self, row, names):
+        result = {}
+        for name in names:
+            value = row[self.fields[name]]
+            converter = self.converters.get(name)
+            result[name] = converter(value) if converter else value
+        return result
+
+    def get(self, queryset, request):
+        """Одна запись в виде словаря или None."""
+        names = parse_fields(request.GET.get('fields'), self.fields)
+        row = queryset.values(*self.lookups(names)).first()
+        return None if row is None else self.serialize(row, names)
+
+    def page(self, queryset, request):
+        """Страница с курсорной пагинацией по self.ordering."""
+        names = parse_fields(request.GET.get('fields'), self.fields)
+        limit = parse_limit(request.GET.get('limit'))
+        cursor = request.GET.get('cursor')
+        if cursor:
+            values = decode_cursor(cursor, queryset.model, self.order_names)
+            queryset = queryset.filter(keyset_filter(self.ordering, values))
+        rows = list(
+            queryset.order_by(*self.ordering)
+            .values(*self.lookups(names))[:limit + 1]
+        )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(
+                [rows[-1][name] for name in self.order_names]
+            )
+        return {
+            'results': [self.serialize(row, names) for row in rows],
+            'next': next_cursor,
+        }
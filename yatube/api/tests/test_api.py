@@ -0,0 +1,191 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+POSTS_COUNT = 15
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {i}')
+            for i in range(POSTS_COUNT)
+        ]
+        cls.POST_LIST_URL = reverse('api:post_list')
+        cls.FOLLOW_LIST_URL = reverse('api:follow_list')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(ApiTests.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(ApiTests.reader)
+
+    def send_json(self, client, method, url, data):
+        return getattr(client, method)(url, json.dumps(data),
+                                       content_type='application/json')
+
+    def test_cursor_pagination_walks_all_posts(self):
+        """Курсор проходит все посты без пропусков и повторов."""
+        ids = []
+        params = {'limit': 4}
+        while True:
+            data = self.guest_client.get(ApiTests.POST_LIST_URL,
+                                         params).json()
+            ids.extend(post['id'] for post in data['results'])
+            if not data['next']:
+                break
+            params['cursor'] = data['next']
+        self.assertEqual(ids, [post.id for post in reversed(ApiTests.posts)])
+
+    def test_fields_projection(self):
+        """fields= оставляет только запрошенные поля, в том числе связанные."""
+        response = self.guest_client.get(ApiTests.POST_LIST_URL,
+                                         {'fields': 'id,author,group'})
+        post = response.json()['results'][0]
+        self.assertEqual(set(post), {'id', 'author', 'group'})
+        self.assertEqual(post['author'], ApiTests.author.username)
+        self.assertEqual(post['group'], ApiTests.group.slug)
+
+    def test_feed_page_is_one_query(self):
+        """Страница ленты с автором и группой - один запрос."""
+        with self.assertNumQueries(1):
+            self.guest_client.get(ApiTests.POST_LIST_URL)
+
+    def test_invalid_query(self):
+        """Неизвестное поле и битый курсор дают 400."""
+        for params in ({'fields': 'password'}, {'cursor': '!!!'}):
+            with self.subTest(params=params):
+                response = self.guest_client.get(ApiTests.POST_LIST_URL,
+                                                 params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_create_post(self):
+        """Авторизованный пользователь создаёт пост, гость - нет."""
+        data = {'text': 'Новый пост', 'group': ApiTests.group.slug}
+        response = self.send_json(self.guest_client, 'post',
+                                  ApiTests.POST_LIST_URL, data)
+        self.assertEqual(response.status_code, 401)
+        response = self.send_json(self.reader_client, 'post',
+                                  ApiTests.POST_LIST_URL, data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['author'], ApiTests.reader.username)
+        self.assertTrue(Post.objects.filter(text='Новый пост',
+                                            group=ApiTests.group).exists())
+
+    def test_only_author_edits_and_deletes_post(self):
+        """Править и удалять пост может только автор."""
+        post = ApiTests.posts[0]
+        url = reverse('api:post_detail', args=[post.id])
+        response = self.send_json(self.reader_client, 'patch', url,
+                                  {'text': 'Чужая правка'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.reader_client.delete(url).status_code, 403)
+        response = self.send_json(self.author_client, 'patch', url,
+                                  {'text': 'Правка автора'})
+        self.assertEqual(response.status_code, 200)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка автора')
+        self.assertEqual(post.group, ApiTests.group)
+
+    def test_author_deletes_post(self):
+        """Автор удаляет свой пост."""
+        post = Post.objects.create(author=ApiTests.author,
+                                   group=ApiTests.group, text='Удаляемый')
+        url = reverse('api:post_detail', args=[post.id])
+        self.assertEqual(self.author_client.delete(url).status_code, 204)
+        self.assertFalse(Post.objects.filter(pk=post.id).exists())
+        self.assertEqual(self.author_client.get(url).status_code, 404)
+
+    def test_form_encoded_patch(self):
+        """PATCH принимает и обычную форму, другие типы тела - нет."""
+        post = ApiTests.posts[1]
+        url = reverse('api:post_detail', args=[post.id])
+        response = self.author_client.patch(
+            url, 'text=%D0%9F%D1%80%D0%B0%D0%B2%D0%BA%D0%B0',
+            content_type='application/x-www-form-urlencoded',
+        )
+        self.assertEqual(response.status_code, 200)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Правка')
+        response = self.author_client.patch(url, 'text=Правка',
+                                            content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+
+    def test_comments(self):
+        """Комментарии создаются и выводятся списком."""
+        post = ApiTests.posts[0]
+        url = reverse('api:comment_list', args=[post.id])
+        response = self.send_json(self.reader_client, 'post', url,
+                                  {'text': 'Комментарий'})
+        self.assertEqual(response.status_code, 201)
+        results = self.guest_client.get(url).json()['results']
+        self.assertEqual([comment['text'] for comment in results],
+                         ['Комментарий'])
+        self.assertEqual(Comment.objects.get().author, ApiTests.reader)
+        response = self.guest_client.get(
+            reverse('api:comment_list', args=[0])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_rules(self):
+        """Подписка идемпотентна, на себя подписаться нельзя."""
+        data = {'author': ApiTests.author.username}
+        response = self.send_json(self.reader_client, 'post',
+                                  ApiTests.FOLLOW_LIST_URL, data)
+        self.assertEqual(response.status_code, 201)
+        response = self.send_json(self.reader_client, 'post',
+                                  ApiTests.FOLLOW_LIST_URL, data)
+        self.assertEqual(response.status_code, 200)
+        response = self.send_json(self.author_client, 'post',
+                                  ApiTests.FOLLOW_LIST_URL, data)
+        self.assertEqual(response.status_code, 400)
+        results = self.reader_client.get(
+            ApiTests.FOLLOW_LIST_URL
+        ).json()['results']
+        self.assertEqual([follow['author'] for follow in results],
+                         [ApiTests.author.username])
+        response = self.reader_client.delete(
+            reverse('api:follow_detail', args=[ApiTests.author.username])
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_groups(self):
+        """Список групп доступен гостю."""
+        response = self.guest_client.get(reverse('api:group_list'))
+        self.assertEqual(response.json()['results'][0]['slug'],
+                         ApiTests.group.slug)
+
+    def test_follow_batch(self):
+        """Пакетная подписка: свои пары - можно, чужие - только staff."""
+        url = reverse('api:follow_batch')
+        own = {'follow': [['reader', 'author']]}
+        response = self.send_json(self.reader_client, 'post', url, own)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['follow']['changed'], 1)
+        response = self.send_json(self.reader_client, 'post', url, own)
+        self.assertEqual(response.json()['follow']['changed'], 0)
+        foreign = {'follow': [['author', 'reader']]}
+        response = self.send_json(self.reader_client, 'post', url, foreign)
+        self.assertEqual(response.status_code, 403)
+        response = self.send_json(self.reader_client, 'post', url,
+                                  {'unfollow': [['reader', 'author']]})
+        self.assertEqual(response.json()['unfollow']['changed'], 1)
+        self.assertFalse(Follow.objects.exists())
@@ -0,0 +1,19 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.PostListView.as_view(), name='post_list'),
+    path('posts/<int:post_id>/', views.PostDetailView.as_view(),
+         name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.CommentListView.as_view(),
+         name='comment_list'),
+    path('groups/', views.GroupListView.as_view(), name='group_list'),
+    path('follows/', views.FollowListView.as_view(), name='follow_list'),
+    path('follow-batch/', views.FollowBatchView.as_view(),
+         name='follow_batch'),
+    path('follows/<str:username>/', views.FollowDetailView.as_view(),
+         name='follow_detail'),
+]
@@ -0,0 +1,276 @@
+import json
+from functools import wraps
+
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, JsonResponse, QueryDict
+from django.shortcuts import get_object_or_404
+from django.views import View
+
+from posts.follows import bulk_follow, bulk_unfollow, follow
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Follow, Group, Post, User
+from .query import InvalidQuery, Projection
+
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+FOLLOW_BATCH_LIMIT = 10000
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+POSTS = Projection(
+    fields={
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+        'author': 'author__username',
+        'group': 'group__slug',
+    },
+    ordering=('-pub_date', '-id'),
+    converters={'image': image_url},
+)
+COMMENTS = Projection(
+    fields={
+        'id': 'id',
+        'text': 'text',
+        'created': 'created',
+        'author': 'author__username',
+        'post': 'post_id',
+    },
+    ordering=('id',),
+)
+GROUPS = Projection(
+    fields={
+        'id': 'id',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    },
+    ordering=('id',),
+)
+FOLLOWS = Projection(
+    fields={
+        'id': 'id',
+        'user': 'user__username',
+        'author': 'author__username',
+    },
+    ordering=('-id',),
+)
+
+
+def api_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def api_error(status, detail):
+    return api_response({'detail': detail}, status=status)
+
+
+def login_required(method):
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return api_error(401, 'Требуется авторизация.')
+        return method(self, request, *args, **kwargs)
+    return wrapper
+
+
+class UnsupportedMediaType(Exception):
+    pass
+
+
+def request_data(request):
+    """Тело запроса: JSON или обычная форма. Форму в PATCH и PUT Django
+    сам не разбирает (request.POST пуст), поэтому её тело читается
+    здесь; другие типы тела у них не принимаются."""
+    if request.content_type != 'application/json':
+        if request.method == 'POST':
+            return request.POST.dict()
+        if not request.body:
+            return {}
+        if request.content_type != FORM_CONTENT_TYPE:
+            raise UnsupportedMediaType(
+                'Ожидается JSON или {}.'.format(FORM_CONTENT_TYPE)
+            )
+        return QueryDict(request.body, encoding=request.encoding).dict()
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise InvalidQuery('Некорректный JSON.')
+    if not isinstance(data, dict):
+        raise InvalidQuery('Ожидается JSON-объект.')
+    return data
+
+
+def post_form_data(data, post=None):
+    """Данные для PostForm: группа в API задаётся слагом, а не id."""
+    form_data = {}
+    if post is not None:
+        form_data = {'text': post.text, 'group': post.group_id}
+    form_data.update(data)
+    slug = form_data.get('group')
+    if slug and isinstance(slug, str):
+        group_id = (Group.objects.filter(slug=slug)
+                    .values_list('id', flat=True).first())
+        form_data['group'] = group_id or slug
+    return form_data
+
+
+class ApiView(View):
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except InvalidQuery as error:
+            return api_error(400, str(error))
+        except UnsupportedMediaType as error:
+            return api_error(415, str(error))
+        except Http404:
+            return api_error(404, 'Не найдено.')
+
+
+class PostListView(ApiView):
+    def get(self, request):
+        posts = Post.objects.all()
+        if 'group' in request.GET:
+            posts = posts.filter(group__slug=request.GET['group'])
+        if 'author' in request.GET:
+            posts = posts.filter(author__username=request.GET['author'])
+        return api_response(POSTS.page(posts, request))
+
+    @login_required
+    def post(self, request):
+        form = PostForm(post_form_data(request_data(request)),
+                        request.FILES or None)
+        if not form.is_valid():
+            return api_response({'errors': form.errors}, status=400)
+        form.instance.author = request.user
+        post = form.save()
+        return api_response(
+            POSTS.get(Post.objects.filter(pk=post.pk), request), status=201
+        )
+
+
+class PostDetailView(ApiView):
+    def get(self, request, post_id):
+        post = POSTS.get(Post.objects.filter(pk=post_id), request)
+        if post is None:
+            raise Http404
+        return api_response(post)
+
+    @login_required
+    def patch(self, request, post_id):
+        post = get_object_or_404(Post, pk=post_id)
+        if not post.is_editable_by(request.user):
+            return api_error(403, 'Редактировать пост может только автор.')
+        form = PostForm(post_form_data(request_data(request), post),
+                        instance=post)
+        if not form.is_valid():
+            return api_response({'errors': form.errors}, status=400)
+        form.save()
+        return api_response(POSTS.get(Post.objects.filter(pk=post.pk),
+                                      request))
+
+    @login_required
+    def delete(self, request, post_id):
+        post = get_object_or_404(Post, pk=post_id)
+        if not post.is_editable_by(request.user):
+            return api_error(403, 'Удалить пост может только автор.')
+        post.delete()
+        return HttpResponse(status=204)
+
+
+class CommentListView(ApiView):
+    def get(self, request, post_id):
+        if not Post.objects.filter(pk=post_id).exists():
+            raise Http404
+        comments = Comment.objects.filter(post_id=post_id)
+        return api_response(COMMENTS.page(comments, request))
+
+    @login_required
+    def post(self, request, post_id):
+        if not Post.objects.filter(pk=post_id).exists():
+            raise Http404
+        form = CommentForm(request_data(request))
+        if not form.is_valid():
+            return api_response({'errors': form.errors}, status=400)
+        form.instance.post_id = post_id
+        form.instance.author = request.user
+        comment = form.save()
+        return api_response(
+            COMMENTS.get(Comment.objects.filter(pk=comment.pk), request),
+            status=201,
+        )
+
+
+class GroupListView(ApiView):
+    def get(self, request):
+        return api_response(GROUPS.page(Group.objects.all(), request))
+
+
+class FollowListView(ApiView):
+    @login_required
+    def get(self, request):
+        follows = Follow.objects.filter(user=request.user)
+        return api_response(FOLLOWS.page(follows, request))
+
+    @login_required
+    def post(self, request):
+        username = request_data(request).get('author')
+        author = get_object_or_404(User, username=username)
+        if not Follow.can_follow(request.user, author):
+            return api_error(400, 'Нельзя подписаться на самого себя.')
+        follows = Follow.objects.filter(user=request.user, author=author)
+        # сама подписка - одиночный INSERT без гонки (posts.follows),
+        # проверка нужна только для кода ответа
+        created = not follows.exists()
+        follow(request.user, author)
+        return api_response(FOLLOWS.get(follows, request),
+                            status=201 if created else 200)
+
+
+class FollowDetailView(ApiView):
+    @login_required
+    def delete(self, request, username):
+        Follow.objects.filter(user=request.user,
+                              author__username=username).delete()
+        return HttpResponse(status=204)
+
+
+def parse_pairs(value):
+    if not isinstance(value, list) or not all(
+        isinstance(pair, list) and len(pair) == 2
+        and all(isinstance(name, str) for name in pair)
+        for pair in value
+    ):
+        raise InvalidQuery('Ожидается список пар [подписчик, автор].')
+    return [tuple(pair) for pair in value]
+
+
+class FollowBatchView(ApiView):
+    """Идемпотентная пакетная подписка и отписка.
+
+    Принимает {"follow": [[user, author], ...], "unfollow": [...]}.
+    Обычный пользователь может менять только свои подписки, staff - любые.
+    """
+
+    @login_required
+    def post(self, request):
+        data = request_data(request)
+        follow = parse_pairs(data.get('follow', []))
+        unfollow = parse_pairs(data.get('unfollow', []))
+        if len(follow) + len(unfollow) > FOLLOW_BATCH_LIMIT:
+            return api_error(
+                400, 'Не больше {} пар за запрос.'.format(FOLLOW_BATCH_LIMIT)
+            )
+        username = request.user.get_username()
+        if not request.user.is_staff and any(
+            user != username for user, _ in follow + unfollow
+        ):
+            return api_error(403, 'Можно менять только свои подписки.')
+        return api_response({
+            'follow': bulk_follow(follow).as_dict(),
+            'unfollow': bulk_unfollow(unfollow).as_dict(),
+        })
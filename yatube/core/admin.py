@@ -0,0 +1,39 @@
+from django.contrib import admin
+
+from .models import Job, OutboxMessage
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'priority',
+        'attempts',
+        'run_at',
+        'locked_by',
+    )
+    search_fields = ('name', 'dedup_key')
+    list_filter = ('status', 'name')
+    readonly_fields = ('locked_by', 'locked_until', 'last_error',
+                       'created', 'finished')
+
+
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'subject',
+        'to',
+        'status',
+        'attempts',
+        'created',
+        'sent',
+    )
+    search_fields = ('subject', 'to')
+    list_filter = ('status',)
+    readonly_fields = ('payload', 'claimed_by', 'claimed_until',
+                       'last_error', 'created', 'sent')
+
+
+admin.site.register(Job, JobAdmin)
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
@@ -3,3 +3,16 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks  # noqa: F401 (регистрирует проверки)
+        from . import query_cache, slow_queries, tracing
+
+        connection_created.connect(query_cache.install,
+                                   dispatch_uid='query_cache')
+        connection_created.connect(slow_queries.install,
+                                   dispatch_uid='slow_queries')
+        connection_created.connect(tracing.install, dispatch_uid='tracing')
+        tracing.instrument()
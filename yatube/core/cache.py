@@ -0,0 +1,827 @@
+"""Бэкенды кеша.
+
+TinyLFUCache - кеш в памяти процесса вместо LocMemCache. LocMemCache
+при переполнении MAX_ENTRIES выкидывает случайную треть записей и не
+смотрит на их размер, так что одна большая страница вытесняет много
+мелких горячих ключей. Здесь:
+
+- бюджет в байтах (MAX_BYTES) по размеру сериализованных значений;
+- записи лежат в LRU, но новый ключ вытесняет старые, только если
+  обращались к нему чаще, чем к ним (допуск TinyLFU: частоты считает
+  Count-Min sketch с 4-битными счётчиками, которые периодически
+  делятся пополам, чтобы старая популярность забывалась); add нового
+  ключа допуск не проходит: на нём построены блокировки, и отказ
+  в допуске выглядел бы как занятый замок;
+- попадания, промахи, вытеснения и отказы в допуске считаются по
+  префиксу ключа, а страница /admin/cache/ показывает эту статистику
+  и самые горячие ключи.
+
+SQLiteCache - общий для всех процессов хоста кеш. У LocMemCache
+и TinyLFUCache каждый воркер gunicorn держит свою копию, поэтому
+с ростом числа воркеров падает доля попаданий, а сброс кеша в одном
+процессе не виден другим. SQLiteCache хранит записи в одном файле SQLite
+в режиме WAL: читатели не блокируют друг друга и писателя, изменения
+сразу видны всем процессам, внешний сервис не нужен.
+
+- incr/add/set_many выполняются в транзакции BEGIN IMMEDIATE, поэтому
+  атомарны между процессами;
+- get_many/set_many - один запрос или одна транзакция на пачку ключей;
+- общий объём значений считают триггеры в таблице meta; когда он
+  превышает MAX_BYTES, сначала удаляются истёкшие записи, потом
+  давно не читанные (LRU) - до 90% бюджета. Время доступа обновляется
+  не чаще раза в TOUCH_INTERVAL секунд, чтобы чтения почти не писали
+  в файл.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_BYTES': 64 * 1024 * 1024},
+        }
+    }
+"""
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_LOCAL_MAX_BYTES = 16 * 1024 * 1024
+# счётчиков в строке sketch; частоты делятся пополам каждые
+# SKETCH_SAMPLE * ширина обращений
+DEFAULT_SKETCH_WIDTH = 4096
+SKETCH_DEPTH = 4
+SKETCH_SAMPLE = 10
+SKETCH_MAX = 15
+DEFAULT_L1_TIMEOUT = 30
+DEFAULT_POLL_INTERVAL = 0.1
+DEFAULT_MAX_LOG_BYTES = 1024 * 1024
+# префиксы ключей, которые Django склеивает без разделителя
+STATS_PREFIXES = (
+    'django.contrib.sessions.cached_db',
+    'views.decorators.cache.cache_page',
+    'views.decorators.cache.cache_header',
+    'template.cache',
+)
+DEFAULT_TOUCH_INTERVAL = 10
+# после вытеснения остаётся такая доля MAX_BYTES
+EVICT_TO = 0.9
+# ограничение SQLite на число параметров в запросе
+MAX_PARAMS = 900
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES ('bytes', 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE meta SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE meta SET value = value - OLD.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache
+BEGIN
+    UPDATE meta SET value = value - OLD.size + NEW.size
+    WHERE name = 'bytes';
+END;
+'''
+
+_local = threading.local()
+
+
+def connection(path):
+    """Соединение с файлом кеша для текущего потока и процесса: после
+    fork дочерний процесс открывает своё."""
+    if getattr(_local, 'pid', None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+    conn = _local.connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        # REPLACE удаляет старую строку - пусть это видят триггеры
+        conn.execute('PRAGMA recursive_triggers=ON')
+        conn.executescript(SCHEMA)
+        _local.connections[path] = conn
+    return conn
+
+
+def chunks(items, size=MAX_PARAMS):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def is_shared(cache):
+    """Видны ли записи cache всем процессам хоста. У бэкендов этого
+    модуля есть атрибут shared, бэкенды Django в памяти процесса
+    считаются локальными, остальные (memcached, база) - общими."""
+    return getattr(cache, 'shared',
+                   not isinstance(cache, (LocMemCache, DummyCache)))
+
+
+NO_CACHE = DummyCache('', {})
+
+
+def shared_cache(alias='default'):
+    """Кеш alias, если он общий для процессов хоста, иначе DummyCache.
+    Для данных, которые после изменения должны сразу разойтись по всем
+    воркерам: с кешем в памяти процесса они не кешируются вовсе, а не
+    расходятся между воркерами."""
+    from django.core.cache import caches
+    backend = caches[alias]
+    return backend if is_shared(backend) else NO_CACHE
+
+
+class SQLiteCache(BaseCache):
+    shared = True
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_bytes = options.get('MAX_BYTES', DEFAULT_MAX_BYTES)
+        self.touch_interval = options.get('TOUCH_INTERVAL',
+                                          DEFAULT_TOUCH_INTERVAL)
+
+    @property
+    def connection(self):
+        return connection(self.path)
+
+    @contextmanager
+    def write(self):
+        conn = self.connection
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def row(self, key, value, timeout, now):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return (key, data, self.get_backend_timeout(timeout),
+                len(data) + len(key), now)
+
+    def store(self, conn, rows):
+        conn.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires, size, '
+            'accessed) VALUES (?, ?, ?, ?, ?)', rows
+        )
+        self.evict(conn)
+
+    def evict(self, conn):
+        """Когда объём превышает MAX_BYTES, удаляет истёкшие, а затем самые
+        давно читанные записи, пока не останется EVICT_TO от бюджета -
+        запас, чтобы не вытеснять на каждой записи."""
+        if self.total(conn) <= self.max_bytes:
+            return
+        conn.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        overflow = self.total(conn) - int(self.max_bytes * EVICT_TO)
+        victims = []
+        for key, size in conn.execute(
+                'SELECT key, size FROM cache ORDER BY accessed'):
+            if overflow <= 0:
+                break
+            victims.append(key)
+            overflow -= size
+        for chunk in chunks(victims):
+            conn.execute('DELETE FROM cache WHERE key IN ({})'.format(
+                ', '.join('?' * len(chunk))), chunk)
+
+    def total(self, conn):
+        return conn.execute(
+            "SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+
+    def touch_stale(self, keys_accessed, now):
+        stale = [(now, key) for key, accessed in keys_accessed
+                 if now - accessed > self.touch_interval]
+        if stale:
+            self.connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', stale)
+
+    def get(self, key, default=None, version=None):
+        key = self.key(key, version)
+        row = self.connection.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return default
+        self.touch_stale([(key, row[2])], now)
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        return {key: value for key, (value, _)
+                in self.get_many_expiring(keys, version).items()}
+
+    def get_many_expiring(self, keys, version=None):
+        """Как get_many, но со сроком: {ключ: (значение, expires)},
+        expires - время Unix или None для бессрочных записей."""
+        names = {self.key(key, version): key for key in keys}
+        found = {}
+        accessed = []
+        now = time.time()
+        for chunk in chunks(list(names)):
+            rows = self.connection.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                'WHERE key IN ({})'.format(', '.join('?' * len(chunk))),
+                chunk,
+            )
+            for key, value, expires, last in rows:
+                if expires is None or expires > now:
+                    found[names[key]] = (pickle.loads(value), expires)
+                    accessed.append((key, last))
+        self.touch_stale(accessed, now)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        if timeout == 0:
+            self.delete_many([key], raw=True)
+            return
+        with self.write() as conn:
+            self.store(conn, [self.row(key, value, timeout, time.time())])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        keys = [self.key(key, version) for key in data]
+        if timeout == 0:
+            self.delete_many(keys, raw=True)
+            return []
+        now = time.time()
+        with self.write() as conn:
+            self.store(conn, [self.row(key, value, timeout, now)
+                              for key, value in zip(keys, data.values())])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        now = time.time()
+        with self.write() as conn:
+            row = conn.execute('SELECT expires FROM cache WHERE key = ?',
+                               (key,)).fetchone()
+            if row is not None and (row[0] is None or row[0] > now):
+                return False
+            if timeout != 0:
+                self.store(conn, [self.row(key, value, timeout, now)])
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.key(key, version)
+        with self.write() as conn:
+            row = conn.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            conn.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (data, len(data) + len(key), key)
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        cursor = self.connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time())
+        )
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.key(key, version)
+        return self.connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        return self.delete_many([key], version) > 0
+
+    def delete_many(self, keys, version=None, raw=False):
+        if not raw:
+            keys = [self.key(key, version) for key in keys]
+        deleted = 0
+        for chunk in chunks(list(keys)):
+            deleted += self.connection.execute(
+                'DELETE FROM cache WHERE key IN ({})'.format(
+                    ', '.join('?' * len(chunk))), chunk
+            ).rowcount
+        return deleted
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # соединение живёт всё время потока, как у LocMemCache память
+        pass
+
+
+def key_prefix(key, prefixes=STATS_PREFIXES):
+    """Группа ключа для статистики: известный префикс Django или начало
+    ключа до первого ':' или '.'."""
+    for prefix in prefixes:
+        if key.startswith(prefix):
+            return prefix
+    for position, char in enumerate(key):
+        if char in ':.':
+            return key[:position]
+    return key
+
+
+class FrequencySketch:
+    """Count-Min sketch: оценка сверху числа обращений к ключу
+    в SKETCH_DEPTH строках насыщающихся 4-битных счётчиков."""
+
+    # нечётные 64-битные множители: строка берёт старшие биты
+    # произведения, так что индексы в строках не коррелируют
+    SEEDS = (0xc3a5c85c97cb3127, 0xb492b66fbe98f273,
+             0x9ae16a3b2f90404f, 0xcbf29ce484222325)
+    MASK = (1 << 64) - 1
+
+    def __init__(self, width=DEFAULT_SKETCH_WIDTH):
+        self.width = 1 << max(width - 1, 1).bit_length()
+        self.shift = 64 - self.width.bit_length() + 1
+        self.rows = [bytearray(self.width) for _ in range(SKETCH_DEPTH)]
+        self.sample_size = self.width * SKETCH_SAMPLE
+        self.additions = 0
+
+    def indexes(self, key):
+        item = hash(key) & self.MASK
+        return [((item * seed) & self.MASK) >> self.shift
+                for seed in self.SEEDS[:SKETCH_DEPTH]]
+
+    def increment(self, key):
+        for row, index in zip(self.rows, self.indexes(key)):
+            if row[index] < SKETCH_MAX:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.reset()
+
+    def frequency(self, key):
+        return min(row[index]
+                   for row, index in zip(self.rows, self.indexes(key)))
+
+    def reset(self):
+        """Старение: все частоты делятся пополам."""
+        self.rows = [bytearray(count >> 1 for count in row)
+                     for row in self.rows]
+        self.additions //= 2
+
+
+class LocalStore:
+    """Данные одного TinyLFUCache. Django создаёт бэкенд кеша на каждый
+    поток, поэтому хранилище, как у LocMemCache, общее по имени."""
+
+    def __init__(self, width):
+        self.entries = OrderedDict()
+        self.sketch = FrequencySketch(width)
+        self.stats = {}
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def count(self, prefix, field):
+        counters = self.stats.setdefault(
+            prefix, {'hits': 0, 'misses': 0, 'evictions': 0, 'rejections': 0}
+        )
+        counters[field] += 1
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class TinyLFUCache(BaseCache):
+    shared = False
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.max_bytes = options.get('MAX_BYTES', DEFAULT_LOCAL_MAX_BYTES)
+        self.prefixes = tuple(options.get('STATS_PREFIXES', STATS_PREFIXES))
+        with _stores_lock:
+            self.store = _stores.setdefault(name, LocalStore(
+                options.get('SKETCH_WIDTH', DEFAULT_SKETCH_WIDTH)))
+
+    def key(self, key, version):
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        return made, key_prefix(key, self.prefixes)
+
+    def live(self, key, now):
+        """Запись, если она есть и не истекла; истёкшую удаляет."""
+        entry = self.store.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= now:
+            self.remove(key)
+            return None
+        return entry
+
+    def remove(self, key):
+        entry = self.store.entries.pop(key, None)
+        if entry is not None:
+            self.store.bytes -= entry[2]
+        return entry
+
+    def admit(self, key, prefix, data, expires, force=False):
+        """Кладёт запись, освобождая место с головы LRU. Новый ключ
+        вытесняет записи, только если он популярнее каждой из них,
+        а с force - в любом случае."""
+        store = self.store
+        size = len(data) + len(key)
+        existing = self.remove(key)
+        if size > self.max_bytes:
+            store.count(prefix, 'rejections')
+            return False
+        now = time.time()
+        victims = []
+        free = self.max_bytes - store.bytes
+        frequency = store.sketch.frequency(key)
+        for victim, entry in store.entries.items():
+            if free >= size:
+                break
+            expired = entry[1] is not None and entry[1] <= now
+            if (existing is None and not expired and not force
+                    and store.sketch.frequency(victim) >= frequency):
+                store.count(prefix, 'rejections')
+                return False
+            victims.append(victim)
+            free += entry[2]
+        for victim in victims:
+            store.count(self.remove(victim)[3], 'evictions')
+        store.entries[key] = (data, expires, size, prefix)
+        store.bytes += size
+        return True
+
+    def get(self, key, default=None, version=None):
+        key, prefix = self.key(key, version)
+        with self.store.lock:
+            self.store.sketch.increment(key)
+            entry = self.live(key, time.time())
+            if entry is None:
+                self.store.count(prefix, 'misses')
+                return default
+            self.store.entries.move_to_end(key)
+            self.store.count(prefix, 'hits')
+        return pickle.loads(entry[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key, prefix = self.key(key, version)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.store.lock:
+            if timeout == 0:
+                self.remove(key)
+                return
+            self.admit(key, prefix, data, self.get_backend_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key, prefix = self.key(key, version)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.store.lock:
+            if self.live(key, time.time()) is not None:
+                return False
+            if timeout == 0:
+                return True
+            return self.admit(key, prefix, data,
+                              self.get_backend_timeout(timeout), force=True)
+
+    def incr(self, key, delta=1, version=None):
+        key, prefix = self.key(key, version)
+        with self.store.lock:
+            entry = self.live(key, time.time())
+            if entry is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(entry[0]) + delta
+            self.admit(key, prefix,
+                       pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                       entry[1])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key, _ = self.key(key, version)
+        with self.store.lock:
+            entry = self.live(key, time.time())
+            if entry is None:
+                return False
+            self.store.entries[key] = (
+                entry[0], self.get_backend_timeout(timeout), *entry[2:]
+            )
+            return True
+
+    def has_key(self, key, version=None):
+        key, _ = self.key(key, version)
+        with self.store.lock:
+            return self.live(key, time.time()) is not None
+
+    def delete(self, key, version=None):
+        key, _ = self.key(key, version)
+        with self.store.lock:
+            return self.remove(key) is not None
+
+    def clear(self):
+        with self.store.lock:
+            self.store.entries.clear()
+            self.store.bytes = 0
+
+    def stats(self):
+        """Счётчики и занятый объём по префиксам ключей."""
+        with self.store.lock:
+            usage = {}
+            for _, _, size, prefix in self.store.entries.values():
+                entries, total = usage.get(prefix, (0, 0))
+                usage[prefix] = (entries + 1, total + size)
+            counters = {prefix: dict(values)
+                        for prefix, values in self.store.stats.items()}
+        rows = []
+        for prefix in sorted(set(counters) | set(usage)):
+            row = counters.get(prefix) or {
+                'hits': 0, 'misses': 0, 'evictions': 0, 'rejections': 0}
+            row['entries'], row['bytes'] = usage.get(prefix, (0, 0))
+            lookups = row['hits'] + row['misses']
+            row['hit_rate'] = row['hits'] / lookups if lookups else None
+            row['prefix'] = prefix
+            rows.append(row)
+        return rows
+
+    def hot_set(self, limit=50):
+        """Самые часто читаемые из лежащих в кеше ключей."""
+        with self.store.lock:
+            sketch = self.store.sketch
+            keys = [(sketch.frequency(key), key, entry[2], entry[1])
+                    for key, entry in self.store.entries.items()]
+        keys.sort(key=lambda item: item[0], reverse=True)
+        now = time.time()
+        return [
+            {'key': key, 'frequency': frequency, 'bytes': size,
+             'ttl': None if expires is None else max(expires - now, 0)}
+            for frequency, key, size, expires in keys[:limit]
+        ]
+
+
+class ChangeLog:
+    """Канал рассылки инвалидаций: файл, в который каждый процесс
+    дописывает строки JSON [pid, ключ, версия] (ключ None - очистка),
+    а остальные процессы дочитывают его с запомненного смещения.
+    Короткие записи с O_APPEND атомарны, сервер не нужен. Когда файл
+    вырастает больше max_bytes, писатель переименовывает его; читатель
+    замечает новый inode и на всякий случай очищает L1 целиком."""
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.inode = None
+        self.offset = 0
+        self.buffer = b''
+        self.last_poll = 0
+        # растёт при каждой прочитанной инвалидации, см. TieredCache.fill
+        self.generation = 0
+
+    def publish(self, key, version):
+        line = json.dumps([os.getpid(), key, version]).encode() + b'\n'
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                     0o644)
+        try:
+            os.write(fd, line)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > self.max_bytes:
+            try:
+                os.replace(self.path, self.path + '.1')
+            except FileNotFoundError:
+                pass
+
+    def poll(self, interval):
+        """Новые инвалидации других процессов: список пар (ключ, версия),
+        None вместо списка - надо очистить всё."""
+        now = time.monotonic()
+        if now - self.last_poll < interval:
+            return []
+        with self.lock:
+            self.last_poll = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                # журнала ещё нет: когда он появится, L1 очистится
+                self.inode = self.inode or 0
+                return []
+            if stat.st_ino != self.inode:
+                first = self.inode is None
+                self.inode, self.offset, self.buffer = stat.st_ino, 0, b''
+                if first:
+                    self.offset = stat.st_size
+                    return []
+                self.generation += 1
+                return None
+            if stat.st_size <= self.offset:
+                return []
+            changes = self.read()
+            if changes != []:
+                self.generation += 1
+            return changes
+
+    def read(self):
+        with open(self.path, 'rb') as log:
+            log.seek(self.offset)
+            data = self.buffer + log.read()
+        self.offset += len(data) - len(self.buffer)
+        *lines, self.buffer = data.split(b'\n')
+        changes = []
+        for line in lines:
+            pid, key, version = json.loads(line)
+            if pid == os.getpid():
+                continue
+            if key is None:
+                return None
+            changes.append((key, version))
+        return changes
+
+
+_logs = {}
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кеш: маленький L1 в памяти процесса (обычно
+    TinyLFUCache) перед общим L2 (SQLiteCache или любой другой общий
+    бэкенд). Оба уровня - алиасы из CACHES.
+
+    Чтение идёт в L1, при промахе - в L2 с заполнением L1. Запись идёт
+    в L2 и в L1 своего процесса, а ключ публикуется в ChangeLog; другие
+    процессы не реже раза в POLL_INTERVAL дочитывают журнал и удаляют
+    ключ из своего L1. Ключи с версиями (version, incr_version)
+    передаются в оба уровня как есть и инвалидируются парой (ключ,
+    версия). L1_TIMEOUT ограничивает жизнь записи в L1 на случай
+    потерянной инвалидации, а запись, прочитанная из L2, живёт в L1 не
+    дольше, чем ей осталось в L2 (если L2 умеет отдать срок -
+    get_many_expiring у SQLiteCache).
+
+        'default': {
+            'BACKEND': 'core.cache.TieredCache',
+            'OPTIONS': {'L1': 'local', 'L2': 'shared',
+                        'CHANGE_LOG': '/var/tmp/yatube-cache.log'},
+        },
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        from django.core.cache import caches
+        self.l1 = caches[options['L1']]
+        self.l2 = caches[options['L2']]
+        self.shared = is_shared(self.l2)
+        self.l1_timeout = options.get('L1_TIMEOUT', DEFAULT_L1_TIMEOUT)
+        self.poll_interval = options.get('POLL_INTERVAL',
+                                         DEFAULT_POLL_INTERVAL)
+        path = options['CHANGE_LOG']
+        max_bytes = options.get('MAX_LOG_BYTES', DEFAULT_MAX_LOG_BYTES)
+        with _stores_lock:
+            log = _logs.get(path)
+            if log is None or log.pid != os.getpid():
+                log = _logs[path] = ChangeLog(path, max_bytes)
+        self.log = log
+
+    def version_of(self, version):
+        return self.version if version is None else version
+
+    def l1_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def sync(self):
+        """Применяет к L1 инвалидации из журнала."""
+        changes = self.log.poll(self.poll_interval)
+        if changes is None:
+            self.l1.clear()
+        for key, version in changes or ():
+            self.l1.delete(key, version=version)
+
+    def publish(self, keys, version):
+        for key in keys:
+            self.log.publish(key, version)
+
+    def load(self, keys, version):
+        """Читает keys из L2: {ключ: (значение, expires или None)}."""
+        if hasattr(self.l2, 'get_many_expiring'):
+            return self.l2.get_many_expiring(keys, version=version)
+        return {key: (value, None) for key, value
+                in self.l2.get_many(keys, version=version).items()}
+
+    def fill(self, loaded, version, generation):
+        """Кладёт прочитанное из L2 в L1, если пока читали L2, не пришло
+        инвалидаций: иначе в L1 могло бы лечь уже устаревшее значение.
+        Срок в L1 - L1_TIMEOUT, но не больше остатка срока в L2."""
+        if not loaded or self.log.generation != generation:
+            return
+        now = time.time()
+        for key, (value, expires) in loaded.items():
+            timeout = self.l1_timeout
+            if expires is not None:
+                timeout = min(timeout, expires - now)
+            if timeout > 0:
+                self.l1.set(key, value, timeout, version=version)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        version = self.version_of(version)
+        self.sync()
+        found = self.l1.get_many(keys, version=version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            generation = self.log.generation
+            loaded = self.load(missing, version)
+            self.fill(loaded, version, generation)
+            found.update((key, value) for key, (value, _) in loaded.items())
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        version = self.version_of(version)
+        failed = self.l2.set_many(data, timeout, version=version)
+        self.publish(data, version)
+        if timeout == 0:
+            self.l1.delete_many(data, version=version)
+        else:
+            self.l1.set_many(data, self.l1_ttl(timeout), version=version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        version = self.version_of(version)
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self.publish([key], version)
+            self.l1.delete(key, version=version)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        version = self.version_of(version)
+        try:
+            value = self.l2.incr(key, delta, version=version)
+        finally:
+            self.l1.delete(key, version=version)
+        self.publish([key], version)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        version = self.version_of(version)
+        self.l1.delete(key, version=version)
+        return self.l2.touch(key, timeout, version=version)
+
+    def has_key(self, key, version=None):
+        version = self.version_of(version)
+        self.sync()
+        return (self.l1.has_key(key, version=version)
+                or self.l2.has_key(key, version=version))
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        version = self.version_of(version)
+        self.l2.delete_many(keys, version=version)
+        self.publish(keys, version)
+        self.l1.delete_many(keys, version=version)
+
+    def clear(self):
+        self.l2.clear()
+        self.log.publish(None, None)
+        self.l1.clear()
@@ -0,0 +1,22 @@
+"""Проверки настроек для `manage.py check`."""
+from django.core.cache import caches
+from django.core.checks import Tags, Warning, register
+
+from .cache import is_shared
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Кеш подписок, кеш запросов, кеш пользователей и объектов, счётчики
+    и блокировки хранят в кеше default то, что должны видеть все
+    процессы: токены версий, сбросы, счётчики. С кешем в памяти
+    процесса воркеры gunicorn и runworker о чужих изменениях не узнают
+    и отдают устаревшие данные."""
+    if is_shared(caches['default']):
+        return []
+    return [Warning(
+        'Кеш default виден только своему процессу.',
+        hint='Используйте общий бэкенд (core.cache.TieredCache или '
+             'SQLiteCache) или запускайте сайт одним процессом.',
+        id='core.W001',
+    )]
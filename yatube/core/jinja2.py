@@ -0,0 +1,56 @@
+import logging
+
+from django.template.defaultfilters import date
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils import timezone
+from jinja2 import Environment
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.shortcuts import get_thumbnail
+
+from .templatetags.user_filters import addclass
+
+logger = logging.getLogger('sorl.thumbnail')
+
+
+def url(viewname, *args, **kwargs):
+    """Аналог тега {% url %}."""
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def thumbnail(file_, geometry, **options):
+    """Аналог тега {% thumbnail ... as im %}: возвращает миниатюру или None.
+
+    Как и тег sorl, при THUMBNAIL_DEBUG = False не роняет страницу,
+    а пишет ошибку в лог.
+    """
+    if not file_:
+        return None
+    try:
+        return get_thumbnail(file_, geometry, **options)
+    except Exception:
+        if sorl_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Thumbnail function failed')
+        return None
+
+
+def localdate(value, arg=None):
+    """Фильтр date, который, как в шаблонах Django, учитывает часовой пояс."""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return date(value, arg)
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+        'thumbnail': thumbnail,
+    })
+    env.filters.update({
+        'date': localdate,
+        'addclass': addclass,
+    })
+    return env
@@ -0,0 +1,340 @@
+"""Фоновые задачи в базе данных.
+
+Задача - обычная функция с декоратором ``@task``. ``func.delay(...)``
+кладёт вызов в таблицу core.Job одним INSERT в текущей транзакции.
+ATOMIC_REQUESTS не включён, поэтому код, которому задача нужна вместе
+со своими изменениями, сам оборачивает их в transaction.atomic (как
+формы постов в posts/views.py): тогда откат отменяет и задачу, а задача
+не появится в очереди раньше данных. ``manage.py runworker`` выполняет
+задачи в пуле потоков или процессов:
+
+- задачу забирает тот воркер, чей UPDATE ... WHERE status='queued'
+  сработал первым, поэтому блокировки строк базы не нужны;
+- взятая задача арендуется на JOB_LEASE секунд, воркер продлевает аренду,
+  пока её выполняет, а просроченные задачи упавших воркеров
+  возвращаются в очередь;
+- при ошибке задача повторяется с экспоненциальной задержкой, после
+  max_attempts попыток остаётся со статусом failed;
+- пока задача с ключом dedup_key ждёт в очереди, такая же не добавляется;
+- периодические задачи (``@task(every=...)``) ставит в очередь только
+  лидер - воркер, удерживающий аренду JobLease.
+"""
+import json
+import os
+import socket
+import time
+import traceback
+from concurrent.futures import (FIRST_COMPLETED, Executor, Future,
+                                ProcessPoolExecutor, ThreadPoolExecutor,
+                                wait)
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job, JobLease
+
+TASKS = {}
+PERIODIC = {}
+LEADER_LEASE = 'periodic'
+
+
+def task(func=None, *, every=None, priority=0, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу. every - период в секундах
+    для задач, которые лидер ставит в очередь сам."""
+    def register(func):
+        name = '{}.{}'.format(func.__module__, func.__name__)
+        TASKS[name] = func
+        if every:
+            PERIODIC[name] = every
+        func.task_name = name
+        func.delay = lambda *args, **kwargs: enqueue(
+            name, args, kwargs, priority=priority, max_attempts=max_attempts
+        )
+        return func
+    return register(func) if func else register
+
+
+def autodiscover():
+    """Импортирует модули tasks всех приложений, чтобы воркер знал
+    зарегистрированные в них задачи."""
+    autodiscover_modules('tasks')
+
+
+def enqueue(task, args=(), kwargs=None, priority=0, dedup_key=None,
+            run_at=None, max_attempts=None):
+    """Ставит задачу в очередь в текущей транзакции (вне atomic - сразу
+    своим коммитом). Если задача с тем же dedup_key уже ждёт выполнения,
+    возвращает её вместо новой."""
+    job = Job(
+        name=getattr(task, 'task_name', task),
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs or {}},
+                           cls=DjangoJSONEncoder),
+        priority=priority,
+        dedup_key=dedup_key,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    if dedup_key is None:
+        job.save()
+        return job
+    queued = Job.objects.filter(dedup_key=dedup_key, status=Job.QUEUED)
+    existing = queued.first()
+    if existing is not None:
+        return existing
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return queued.get()
+    return job
+
+
+def claim(worker, limit=1):
+    """Забирает до limit готовых к запуску задач и возвращает их id."""
+    now = timezone.now()
+    candidates = (Job.objects
+                  .filter(status=Job.QUEUED, run_at__lte=now)
+                  .order_by('-priority', 'run_at', 'id')
+                  .values_list('id', flat=True)[:limit * 2])
+    claimed = []
+    for job_id in candidates:
+        taken = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_until=now + timedelta(seconds=settings.JOB_LEASE),
+            attempts=F('attempts') + 1,
+        )
+        if taken:
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def extend(worker, job_ids):
+    """Продлевает аренду задач, которые воркер ещё выполняет."""
+    return Job.objects.filter(
+        id__in=job_ids, status=Job.RUNNING, locked_by=worker
+    ).update(locked_until=timezone.now()
+             + timedelta(seconds=settings.JOB_LEASE))
+
+
+def backoff(attempts):
+    """Задержка перед следующей попыткой в секундах."""
+    return min(settings.JOB_RETRY_DELAY * 2 ** max(attempts - 1, 0),
+               settings.JOB_RETRY_MAX_DELAY)
+
+
+def fail(job, error):
+    """Возвращает задачу в очередь с задержкой или, если попытки
+    кончились, помечает её проваленной."""
+    now = timezone.now()
+    fields = {'last_error': error, 'locked_until': None}
+    if job.attempts >= job.max_attempts:
+        fields.update(status=Job.FAILED, finished=now)
+    else:
+        fields.update(status=Job.QUEUED, locked_by='',
+                      run_at=now + timedelta(seconds=backoff(job.attempts)))
+    running = Job.objects.filter(id=job.id, status=Job.RUNNING,
+                                 locked_by=job.locked_by)
+    try:
+        with transaction.atomic():
+            return running.update(**fields)
+    except IntegrityError:
+        # Пока задача выполнялась, в очередь встала такая же с тем же
+        # dedup_key - повторять эту незачем, её работу сделает новая.
+        return running.update(status=Job.FAILED, finished=now,
+                              last_error=error, locked_until=None)
+
+
+def execute(job_id):
+    """Выполняет взятую задачу и записывает результат. Возвращает True,
+    если задача выполнилась без ошибок."""
+    job = Job.objects.get(id=job_id)
+    func = TASKS.get(job.name)
+    try:
+        if func is None:
+            raise LookupError('Неизвестная задача: {}'.format(job.name))
+        payload = json.loads(job.payload)
+        func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        fail(job, traceback.format_exc())
+        return False
+    Job.objects.filter(
+        id=job.id, status=Job.RUNNING, locked_by=job.locked_by
+    ).update(status=Job.DONE, finished=timezone.now(),
+             locked_until=None, last_error='')
+    return True
+
+
+def execute_in_pool(job_id):
+    """execute() для потока или процесса пула: как и обработчик запроса,
+    не держит сломанные и устаревшие соединения с базой."""
+    close_old_connections()
+    try:
+        return execute(job_id)
+    finally:
+        close_old_connections()
+
+
+def requeue_expired():
+    """Возвращает в очередь задачи, аренда которых истекла: их воркер
+    упал или завис."""
+    expired = Job.objects.filter(status=Job.RUNNING,
+                                 locked_until__lt=timezone.now())
+    return sum(fail(job, 'Истекла аренда воркера {}'.format(job.locked_by))
+               for job in expired)
+
+
+def acquire_lease(name, holder, ttl):
+    """Берёт или продлевает именованную аренду. Возвращает True, если
+    аренда принадлежит holder."""
+    now = timezone.now()
+    expires = now + timedelta(seconds=ttl)
+    taken = JobLease.objects.filter(
+        Q(holder=holder) | Q(expires__lt=now), name=name
+    ).update(holder=holder, expires=expires)
+    if taken:
+        return True
+    try:
+        with transaction.atomic():
+            JobLease.objects.create(name=name, holder=holder,
+                                    expires=expires)
+    except IntegrityError:
+        return False
+    return True
+
+
+def release_lease(name, holder):
+    JobLease.objects.filter(name=name, holder=holder).delete()
+
+
+def schedule_periodic(now=None):
+    """Ставит в очередь периодические задачи, чей период наступил.
+    Ключ включает номер периода, так что смена лидера не запускает
+    задачу дважды за период."""
+    now = now or timezone.now()
+    scheduled = []
+    for name, every in PERIODIC.items():
+        key = 'periodic:{}:{}'.format(name, int(now.timestamp() // every))
+        if not Job.objects.filter(dedup_key=key).exists():
+            scheduled.append(enqueue(name, dedup_key=key, max_attempts=1))
+    return scheduled
+
+
+def purge_finished(older_than=None):
+    """Удаляет выполненные задачи старше JOB_KEEP_FINISHED секунд."""
+    older_than = older_than or settings.JOB_KEEP_FINISHED
+    deadline = timezone.now() - timedelta(seconds=older_than)
+    return Job.objects.filter(status=Job.DONE,
+                              finished__lt=deadline).delete()[0]
+
+
+class InlineExecutor(Executor):
+    """Выполняет задачи прямо в текущем потоке (режим sync для отладки
+    и тестов)."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as error:
+            future.set_exception(error)
+        return future
+
+
+def _init_process():
+    import django
+    django.setup()
+    autodiscover()
+
+
+class Worker:
+    """Цикл воркера: забирает задачи по числу свободных мест в пуле,
+    продлевает аренду выполняемых и, если он лидер, ставит в очередь
+    периодические задачи."""
+    MODES = ('thread', 'process', 'sync')
+
+    def __init__(self, concurrency=None, mode=None, poll_interval=None,
+                 leader=True):
+        self.concurrency = concurrency or settings.JOB_WORKERS
+        self.mode = mode or settings.JOB_WORKER_MODE
+        if self.mode not in self.MODES:
+            raise ValueError('Неизвестный режим воркера: {}'.format(
+                self.mode))
+        self.poll_interval = (settings.JOB_POLL_INTERVAL
+                              if poll_interval is None else poll_interval)
+        self.leader = leader
+        self.id = '{}:{}'.format(socket.gethostname(), os.getpid())
+        self.target = execute if self.mode == 'sync' else execute_in_pool
+        self.running = {}
+        self.stopping = False
+        autodiscover()
+
+    def executor(self):
+        if self.mode == 'sync':
+            return InlineExecutor()
+        if self.mode == 'process':
+            # Дочерние процессы не должны делить соединения с родителем.
+            from django.db import connections
+            connections.close_all()
+            return ProcessPoolExecutor(self.concurrency,
+                                       initializer=_init_process)
+        return ThreadPoolExecutor(self.concurrency)
+
+    def tick_leader(self):
+        if not self.leader or not acquire_lease(
+                LEADER_LEASE, self.id, settings.JOB_LEADER_LEASE):
+            return
+        requeue_expired()
+        schedule_periodic()
+        purge_finished()
+
+    def collect(self):
+        """Убирает завершённые задачи из списка выполняемых и возвращает
+        их число."""
+        done = [future for future in self.running if future.done()]
+        for future in done:
+            del self.running[future]
+        return len(done)
+
+    def run(self, burst=False):
+        """Работает, пока не вызван stop(). С burst=True завершается,
+        когда в очереди не останется готовых задач. Возвращает число
+        выполненных задач."""
+        executed = 0
+        pool = self.executor()
+        try:
+            while not self.stopping:
+                self.tick_leader()
+                executed += self.collect()
+                if self.running:
+                    extend(self.id, list(self.running.values()))
+                free = self.concurrency - len(self.running)
+                claimed = claim(self.id, free) if free > 0 else []
+                for job_id in claimed:
+                    future = pool.submit(self.target, job_id)
+                    self.running[future] = job_id
+                if claimed:
+                    continue
+                if burst and not self.running:
+                    break
+                if self.running:
+                    wait(list(self.running), timeout=self.poll_interval,
+                         return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(self.poll_interval)
+        finally:
+            pool.shutdown(wait=True)
+            executed += self.collect()
+            if self.leader:
+                release_lease(LEADER_LEASE, self.id)
+        return executed
+
+    def stop(self, *args):
+        self.stopping = True
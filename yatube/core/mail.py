@@ -0,0 +1,194 @@
+"""Исходящая почта через очередь.
+
+OutboxBackend - почтовый бэкенд Django: send_mail(), восстановление
+пароля и любые другие письма не ходят в SMTP из запроса, а одним
+bulk_create сохраняются в core.OutboxMessage, после чего в очередь
+фоновых задач ставится отправка (core.tasks.send_outbox).
+
+Отправитель забирает письма пачками по OUTBOX_BATCH_SIZE, открывает на
+пачку одно соединение настоящего бэкенда OUTBOX_EMAIL_BACKEND, шлёт не
+быстрее OUTBOX_RATE писем в секунду, а неудачные письма повторяет
+с задержкой, пока не кончатся OUTBOX_MAX_ATTEMPTS попыток.
+"""
+import base64
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import backoff, enqueue
+from .models import OutboxMessage
+
+SEND_TASK = 'core.tasks.send_outbox'
+SEND_PRIORITY = 10
+# сколько секунд пачка считается занятой отправителем
+CLAIM_TIMEOUT = 10 * 60
+
+
+def serialize(message):
+    """Письмо в JSON, из которого deserialize() соберёт его обратно."""
+    attachments = []
+    for attachment in message.attachments:
+        if not isinstance(attachment, tuple):
+            raise ValueError('Вложения MIMEBase в очередь не ставятся')
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        attachments.append(
+            [filename, base64.b64encode(content).decode(), mimetype]
+        )
+    return json.dumps({
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+        'attachments': attachments,
+    })
+
+
+def deserialize(payload):
+    data = json.loads(payload)
+    message = EmailMultiAlternatives(
+        subject=data['subject'],
+        body=data['body'],
+        from_email=data['from_email'],
+        to=data['to'],
+        cc=data['cc'],
+        bcc=data['bcc'],
+        reply_to=data['reply_to'],
+        headers=data['headers'],
+        alternatives=[tuple(item) for item in data['alternatives']],
+    )
+    for filename, content, mimetype in data['attachments']:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Складывает письма в очередь и сразу возвращает управление."""
+
+    def send_messages(self, email_messages):
+        rows = [
+            OutboxMessage(subject=message.subject,
+                          to=', '.join(message.recipients()),
+                          payload=serialize(message))
+            for message in email_messages if message.recipients()
+        ]
+        if not rows:
+            return 0
+        with transaction.atomic():
+            OutboxMessage.objects.bulk_create(rows)
+            enqueue(SEND_TASK, priority=SEND_PRIORITY, dedup_key='outbox')
+        return len(rows)
+
+
+class RateLimiter:
+    """Не даёт отправлять чаще rate писем в секунду."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = 0
+
+    def wait(self):
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+
+def claim(sender, limit):
+    """Помечает до limit готовых писем как отправляемые этим отправителем
+    и возвращает их. Письма упавшего отправителя снова становятся
+    доступны по истечении CLAIM_TIMEOUT."""
+    now = timezone.now()
+    ready = (OutboxMessage.objects
+             .filter(status=OutboxMessage.QUEUED, next_try__lte=now)
+             | OutboxMessage.objects
+             .filter(status=OutboxMessage.SENDING, claimed_until__lt=now))
+    ids = list(ready.order_by('id').values_list('id', flat=True)[:limit])
+    ready.filter(id__in=ids).update(
+        status=OutboxMessage.SENDING,
+        claimed_by=sender,
+        claimed_until=now + timedelta(seconds=CLAIM_TIMEOUT),
+    )
+    return list(OutboxMessage.objects.filter(
+        claimed_by=sender, status=OutboxMessage.SENDING
+    ).order_by('id'))
+
+
+def record_failure(row, error):
+    now = timezone.now()
+    attempts = row.attempts + 1
+    if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        fields = {'status': OutboxMessage.FAILED}
+    else:
+        fields = {'status': OutboxMessage.QUEUED,
+                  'next_try': now + timedelta(seconds=backoff(attempts))}
+    OutboxMessage.objects.filter(id=row.id, claimed_by=row.claimed_by).update(
+        attempts=attempts, last_error=error, claimed_by='',
+        claimed_until=None, **fields
+    )
+
+
+def send_batch(limit=None, limiter=None):
+    """Отправляет одну пачку через одно соединение. Возвращает пару
+    (отправлено, с ошибкой)."""
+    sender = '{}:{}:{}'.format(socket.gethostname(), os.getpid(),
+                               uuid.uuid4().hex[:8])
+    rows = claim(sender, limit or settings.OUTBOX_BATCH_SIZE)
+    if not rows:
+        return 0, 0
+    limiter = limiter or RateLimiter(settings.OUTBOX_RATE)
+    connection = get_connection(settings.OUTBOX_EMAIL_BACKEND,
+                                fail_silently=False)
+    sent = failed = 0
+    try:
+        connection.open()
+    except Exception as error:
+        for row in rows:
+            record_failure(row, repr(error))
+        return 0, len(rows)
+    try:
+        for row in rows:
+            limiter.wait()
+            try:
+                connection.send_messages([deserialize(row.payload)])
+            except Exception as error:
+                record_failure(row, repr(error))
+                failed += 1
+                continue
+            OutboxMessage.objects.filter(
+                id=row.id, claimed_by=sender
+            ).update(status=OutboxMessage.SENT, sent=timezone.now(),
+                     attempts=row.attempts + 1, last_error='',
+                     claimed_by='', claimed_until=None)
+            sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def send_all(limit=None):
+    """Отправляет пачки, пока не кончатся готовые письма."""
+    limiter = RateLimiter(settings.OUTBOX_RATE)
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = send_batch(limit, limiter)
+        if not sent and not failed:
+            return total_sent, total_failed
+        total_sent += sent
+        total_failed += failed
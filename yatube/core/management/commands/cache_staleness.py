@@ -0,0 +1,123 @@
+"""Стенд для двухуровневого кеша: несколько процессов читают ключ через
+TieredCache, а этот процесс его переписывает. Для каждого читателя
+меряется, сколько он ещё видел старое значение из своего L1 после
+записи нового, и доля чтений, обслуженных L1."""
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+KEY = 'staleness:probe'
+
+
+def tiered_caches(directory, poll_interval, l1_timeout):
+    return {
+        'default': {
+            'BACKEND': 'core.cache.TieredCache',
+            'OPTIONS': {
+                'L1': 'local',
+                'L2': 'shared',
+                'CHANGE_LOG': os.path.join(directory, 'cache.log'),
+                'L1_TIMEOUT': l1_timeout,
+                'POLL_INTERVAL': poll_interval,
+            },
+        },
+        'local': {'BACKEND': 'core.cache.TinyLFUCache',
+                  'LOCATION': directory},
+        'shared': {'BACKEND': 'core.cache.SQLiteCache',
+                   'LOCATION': os.path.join(directory, 'cache.sqlite3')},
+    }
+
+
+def read_until_stopped(results, stop):
+    cache = caches['default']
+    seen = []
+    while not stop.is_set():
+        value = cache.get(KEY)
+        if value is not None and (not seen or value[0] > seen[-1][0]):
+            seen.append((value[0], time.time()))
+        time.sleep(0.001)
+    stats = caches['local'].stats()
+    hits = sum(row['hits'] for row in stats)
+    lookups = hits + sum(row['misses'] for row in stats)
+    results.put((seen, hits / lookups if lookups else 0))
+
+
+def measure(readers=4, writes=50, interval=0.05, poll_interval=0.1,
+            l1_timeout=60):
+    """Возвращает словарь с наибольшим и средним временем, когда читатели
+    видели устаревшее значение, долей попаданий в L1 и признаком, что все
+    читатели дошли до последней записи."""
+    directory = tempfile.mkdtemp()
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    stop = context.Event()
+    try:
+        with override_settings(CACHES=tiered_caches(directory, poll_interval,
+                                                    l1_timeout)):
+            cache = caches['default']
+            written = {0: time.time()}
+            cache.set(KEY, (0, written[0]), timeout=None)
+            processes = [
+                context.Process(target=read_until_stopped,
+                                args=(results, stop))
+                for _ in range(readers)
+            ]
+            for process in processes:
+                process.start()
+            time.sleep(poll_interval * 2)
+            for version in range(1, writes + 1):
+                written[version] = time.time()
+                cache.set(KEY, (version, written[version]), timeout=None)
+                time.sleep(interval)
+            time.sleep(poll_interval * 2)
+            stop.set()
+            reports = [results.get(timeout=30) for _ in processes]
+            for process in processes:
+                process.join()
+    except queue.Empty:
+        raise RuntimeError('Читатель не вернул результат')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    lags = []
+    for seen, _ in reports:
+        for (previous, _), (version, at) in zip(seen, seen[1:]):
+            lags.append(at - written[previous + 1])
+    return {
+        'readers': readers,
+        'writes': writes,
+        'max_lag': max(lags, default=0),
+        'mean_lag': sum(lags) / len(lags) if lags else 0,
+        'l1_hit_rate': min(rate for _, rate in reports),
+        'converged': all(seen and seen[-1][0] == writes
+                         for seen, _ in reports),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Меряет, насколько долго L1 двухуровневого кеша (TieredCache) '
+            'отдаёт устаревшие значения в нескольких процессах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writes', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=0.05)
+        parser.add_argument('--poll-interval', type=float, default=0.1)
+
+    def handle(self, *args, **options):
+        report = measure(options['readers'], options['writes'],
+                         options['interval'], options['poll_interval'])
+        self.stdout.write(
+            'Читателей: {readers}, записей: {writes}\n'
+            'Устаревшее значение видно: до {max_lag:.3f} с, '
+            'в среднем {mean_lag:.3f} с\n'
+            'Доля чтений из L1: {l1_hit_rate:.1%}\n'
+            'Все читатели увидели последнюю запись: {converged}'.format(
+                **report)
+        )
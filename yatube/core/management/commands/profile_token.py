@@ -0,0 +1,14 @@
+"""Токен для заголовка X-Profile: с ним профилируется любой запрос."""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.profiler import profile_token
+
+
+class Command(BaseCommand):
+    help = 'Печатает токен для заголовка X-Profile'
+
+    def handle(self, *args, **options):
+        self.stdout.write(profile_token())
+        self.stderr.write('Действует {} с.'.format(
+            settings.PROFILER_TOKEN_MAX_AGE))
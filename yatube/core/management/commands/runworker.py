@@ -0,0 +1,37 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди core.Job в пуле потоков '
+            'или процессов. С --burst завершается, когда очередь пуста.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.JOB_WORKERS)
+        parser.add_argument('--mode', choices=Worker.MODES,
+                            default=settings.JOB_WORKER_MODE)
+        parser.add_argument('--interval', type=float,
+                            default=settings.JOB_POLL_INTERVAL)
+        parser.add_argument('--burst', action='store_true')
+        parser.add_argument('--no-leader', action='store_true',
+                            help='не ставить в очередь периодические задачи')
+
+    def handle(self, *args, **options):
+        worker = Worker(concurrency=options['workers'],
+                        mode=options['mode'],
+                        poll_interval=options['interval'],
+                        leader=not options['no_leader'])
+        signal.signal(signal.SIGTERM, worker.stop)
+        self.stdout.write('Воркер {} запущен: {} x {}'.format(
+            worker.id, worker.concurrency, worker.mode))
+        try:
+            executed = worker.run(burst=options['burst'])
+        except KeyboardInterrupt:
+            worker.stop()
+            return
+        self.stdout.write('Выполнено задач: {}'.format(executed))
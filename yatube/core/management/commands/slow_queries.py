@@ -0,0 +1,37 @@
+"""Сводка журнала медленных запросов по отпечаткам: сколько раз, сколько
+всего и максимум миллисекунд, из каких view и план SQLite."""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.slow_queries import summarize_log
+
+
+class Command(BaseCommand):
+    help = 'Сводит журнал медленных запросов по отпечаткам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG)
+        parser.add_argument('--top', type=int, default=20)
+
+    def handle(self, *args, **options):
+        lines = []
+        for path in (options['log'] + '.1', options['log']):
+            if os.path.exists(path):
+                with open(path) as file:
+                    lines.extend(file)
+        rows = summarize_log(lines)[:options['top']]
+        if not rows:
+            self.stdout.write('Медленных запросов нет')
+        for row in rows:
+            self.stdout.write(
+                '{fingerprint}  {count} раз, всего {total_ms:.1f} мс, '
+                'максимум {max_ms:.1f} мс'.format(**row)
+            )
+            self.stdout.write('  ' + row['sql'])
+            views = [view for view in row['views'] if view]
+            self.stdout.write('  view: ' + ', '.join(views))
+            for step in row['plan']:
+                marker = '!' if step.startswith('SCAN') else ' '
+                self.stdout.write('  {} {}'.format(marker, step))
@@ -0,0 +1,24 @@
+"""Прогрев процесса: компиляция шаблонов, обращение URL, первые страницы
+лент и миниатюры - с временем каждого шага."""
+from django.core.management.base import BaseCommand
+
+from core import warmup
+
+
+class Command(BaseCommand):
+    help = 'Прогревает шаблоны, URL и кеши и показывает время шагов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('steps', nargs='*',
+                            help='только эти шаги (по умолчанию все)')
+
+    def handle(self, *args, **options):
+        report = warmup.run(options['steps'] or None)
+        for row in report:
+            line = '{step:<12} {count:>6}  {ms:8.1f} мс'.format(**row)
+            if row['error']:
+                line += '  ошибка: ' + row['error']
+            self.stdout.write(line)
+        self.stdout.write('Всего {:.1f} мс'.format(
+            sum(row['ms'] for row in report)
+        ))
@@ -0,0 +1,131 @@
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import http_date, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class FileRange:
+    """Файл, ограниченный отрезком [start, start + length).
+
+    Наружу отдаётся fileno(), поэтому WSGI-сервер с wsgi.file_wrapper
+    (gunicorn и т.п.) отправит отрезок через os.sendfile, не читая его
+    в память; в остальных случаях файл читается блоками.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Разбирает заголовок Range для файла размером size.
+
+    Возвращает пару (start, end) включительно или None, если заголовок
+    нужно проигнорировать и отдать файл целиком (в том числе при запросе
+    нескольких диапазонов).
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise RangeNotSatisfiable
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def file_etag(stat):
+    return quote_etag('{:x}-{:x}'.format(int(stat.st_mtime), stat.st_size))
+
+
+def accel_response(name, path):
+    """Передаёт отдачу файла nginx (X-Accel-Redirect) или Apache/lighttpd
+    (X-Sendfile) в зависимости от MEDIA_ACCEL."""
+    response = HttpResponse()
+    # Content-Type выставит прокси по расширению файла.
+    del response['Content-Type']
+    if settings.MEDIA_ACCEL == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_PREFIX + quote(name)
+        )
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def range_response(request, path, stat):
+    """Стримит файл целиком или запрошенный в Range отрезок."""
+    size = stat.st_size
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if 'HTTP_RANGE' in request.META and (
+        if_range is None
+        or if_range in (file_etag(stat), http_date(stat.st_mtime))
+    ):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{}'.format(size)
+            return response
+
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file)
+    else:
+        start, end = byte_range
+        response = FileResponse(FileRange(file, start, end - start + 1))
+        response.status_code = 206
+        response['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, size)
+        response['Content-Length'] = end - start + 1
+    response.block_size = settings.MEDIA_BLOCK_SIZE
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def media_path(name):
+    """Абсолютный путь к файлу внутри MEDIA_ROOT или None."""
+    root = os.path.abspath(settings.MEDIA_ROOT)
+    path = os.path.abspath(os.path.join(root, name))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
@@ -0,0 +1,15 @@
+from core import object_cache
+
+
+class IdentityMapMiddleware:
+    """Заводит карту объектов object_cache на время запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        object_cache.activate()
+        try:
+            return self.get_response(request)
+        finally:
+            object_cache.deactivate()
@@ -0,0 +1,11 @@
+from core import profiler
+
+
+class ProfilerMiddleware:
+    """Профилирует запросы, о которых попросили (см. core.profiler)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return profiler.profile_request(request, self.get_response)
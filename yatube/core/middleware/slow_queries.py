@@ -0,0 +1,16 @@
+from core import slow_queries
+
+
+class SlowQueryMiddleware:
+    """Запоминает текущий запрос, чтобы журнал медленных запросов знал
+    его view (см. core.slow_queries)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow_queries.bind(request)
+        try:
+            return self.get_response(request)
+        finally:
+            slow_queries.unbind()
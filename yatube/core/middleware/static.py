@@ -0,0 +1,120 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+# Порядок важен: первым подходящим отдаётся самый плотный вариант.
+ENCODINGS = (
+    ('br', '.br'),
+    ('gzip', '.gz'),
+)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age={}, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age={}'
+
+
+def accepted_encodings(header):
+    """Возвращает кодировки из Accept-Encoding, кроме явно запрещённых q=0."""
+    encodings = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if params in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+def choose_variant(path, accept_encoding):
+    """Выбирает предсжатую копию файла, которую примет клиент.
+
+    Возвращает путь к отдаваемому файлу, его Content-Encoding и признак
+    того, что у файла вообще есть сжатые копии (для заголовка Vary).
+    """
+    accepted = accepted_encodings(accept_encoding)
+    has_variants = False
+    for encoding, suffix in ENCODINGS:
+        if not os.path.isfile(path + suffix):
+            continue
+        has_variants = True
+        if encoding in accepted:
+            return path + suffix, encoding, True
+    return path, None, has_variants
+
+
+class PrecompressedStaticMiddleware:
+    """Отдаёт собранную статику из STATIC_ROOT без DEBUG.
+
+    Для хешированных имён из манифеста ставит вечный immutable-кеш,
+    а сжатый вариант выбирает по Accept-Encoding среди файлов .br/.gz,
+    подготовленных collectstatic.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._hashed_names = None
+
+    def __call__(self, request):
+        static_url = settings.STATIC_URL
+        if (settings.DEBUG
+                or not settings.STATIC_ROOT
+                or request.method not in ('GET', 'HEAD')
+                or not request.path_info.startswith(static_url)):
+            return self.get_response(request)
+        name = request.path_info[len(static_url):]
+        response = self.serve(request, name)
+        if response is None:
+            return self.get_response(request)
+        return response
+
+    @property
+    def hashed_names(self):
+        if self._hashed_names is None:
+            hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+            self._hashed_names = set(hashed_files.values())
+        return self._hashed_names
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not name or not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        if name in self.hashed_names:
+            cache_control = IMMUTABLE_CACHE_CONTROL.format(
+                settings.STATIC_IMMUTABLE_MAX_AGE
+            )
+        else:
+            cache_control = DEFAULT_CACHE_CONTROL.format(
+                settings.STATIC_DEFAULT_MAX_AGE
+            )
+            if not was_modified_since(
+                request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                stat.st_mtime, stat.st_size,
+            ):
+                response = HttpResponseNotModified()
+                response['Cache-Control'] = cache_control
+                return response
+
+        serve_path, content_encoding, has_variants = choose_variant(
+            path, request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        content_type, _ = mimetypes.guess_type(path)
+        response = FileResponse(
+            open(serve_path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+        if has_variants:
+            response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = cache_control
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        return response
@@ -0,0 +1,46 @@
+import time
+
+from core import tracing
+
+
+class TracingMiddleware:
+    """Корень трассы запроса (см. core.tracing). Стоит первым, поэтому
+    видит время всех остальных middleware до и после view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace = tracing.start_trace(request.META.get('HTTP_TRACEPARENT'))
+        if trace is None:
+            return self.get_response(request)
+        try:
+            with tracing.span('{} {}'.format(request.method, request.path),
+                              tracing.SERVER) as root:
+                root.attributes.update({'http.method': request.method,
+                                        'http.target': request.path})
+                response = self.get_response(request)
+                root.attributes['http.status_code'] = response.status_code
+                match = request.resolver_match
+                if match is not None:
+                    root.attributes['http.route'] = match.view_name
+                self.response_span(trace, root)
+            response['traceparent'] = tracing.traceparent(trace)
+            return response
+        finally:
+            tracing.finish_trace()
+
+    def response_span(self, trace, root):
+        """Время после view и рендера шаблона - ответные части
+        остальных middleware."""
+        children = [span.end for span in trace.spans
+                    if span.parent_id == root.span_id and span.end]
+        if children:
+            tracing.add_span('middleware.response', max(children),
+                             time.time_ns())
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        trace = tracing.current()
+        if trace is not None:
+            tracing.add_span('middleware.request', trace.spans[0].start,
+                             time.time_ns())
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 07:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.TextField(verbose_name='Тема')),
+                ('to', models.TextField(verbose_name='Получатели')),
+                ('payload', models.TextField(verbose_name='Письмо')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('failed', 'Ошибка')], default='queued', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('next_try', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Отправить не раньше')),
+                ('claimed_by', models.CharField(blank=True, max_length=100, verbose_name='Отправитель')),
+                ('claimed_until', models.DateTimeField(blank=True, null=True, verbose_name='Занято до')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('sent', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+            ],
+            options={
+                'verbose_name': 'Исходящее письмо',
+                'verbose_name_plural': 'Исходящие письма',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(fields=['status', 'next_try'], name='outbox_pick'),
+        ),
+    ]
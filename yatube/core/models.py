@@ -0,0 +1,101 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Фоновая задача для `manage.py runworker` (см. core.jobs)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    payload = models.TextField('Аргументы', default='{}')
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    dedup_key = models.CharField('Ключ дедупликации', max_length=200,
+                                 blank=True, null=True)
+    status = models.CharField('Статус', max_length=10, choices=STATUSES,
+                              default=QUEUED)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Максимум попыток',
+                                                    default=5)
+    run_at = models.DateTimeField('Запустить не раньше', default=timezone.now)
+    locked_by = models.CharField('Исполнитель', max_length=100, blank=True)
+    locked_until = models.DateTimeField('Занята до', blank=True, null=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    finished = models.DateTimeField('Завершена', blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'],
+                         name='job_pick'),
+            models.Index(fields=['dedup_key'], name='job_dedup_key'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(status='queued'),
+                name='unique_queued_job',
+            ),
+        ]
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+    def __str__(self):
+        return '{} #{} ({})'.format(self.name, self.id, self.status)
+
+
+class JobLease(models.Model):
+    """Аренда именованной блокировки: кто из воркеров сейчас лидер
+    и до какого момента."""
+    name = models.CharField(max_length=50, primary_key=True)
+    holder = models.CharField(max_length=100)
+    expires = models.DateTimeField()
+
+
+class OutboxMessage(models.Model):
+    """Письмо в очереди на отправку (см. core.mail)."""
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    subject = models.TextField('Тема')
+    to = models.TextField('Получатели')
+    payload = models.TextField('Письмо')
+    status = models.CharField('Статус', max_length=10, choices=STATUSES,
+                              default=QUEUED)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    next_try = models.DateTimeField('Отправить не раньше',
+                                    default=timezone.now)
+    claimed_by = models.CharField('Отправитель', max_length=100,
+                                  blank=True)
+    claimed_until = models.DateTimeField('Занято до', blank=True,
+                                         null=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создано', auto_now_add=True)
+    sent = models.DateTimeField('Отправлено', blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_try'],
+                         name='outbox_pick'),
+        ]
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self):
+        return '{} -> {} ({})'.format(self.subject, self.to, self.status)
@@ -0,0 +1,190 @@
+"""Кеш отдельных строк моделей.
+
+Модель подключается вызовом register(): её строки кладутся в общий кеш
+по первичному ключу, а для естественных ключей (slug, username)
+хранится только ссылка на первичный ключ. В кеше лежат значения
+столбцов, а не pickle объекта, так что связанные объекты в запись не
+попадают и устаревают каждый сам по себе.
+
+- get() и get_object_or_404() ищут строку по pk или естественному
+  ключу, get_many() - пачку строк одним get_many кеша и одним запросом
+  pk IN (...) для промахов;
+- hydrate() подставляет в список объектов связанные объекты (author,
+  group) из кеша вместо JOIN;
+- сохранение и удаление строки сбрасывают её запись сразу и ещё раз
+  после коммита, как в users.backends;
+- в пределах запроса (core.middleware.identity_map) одна и та же строка
+  достаётся из кеша один раз, и все, кто её запросил, получают один
+  и тот же объект.
+
+Ссылка по естественному ключу не сбрасывается при его смене: при чтении
+найденный объект сверяется с искомым значением, и устаревшая ссылка
+считается промахом.
+
+Сброс записи должны увидеть все воркеры, поэтому записи живут только
+в общем для процессов кеше default (core.cache.shared_cache). Если он
+в памяти процесса, строки каждый раз читаются из базы, а карта
+идентичности в пределах запроса по-прежнему работает.
+"""
+import hashlib
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+
+from .cache import shared_cache
+
+OBJECT_CACHE_TIMEOUT = 5 * 60
+ROW_KEY = 'object:{}:{}'
+NATURAL_KEY = 'object:{}:{}:{}'
+
+REGISTRY = {}
+
+_local = threading.local()
+
+
+def row_key(model, pk):
+    return ROW_KEY.format(model._meta.label_lower, pk)
+
+
+def natural_key(model, field, value):
+    """Значение хешируется: username может содержать пробелы и не-ASCII
+    символы, недопустимые в ключах memcached."""
+    digest = hashlib.md5(str(value).encode()).hexdigest()
+    return NATURAL_KEY.format(model._meta.label_lower, field, digest)
+
+
+def register(model, natural_keys=()):
+    """Подключает модель к кешу и сбрасывает её записи по сигналам."""
+    REGISTRY[model] = tuple(natural_keys)
+    uid = 'object_cache:{}'.format(model._meta.label_lower)
+    post_save.connect(changed, sender=model, dispatch_uid=uid)
+    post_delete.connect(changed, sender=model, dispatch_uid=uid)
+    return model
+
+
+def changed(sender, instance, **kwargs):
+    invalidate(sender, instance)
+
+
+def invalidate(model, instance):
+    """Сбрасывает запись сразу и ещё раз после коммита, чтобы параллельный
+    запрос не успел положить в кеш незакоммиченное старое состояние."""
+    keys = [row_key(model, instance.pk)] + [
+        natural_key(model, field, getattr(instance, field))
+        for field in REGISTRY.get(model, ())
+    ]
+    identity_map = current_map()
+    if identity_map is not None:
+        identity_map.pop((model, instance.pk), None)
+    cache = shared_cache()
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def current_map():
+    return getattr(_local, 'identity_map', None)
+
+
+def activate():
+    _local.identity_map = {}
+
+
+def deactivate():
+    _local.identity_map = None
+
+
+def dump(instance):
+    return {field.attname: getattr(instance, field.attname)
+            for field in instance._meta.concrete_fields}
+
+
+def restore(model, row):
+    names = [field.attname for field in model._meta.concrete_fields]
+    return model.from_db('default', names, [row[name] for name in names])
+
+
+def get_many(model, pks):
+    """Словарь pk -> объект для найденных строк, как у in_bulk()."""
+    identity_map = current_map()
+    if identity_map is None:
+        identity_map = {}
+    result = {}
+    missing = []
+    for pk in pks:
+        found = identity_map.get((model, pk))
+        if found is not None:
+            result[pk] = found
+        elif pk not in missing:
+            missing.append(pk)
+    if not missing:
+        return result
+    cache = shared_cache()
+    keys = {row_key(model, pk): pk for pk in missing}
+    for key, row in cache.get_many(keys).items():
+        result[keys[key]] = restore(model, row)
+    loaded = model._default_manager.in_bulk(
+        [pk for pk in missing if pk not in result]
+    )
+    if loaded:
+        cache.set_many({row_key(model, pk): dump(instance)
+                        for pk, instance in loaded.items()},
+                       OBJECT_CACHE_TIMEOUT)
+        result.update(loaded)
+    for pk in missing:
+        if pk in result:
+            identity_map[(model, pk)] = result[pk]
+    return result
+
+
+def get(model, pk=None, **lookup):
+    """Объект по pk или по одному естественному ключу: get(User, pk=1),
+    get(Group, slug='cats'). Нет строки - model.DoesNotExist."""
+    if pk is None:
+        (field, value), = lookup.items()
+        if field not in REGISTRY.get(model, ()):
+            raise ValueError('{} не естественный ключ {}'.format(
+                field, model._meta.label))
+        cache = shared_cache()
+        key = natural_key(model, field, value)
+        pk = cache.get(key)
+        found = get_many(model, [pk]).get(pk) if pk is not None else None
+        if found is None or getattr(found, field) != value:
+            found = model._default_manager.get(**{field: value})
+            cache.set(key, found.pk, OBJECT_CACHE_TIMEOUT)
+            cache.set(row_key(model, found.pk), dump(found),
+                      OBJECT_CACHE_TIMEOUT)
+            identity_map = current_map()
+            if identity_map is not None:
+                identity_map[(model, found.pk)] = found
+        return found
+    found = get_many(model, [pk]).get(pk)
+    if found is None:
+        raise model.DoesNotExist('{} с pk={} не найден'.format(
+            model._meta.object_name, pk))
+    return found
+
+
+def get_object_or_404(model, **lookup):
+    try:
+        return get(model, **lookup)
+    except model.DoesNotExist:
+        raise Http404('{} не найден'.format(model._meta.object_name))
+
+
+def hydrate(objects, *fields):
+    """Подставляет объектам связанные объекты по ForeignKey из кеша:
+    один get_many на каждое поле вместо JOIN в запросе."""
+    if not objects:
+        return objects
+    meta = objects[0]._meta
+    for name in fields:
+        field = meta.get_field(name)
+        ids = {getattr(obj, field.attname) for obj in objects} - {None}
+        related = get_many(field.related_model, ids)
+        for obj in objects:
+            value = getattr(obj, field.attname)
+            if value is None or value in related:
+                field.set_cached_value(obj, related.get(value))
+    return objects
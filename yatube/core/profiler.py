@@ -0,0 +1,171 @@
+"""Профилирование отдельных запросов.
+
+Запрос профилируется, если его сделал сотрудник с параметром ?profile
+или в нём есть заголовок X-Profile с токеном profile_token (подписан
+SECRET_KEY, живёт PROFILER_TOKEN_MAX_AGE секунд) - так можно снять
+профиль анонимной страницы на боевом сервере. Обработка запроса идёт под
+cProfile, а обёртка выполнения SQL записывает каждый запрос к базе и его
+время.
+
+Снимок - пара файлов в PROFILER_DIR: <имя>.prof (pstats) и <имя>.json
+(запрос, статус, длительность и SQL). Хранится не больше PROFILER_KEEP
+последних снимков, старые удаляются при записи нового. Смотреть их -
+core.views.profiles.
+
+cProfile в процессе может работать только один, поэтому запрос, пришедший,
+пока профилируется другой, обрабатывается как обычно.
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+
+SALT = 'core.profiler'
+HEADER = 'HTTP_X_PROFILE'
+NAME_RE = re.compile(r'^[\w-]+$')
+
+_lock = threading.Lock()
+
+
+def profile_token():
+    return signing.TimestampSigner(salt=SALT).sign('profile')
+
+
+def check_token(token):
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=settings.PROFILER_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def wanted(request):
+    if HEADER in request.META:
+        return check_token(request.META[HEADER])
+    user = getattr(request, 'user', None)
+    return ('profile' in request.GET and user is not None
+            and user.is_staff)
+
+
+class QueryRecorder:
+    """Обёртка выполнения SQL, записывающая запросы и их время."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'ms': (time.perf_counter() - started) * 1000,
+            })
+
+
+def path_for(name, suffix):
+    return os.path.join(settings.PROFILER_DIR, name + suffix)
+
+
+def save(profile, meta):
+    """Записывает снимок и удаляет лишние старые. Возвращает имя."""
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+    name = '{:%Y%m%d%H%M%S%f}-{}'.format(datetime.now(),
+                                         uuid.uuid4().hex[:8])
+    profile.dump_stats(path_for(name, '.prof'))
+    with open(path_for(name, '.json'), 'w') as file:
+        json.dump(meta, file)
+    for old in names()[settings.PROFILER_KEEP:]:
+        for suffix in ('.json', '.prof'):
+            try:
+                os.remove(path_for(old, suffix))
+            except FileNotFoundError:
+                pass
+    return name
+
+
+def names():
+    """Имена снимков, новые первыми."""
+    try:
+        files = os.listdir(settings.PROFILER_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted((file[:-5] for file in files if file.endswith('.json')),
+                  reverse=True)
+
+
+def load_meta(name):
+    if not NAME_RE.match(name):
+        return None
+    try:
+        with open(path_for(name, '.json')) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def top_functions(name, limit):
+    """Функции с наибольшим суммарным временем (вместе с вызванными)."""
+    stats = pstats.Stats(path_for(name, '.prof'))
+    rows = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in (
+            stats.stats.items()):
+        rows.append({
+            'function': '{}:{}({})'.format(filename, line, function),
+            'calls': calls,
+            'total_ms': total * 1000,
+            'cumulative_ms': cumulative * 1000,
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:limit]
+
+
+def run(request, get_response):
+    """Обрабатывает запрос под профилировщиком и сохраняет снимок."""
+    profile = cProfile.Profile()
+    recorder = QueryRecorder()
+    started = time.perf_counter()
+    response = None
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = profile.runcall(get_response, request)
+        return response
+    finally:
+        name = save(profile, {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': getattr(response, 'status_code', None),
+            'ms': (time.perf_counter() - started) * 1000,
+            'user': getattr(getattr(request, 'user', None), 'username', ''),
+            'created': time.time(),
+            'queries': recorder.queries,
+        })
+        if response is not None:
+            response['X-Profile-Id'] = name
+
+
+def profile_request(request, get_response):
+    """Профилирует запрос, если его об этом просили и профилировщик
+    свободен."""
+    if not wanted(request) or not _lock.acquire(blocking=False):
+        return get_response(request)
+    try:
+        return run(request, get_response)
+    finally:
+        _lock.release()
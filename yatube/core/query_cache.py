@@ -0,0 +1,164 @@
+"""Кеш результатов запросов ORM.
+
+Включается явно: ``Post.objects.filter(...).cached()`` (или
+``.cached(timeout)``). Результат кладётся в общий кеш под ключом из
+SQL запроса, его параметров и токенов версий всех таблиц, которые
+встречаются в SQL после FROM и JOIN. Запрос к таблице, не подключённой
+вызовом register(), не кешируется.
+
+Токен версии таблицы меняет обёртка выполнения SQL: любой INSERT,
+UPDATE или DELETE в подключённую таблицу - save(), update(),
+bulk_create() или сырой SQL - меняет токен сразу и, если запись была
+в транзакции, ещё раз после коммита. Старые записи при этом не
+удаляются, а просто перестают находиться.
+
+Внутри atomic-блоков результаты только читаются из кеша, но не
+кладутся в него: транзакция может видеть свои незакоммиченные данные
+или старый снимок базы. Своя запись в транзакции сразу меняет токен,
+поэтому следующий запрос к таблице идёт в базу. В TestCase, где весь
+тест - одна транзакция, кеш поэтому никогда не заполняется и тесты
+видят ровно то, что в базе.
+
+Токены таблиц должны меняться для всех воркеров сразу, поэтому и токены,
+и результаты живут только в общем для процессов кеше default
+(core.cache.shared_cache). Если он в памяти процесса, cached() ничего
+не кеширует и запросы всегда идут в базу.
+"""
+import hashlib
+import re
+import uuid
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+
+from .cache import NO_CACHE, shared_cache
+
+QUERY_CACHE_TIMEOUT = 60
+VERSION_KEY = 'query_cache:table:{}'
+RESULT_KEY = 'query_cache:{}:{}'
+TABLES_RE = re.compile(r'\b(?:FROM|JOIN)\s+"(\w+)"', re.IGNORECASE)
+WRITE_RE = re.compile(
+    r'^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+"(\w+)"',
+    re.IGNORECASE,
+)
+
+VERSIONED_TABLES = set()
+
+
+def register(model):
+    """Включает учёт версий таблицы модели."""
+    VERSIONED_TABLES.add(model._meta.db_table)
+    return model
+
+
+def new_token():
+    return uuid.uuid4().hex
+
+
+def bump(tables):
+    shared_cache().set_many({VERSION_KEY.format(table): new_token()
+                             for table in tables}, timeout=None)
+
+
+def get_tokens(tables):
+    cache = shared_cache()
+    keys = [VERSION_KEY.format(table) for table in tables]
+    found = cache.get_many(keys)
+    missing = {key: new_token() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def track_writes(execute, sql, params, many, context):
+    """Обёртка выполнения SQL: меняет токен таблицы после записи."""
+    result = execute(sql, params, many, context)
+    match = WRITE_RE.match(sql)
+    if match and match.group(1) in VERSIONED_TABLES:
+        tables = [match.group(1)]
+        bump(tables)
+        if context['connection'].in_atomic_block:
+            transaction.on_commit(lambda: bump(tables),
+                                  using=context['connection'].alias)
+    return result
+
+
+def install(connection, **kwargs):
+    """Подключает track_writes к соединению (сигнал connection_created)."""
+    if track_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_writes)
+
+
+def result_key(kind, queryset):
+    """Ключ результата или None, если запрос нельзя кешировать."""
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return None
+    tables = sorted(set(TABLES_RE.findall(sql)))
+    if not tables or not VERSIONED_TABLES.issuperset(tables):
+        return None
+    digest = hashlib.md5(repr((
+        queryset.db, ' '.join(sql.split()), params, get_tokens(tables),
+    )).encode()).hexdigest()
+    return RESULT_KEY.format(kind, digest)
+
+
+class CachedQuerySet(models.QuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_timeout = None
+
+    def cached(self, timeout=QUERY_CACHE_TIMEOUT):
+        clone = self._chain()
+        clone._cache_timeout = timeout
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_timeout = self._cache_timeout
+        return clone
+
+    def from_cache(self, kind, load):
+        """Результат load() из кеша; в atomic-блоке кеш не пополняется."""
+        cache = shared_cache()
+        if cache is NO_CACHE:
+            return load()
+        key = result_key(kind, self)
+        if key is None:
+            return load()
+        result = cache.get(key)
+        if result is None:
+            result = load()
+            if not connections[self.db].in_atomic_block:
+                cache.set(key, result, self._cache_timeout)
+        return result
+
+    def _fetch_all(self):
+        if self._cache_timeout is None or self._result_cache is not None:
+            return super()._fetch_all()
+        self._result_cache = self.from_cache(
+            'rows', lambda: list(self._iterable_class(self))
+        )
+        self.attach_known_related()
+        if self._prefetch_related_lookups and not self._prefetch_done:
+            self._prefetch_related_objects()
+
+    def attach_known_related(self):
+        """Связанные объекты, известные queryset (post.comments.all() знает
+        свой post), подставляются заново, а не берутся копиями из кеша."""
+        for field, objects in self._known_related_objects.items():
+            for row in self._result_cache:
+                if isinstance(row, self.model):
+                    related = objects.get(getattr(row, field.attname))
+                    if related is not None:
+                        field.set_cached_value(row, related)
+
+    def count(self):
+        if self._cache_timeout is None or self._result_cache is not None:
+            return super().count()
+        return self.from_cache('count', super().count)
+
+
+CachedManager = models.Manager.from_queryset(CachedQuerySet)
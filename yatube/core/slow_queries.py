@@ -0,0 +1,217 @@
+"""Журнал медленных запросов к базе.
+
+Обёртка выполнения SQL (подключается к каждому соединению, как
+core.query_cache) замеряет каждый запрос и всё, что дольше
+SLOW_QUERY_THRESHOLD_MS миллисекунд, записывает вместе с параметрами,
+именем view (URL name, см. core.middleware.slow_queries) и строкой кода
+проекта, откуда запрос пришёл. Для SELECT на SQLite один раз на отпечаток
+снимается EXPLAIN QUERY PLAN: строки SCAN в нём - полный проход по
+таблице без индекса.
+
+Среди параметров бывают хеши паролей, данные сессий и личные данные,
+поэтому по умолчанию в запись попадают только их типы; значения пишутся
+лишь при SLOW_QUERY_LOG_PARAMS = True (для отладки на своей машине).
+
+Отпечаток запроса - SQL с убранными литералами и свёрнутыми списками
+IN (...), так что запросы, отличающиеся только значениями, считаются
+одним. В процессе хранятся последние SLOW_QUERY_BUFFER записей и сводка
+по отпечаткам; кроме того, каждая запись дописывается строкой JSON
+в SLOW_QUERY_LOG, который `manage.py slow_queries` сводит по
+отпечаткам для всех процессов сразу.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from collections import deque
+
+from django.conf import settings
+
+PARAMS_LIMIT = 500
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+PROJECT_DIR = settings.BASE_DIR + os.sep
+DB_LAYER = os.sep + os.path.join('django', 'db', '')
+
+_local = threading.local()
+_lock = threading.Lock()
+_recent = deque(maxlen=settings.SLOW_QUERY_BUFFER)
+_summary = {}
+
+
+def fingerprint(sql):
+    normalized = STRING_RE.sub('?', sql)
+    normalized = NUMBER_RE.sub('?', normalized)
+    normalized = IN_LIST_RE.sub('IN (...)', normalized)
+    normalized = ' '.join(normalized.split())
+    return hashlib.md5(normalized.encode()).hexdigest()[:12], normalized
+
+
+def origin():
+    """Последний кадр кода проекта перед входом в django.db: обёртки
+    выполнения SQL вызываются уже изнутри него и не считаются."""
+    found = ''
+    for frame in traceback.extract_stack():
+        if DB_LAYER in frame.filename:
+            break
+        if frame.filename.startswith(PROJECT_DIR):
+            found = '{}:{} in {}'.format(frame.filename[len(PROJECT_DIR):],
+                                         frame.lineno, frame.name)
+    return found
+
+
+def bind(request):
+    _local.request = request
+
+
+def unbind():
+    _local.request = None
+
+
+def view_name():
+    request = getattr(_local, 'request', None)
+    if request is None:
+        return ''
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else request.path
+
+
+def explain(connection, sql, params):
+    """План SQLite на отдельном курсоре, мимо обёрток выполнения."""
+    if connection.vendor != 'sqlite' or not sql.lstrip().upper().startswith(
+            'SELECT'):
+        return []
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+    except Exception:
+        return []
+    finally:
+        cursor.close()
+
+
+def write_log(entry):
+    path = settings.SLOW_QUERY_LOG
+    if not path:
+        return
+    line = json.dumps(entry, default=str) + '\n'
+    with _lock:
+        try:
+            if os.path.getsize(path) > settings.SLOW_QUERY_LOG_MAX_BYTES:
+                os.replace(path, path + '.1')
+        except FileNotFoundError:
+            pass
+        with open(path, 'a') as file:
+            file.write(line)
+
+
+def redact(params, many):
+    """Параметры для записи: значения только при SLOW_QUERY_LOG_PARAMS,
+    иначе типы (или число наборов для executemany)."""
+    if params is None:
+        return ''
+    if settings.SLOW_QUERY_LOG_PARAMS:
+        return repr(params)[:PARAMS_LIMIT]
+    if many:
+        return '<{} наборов>'.format(len(params)) if hasattr(
+            params, '__len__') else '<наборы>'
+    if isinstance(params, dict):
+        types = {name: type(value).__name__
+                 for name, value in params.items()}
+    else:
+        types = [type(value).__name__ for value in params]
+    return repr(types)[:PARAMS_LIMIT]
+
+
+def record(connection, sql, params, many, ms):
+    key, normalized = fingerprint(sql)
+    with _lock:
+        known = _summary.get(key)
+    plan = known['plan'] if known else explain(
+        connection, sql, None if many else params
+    )
+    entry = {
+        'fingerprint': key,
+        'sql': sql,
+        'params': redact(params, many),
+        'ms': ms,
+        'view': view_name(),
+        'origin': origin(),
+        'plan': plan,
+        'time': time.time(),
+    }
+    with _lock:
+        _recent.append(entry)
+        add(_summary, key, normalized, entry)
+    write_log(entry)
+
+
+def add(rows, key, normalized, entry):
+    row = rows.setdefault(key, {
+        'fingerprint': key, 'sql': normalized, 'count': 0, 'total_ms': 0.0,
+        'max_ms': 0.0, 'plan': entry['plan'], 'views': set(),
+    })
+    row['count'] += 1
+    row['total_ms'] += entry['ms']
+    row['max_ms'] = max(row['max_ms'], entry['ms'])
+    row['views'].add(entry['view'])
+
+
+def track_slow(execute, sql, params, many, context):
+    """Обёртка выполнения SQL: записывает запросы дольше порога."""
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ms = (time.perf_counter() - started) * 1000
+        if ms >= threshold:
+            record(context['connection'], sql, params, many, ms)
+
+
+def install(connection, **kwargs):
+    """Подключает track_slow к соединению (сигнал connection_created)."""
+    if track_slow not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_slow)
+
+
+def recent():
+    with _lock:
+        return list(_recent)
+
+
+def ranked(rows):
+    """Строки сводки, самые затратные первыми."""
+    return sorted((dict(row, views=sorted(row['views'])) for row in rows),
+                  key=lambda row: row['total_ms'], reverse=True)
+
+
+def summary():
+    """Сводка процесса по отпечаткам."""
+    with _lock:
+        return ranked(_summary.values())
+
+
+def clear():
+    with _lock:
+        _recent.clear()
+        _summary.clear()
+
+
+def summarize_log(lines):
+    """Сводка строк журнала по отпечаткам."""
+    rows = {}
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        add(rows, *fingerprint(entry['sql']), entry)
+    return ranked(rows.values())
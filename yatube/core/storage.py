@@ -0,0 +1,64 @@
+import gzip
+import io
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.ico', '.json', '.txt', '.html', '.xml',
+)
+MIN_COMPRESS_SIZE = 256
+# Сжатая копия сохраняется, только если она меньше оригинала хотя бы на 5%.
+MIN_COMPRESS_RATIO = 0.95
+
+
+def gzip_compress(data):
+    """Сжимает gzip без метки времени, чтобы результат был воспроизводимым."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb',
+                       compresslevel=9, mtime=0) as f:
+        f.write(data)
+    return buffer.getvalue()
+
+
+def brotli_compress(data):
+    return brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хеширует имена статики и складывает рядом .gz и .br копии файлов.
+
+    Сжатие выполняется один раз во время collectstatic, при отдаче файлов
+    ничего не пересжимается.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        if not os.path.isfile(path):
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        compressors = [('.gz', gzip_compress)]
+        if brotli is not None:
+            compressors.append(('.br', brotli_compress))
+        for suffix, compressor in compressors:
+            compressed = compressor(data)
+            if len(compressed) < len(data) * MIN_COMPRESS_RATIO:
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
@@ -0,0 +1,11 @@
+"""Фоновые задачи приложения core для `manage.py runworker`."""
+from .jobs import task
+
+from . import mail
+
+
+@task(every=60)
+def send_outbox():
+    """Отправляет накопившиеся письма. Кроме запуска по расписанию (для
+    отложенных повторов) задачу ставит в очередь сам OutboxBackend."""
+    mail.send_all()
@@ -0,0 +1,42 @@
+"""Запуск тестов `manage.py test` с файлами кеша во временном каталоге.
+
+Тесты идут с тем же общим кешем, что задан в settings.CACHES, но файлы
+SQLiteCache и журналы TieredCache лежат во временном каталоге и
+удаляются после прогона, так что тесты не видят и не портят кеш сайта.
+Процессы, которые тесты запускают через fork, видят те же файлы.
+"""
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def temporary_caches(caches, directory):
+    """Копия caches, где все файлы кешей лежат в directory."""
+    caches = copy.deepcopy(caches)
+    for alias, config in caches.items():
+        if config['BACKEND'] == 'core.cache.SQLiteCache':
+            config['LOCATION'] = os.path.join(directory, alias + '.sqlite3')
+        elif config['BACKEND'] == 'core.cache.TieredCache':
+            config['OPTIONS']['CHANGE_LOG'] = os.path.join(directory,
+                                                           alias + '.log')
+    return caches
+
+
+class SharedCacheRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='yatube-cache-')
+        self.cache_settings = override_settings(
+            CACHES=temporary_caches(settings.CACHES, self.cache_dir)
+        )
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,320 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import (Client, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from ..cache import (ChangeLog, FrequencySketch, SQLiteCache, TinyLFUCache,
+                     key_prefix)
+from ..checks import check_shared_cache
+from ..management.commands.cache_staleness import measure, tiered_caches
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_cache(name, **options):
+    return SQLiteCache(os.path.join(TEMP_DIR, name),
+                       {'OPTIONS': options})
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.cache = make_cache('cache.sqlite3')
+        self.cache.clear()
+
+    def test_get_set_delete(self):
+        """Базовые операции ведут себя как у встроенных бэкендов."""
+        self.assertIsNone(self.cache.get('missing'))
+        self.cache.set('key', {'a': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'a': [1, 2]})
+        self.assertTrue(self.cache.has_key('key'))
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('zero', 1, timeout=0)
+        self.assertFalse(self.cache.has_key('zero'))
+
+    def test_expiry(self):
+        """Истёкшая запись не возвращается, touch продлевает срок."""
+        self.cache.set('short', 1, timeout=0.05)
+        self.cache.set('long', 2, timeout=0.05)
+        self.assertTrue(self.cache.touch('long', timeout=60))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('long'), 2)
+        self.assertTrue(self.cache.add('short', 3))
+
+    def test_many(self):
+        """get_many и set_many работают одним запросом на пачку."""
+        data = {'key{}'.format(i): i for i in range(1000)}
+        self.assertEqual(self.cache.set_many(data), [])
+        self.assertEqual(self.cache.get_many(list(data) + ['missing']),
+                         data)
+        self.cache.delete_many(list(data)[:500])
+        self.assertEqual(len(self.cache.get_many(list(data))), 500)
+
+    def test_incr(self):
+        """incr и decr меняют число, для отсутствующего ключа - ошибка."""
+        self.cache.set('counter', 10)
+        self.assertEqual(self.cache.incr('counter', 5), 15)
+        self.assertEqual(self.cache.decr('counter'), 14)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction(self):
+        """Сверх бюджета вытесняются давно не читанные записи."""
+        cache = make_cache('small.sqlite3', MAX_BYTES=20 * 1024,
+                           TOUCH_INTERVAL=0)
+        cache.clear()
+        for i in range(10):
+            cache.set('key{}'.format(i), b'x' * 1024)
+            time.sleep(0.001)
+        for i in range(10, 40):
+            cache.get('key0')
+            cache.set('key{}'.format(i), b'x' * 1024)
+        self.assertLessEqual(cache.total(cache.connection), 20 * 1024)
+        self.assertEqual(cache.get('key0'), b'x' * 1024)
+        self.assertIsNone(cache.get('key1'))
+        self.assertIsNotNone(cache.get('key39'))
+
+    def test_shared_between_processes(self):
+        """Запись видна другим процессам, incr атомарен между ними."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment,
+                            args=(self.cache.path, 200))
+            for _ in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 600)
+
+
+class TinyLFUCacheTests(SimpleTestCase):
+    def make_cache(self, max_bytes=10 * 1024):
+        return TinyLFUCache(self.id(), {'OPTIONS': {'MAX_BYTES': max_bytes,
+                                                    'SKETCH_WIDTH': 256}})
+
+    def test_basic_operations(self):
+        """Базовые операции ведут себя как у LocMemCache."""
+        cache = self.make_cache()
+        cache.set('key', [1, 2])
+        self.assertEqual(cache.get('key'), [1, 2])
+        self.assertFalse(cache.add('key', 'other'))
+        self.assertEqual(cache.get_many(['key', 'missing']), {'key': [1, 2]})
+        cache.set('counter', 1)
+        self.assertEqual(cache.incr('counter', 2), 3)
+        self.assertTrue(cache.delete('key'))
+        self.assertIsNone(cache.get('key'))
+        cache.set('short', 1, timeout=0.05)
+        time.sleep(0.1)
+        self.assertFalse(cache.has_key('short'))
+
+    def test_byte_budget(self):
+        """Объём записей не превышает бюджета, слишком большое значение
+        не кладётся вовсе."""
+        cache = self.make_cache(max_bytes=4 * 1024)
+        for i in range(20):
+            cache.get('page{}'.format(i))
+            cache.get('page{}'.format(i))
+            cache.set('page{}'.format(i), b'x' * 1000)
+        self.assertLessEqual(cache.store.bytes, 4 * 1024)
+        cache.set('huge', b'x' * 10 * 1024)
+        self.assertIsNone(cache.get('huge'))
+
+    def test_admission_keeps_hot_keys(self):
+        """Редкий большой ключ не вытесняет часто читаемые мелкие,
+        а ставший популярным - вытесняет."""
+        cache = self.make_cache(max_bytes=2 * 1024)
+        for i in range(10):
+            cache.set('hot:{}'.format(i), b'x' * 100)
+        for _ in range(5):
+            cache.get_many(['hot:{}'.format(i) for i in range(10)])
+        cache.get('page:big')
+        cache.set('page:big', b'y' * 1500)
+        self.assertIsNone(cache.get('page:big'))
+        self.assertEqual(len(cache.get_many(
+            ['hot:{}'.format(i) for i in range(10)])), 10)
+        for _ in range(10):
+            cache.get('page:big')
+        cache.set('page:big', b'y' * 1500)
+        self.assertEqual(cache.get('page:big'), b'y' * 1500)
+
+    def test_add_to_full_cache_always_stores(self):
+        """add отсутствующего ключа в заполненный горячими ключами кеш
+        кладёт значение: блокировка на add берётся."""
+        cache = self.make_cache(max_bytes=2 * 1024)
+        keys = ['hot:{}'.format(i) for i in range(300)]
+        for key in keys:
+            cache.set(key, key)
+        for _ in range(5):
+            cache.get_many(keys)
+        self.assertGreater(cache.store.bytes, 2 * 1024 - 50)
+        token = 'holder-' + 'x' * 50
+        self.assertTrue(cache.add('lock', token))
+        self.assertEqual(cache.get('lock'), token)
+        self.assertFalse(cache.add('lock', 'other holder'))
+
+    def test_stats_by_prefix(self):
+        """Попадания, промахи и отказы считаются по префиксу ключа."""
+        cache = self.make_cache(max_bytes=1024)
+        cache.set('auth:user:1', 'user')
+        cache.get('auth:user:1')
+        cache.get('auth:user:2')
+        cache.set('page.big', b'x' * 2048)
+        stats = {row['prefix']: row for row in cache.stats()}
+        self.assertEqual(stats['auth']['hits'], 1)
+        self.assertEqual(stats['auth']['misses'], 1)
+        self.assertEqual(stats['auth']['entries'], 1)
+        self.assertEqual(stats['auth']['hit_rate'], 0.5)
+        self.assertEqual(stats['page']['rejections'], 1)
+        self.assertEqual(cache.hot_set()[0]['key'], ':1:auth:user:1')
+
+    def test_key_prefix(self):
+        """Префиксы Django без разделителя распознаются целиком."""
+        self.assertEqual(
+            key_prefix('django.contrib.sessions.cached_dbabc123'),
+            'django.contrib.sessions.cached_db',
+        )
+        self.assertEqual(key_prefix('follow_graph:7'), 'follow_graph')
+        self.assertEqual(key_prefix('plain'), 'plain')
+
+    def test_sketch_aging(self):
+        """Частоты в sketch насыщаются и стареют."""
+        sketch = FrequencySketch(64)
+        for _ in range(20):
+            sketch.increment('key')
+        self.assertEqual(sketch.frequency('key'), 15)
+        sketch.reset()
+        self.assertEqual(sketch.frequency('key'), 7)
+
+
+class CacheStatsViewTests(TestCase):
+    def test_staff_only(self):
+        """Статистику кеша видит только персонал."""
+        User = get_user_model()
+        client = Client()
+        client.force_login(User.objects.create_user(username='user'))
+        url = reverse('cache_stats')
+        self.assertEqual(client.get(url).status_code, 302)
+        client.force_login(User.objects.create_user(username='staff',
+                                                    is_staff=True))
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('stats', response.context['backends'][0])
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(
+            CACHES=tiered_caches(self.directory, poll_interval=0,
+                                 l1_timeout=60)
+        )
+        self.settings.enable()
+        self.cache = caches['default']
+        self.cache.clear()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_read_through(self):
+        """Промах L1 заполняется из L2, запись и удаление идут в оба."""
+        caches['shared'].set('key', 'from l2')
+        self.assertEqual(self.cache.get('key'), 'from l2')
+        self.assertEqual(caches['local'].get('key'), 'from l2')
+        self.cache.set('key', 'new')
+        self.assertEqual(caches['shared'].get('key'), 'new')
+        self.cache.delete('key')
+        self.assertIsNone(caches['local'].get('key'))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_fill_keeps_l2_expiry(self):
+        """Запись из L2 живёт в L1 не дольше, чем ей осталось в L2."""
+        caches['shared'].set('short', 'value', timeout=0.2)
+        caches['shared'].set('long', 'value', timeout=None)
+        self.assertEqual(self.cache.get_many(['short', 'long']),
+                         {'short': 'value', 'long': 'value'})
+        time.sleep(0.3)
+        self.assertIsNone(caches['local'].get('short'))
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(caches['local'].get('long'), 'value')
+
+    def test_versions(self):
+        """Версии ключей одинаковы в обоих уровнях."""
+        self.cache.set('key', 'v1')
+        self.cache.get('key')
+        self.assertEqual(self.cache.incr_version('key'), 2)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', version=2), 'v1')
+        self.assertIsNone(caches['local'].get('key', version=1))
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
+
+    def test_invalidation_from_other_process(self):
+        """Запись другого процесса сбрасывает ключ в L1 этого."""
+        self.cache.set('key', 'old')
+        self.assertEqual(self.cache.get('key'), 'old')
+        process = multiprocessing.get_context('fork').Process(
+            target=lambda: caches['default'].set('key', 'new'))
+        process.start()
+        process.join()
+        self.assertEqual(caches['local'].get('key'), 'old')
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_log_rotation_clears_l1(self):
+        """После ротации журнала читатель очищает L1 целиком."""
+        path = os.path.join(self.directory, 'rotation.log')
+        writer = ChangeLog(path, max_bytes=64)
+        reader = ChangeLog(path, max_bytes=64)
+        writer.publish('first', 1)
+        self.assertEqual(reader.poll(0), [])
+        process = multiprocessing.get_context('fork').Process(
+            target=lambda: [writer.publish('key{}'.format(i), 1)
+                            for i in range(5)])
+        process.start()
+        process.join()
+        self.assertIsNone(reader.poll(0))
+
+    def test_staleness_is_bounded(self):
+        """Несколько процессов видят запись не позже интервала опроса
+        журнала, хотя читают в основном из L1."""
+        report = measure(readers=3, writes=15, interval=0.02,
+                         poll_interval=0.05)
+        self.assertTrue(report['converged'])
+        self.assertLess(report['max_lag'], 0.05 + 0.5)
+        self.assertGreater(report['l1_hit_rate'], 0.5)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def test_process_local_default_warns(self):
+        """Кеш default в памяти процесса даёт предупреждение core.W001."""
+        self.assertEqual(check_shared_cache(None), [])
+        local = {'default': {'BACKEND': 'core.cache.TinyLFUCache'}}
+        with override_settings(CACHES=local):
+            self.assertEqual([warning.id for warning
+                              in check_shared_cache(None)], ['core.W001'])
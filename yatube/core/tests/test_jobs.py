@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import jobs
+from ..models import Job, JobLease
+
+CALLS = []
+
+
+@jobs.task
+def record(value):
+    CALLS.append(value)
+
+
+@jobs.task(max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+@override_settings(JOB_RETRY_DELAY=10, JOB_RETRY_MAX_DELAY=60)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+        self.worker = jobs.Worker(concurrency=2, mode='sync',
+                                  poll_interval=0, leader=False)
+
+    def test_delay_and_run(self):
+        """Задача из delay() выполняется воркером и помечается выполненной."""
+        job = record.delay('a')
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(self.worker.run(burst=True), 1)
+        self.assertEqual(CALLS, ['a'])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+
+    def test_priority_order(self):
+        """Задачи с большим приоритетом выполняются раньше."""
+        jobs.enqueue(record, ['low'])
+        jobs.enqueue(record, ['high'], priority=10)
+        jobs.enqueue(record, ['later'],
+                     run_at=timezone.now() + timedelta(hours=1))
+        self.worker.concurrency = 1
+        self.worker.run(burst=True)
+        self.assertEqual(CALLS, ['high', 'low'])
+
+    def test_dedup_key(self):
+        """Пока задача ждёт в очереди, дубль с тем же ключом не создаётся."""
+        first = jobs.enqueue(record, ['x'], dedup_key='k')
+        second = jobs.enqueue(record, ['y'], dedup_key='k')
+        self.assertEqual(first.id, second.id)
+        self.worker.run(burst=True)
+        third = jobs.enqueue(record, ['z'], dedup_key='k')
+        self.assertNotEqual(third.id, first.id)
+        self.assertEqual(CALLS, ['x'])
+
+    def test_retry_with_backoff(self):
+        """Упавшая задача откладывается с растущей задержкой, а после
+        последней попытки остаётся проваленной."""
+        job = explode.delay()
+        before = timezone.now()
+        self.worker.run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('boom', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        self.worker.run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_backoff_is_capped(self):
+        """Задержка удваивается, но не превышает JOB_RETRY_MAX_DELAY."""
+        self.assertEqual(
+            [jobs.backoff(attempt) for attempt in range(1, 6)],
+            [10, 20, 40, 60, 60],
+        )
+
+    def test_unknown_task_fails(self):
+        """Незарегистрированная задача не выполняется и не роняет воркер."""
+        job = jobs.enqueue('core.tests.missing', max_attempts=1)
+        self.worker.run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('core.tests.missing', job.last_error)
+
+    def test_expired_lease_is_requeued(self):
+        """Задача упавшего воркера возвращается в очередь."""
+        job = record.delay('lost')
+        jobs.claim('dead-worker')
+        Job.objects.filter(id=job.id).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(jobs.requeue_expired(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.locked_by, '')
+
+    def test_claim_is_exclusive(self):
+        """Одну задачу не могут забрать два воркера."""
+        record.delay('once')
+        self.assertEqual(len(jobs.claim('first')), 1)
+        self.assertEqual(jobs.claim('second'), [])
+
+
+class LeaderTests(TestCase):
+    def test_single_leader(self):
+        """Аренду держит один воркер, пока она не истечёт."""
+        self.assertTrue(jobs.acquire_lease('periodic', 'a', 30))
+        self.assertFalse(jobs.acquire_lease('periodic', 'b', 30))
+        self.assertTrue(jobs.acquire_lease('periodic', 'a', 30))
+        JobLease.objects.filter(name='periodic').update(
+            expires=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertTrue(jobs.acquire_lease('periodic', 'b', 30))
+        jobs.release_lease('periodic', 'b')
+        self.assertFalse(JobLease.objects.exists())
+
+    def test_periodic_once_per_period(self):
+        """Периодическая задача ставится в очередь раз за период."""
+        jobs.autodiscover()
+        self.assertIn('posts.tasks.score_hot_posts', jobs.PERIODIC)
+        now = timezone.now()
+        first = jobs.schedule_periodic(now)
+        self.assertEqual(len(first), len(jobs.PERIODIC))
+        Job.objects.update(status=Job.DONE)
+        self.assertEqual(jobs.schedule_periodic(now), [])
+        self.assertEqual(
+            len(jobs.schedule_periodic(now + timedelta(days=1))),
+            len(jobs.PERIODIC),
+        )
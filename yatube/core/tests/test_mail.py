@@ -0,0 +1,124 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..jobs import Worker
+from ..mail import RateLimiter, deserialize, send_all, serialize
+from ..models import Job, OutboxMessage
+
+User = get_user_model()
+
+
+class CountingBackend(EmailBackend):
+    """locmem-бэкенд, который считает открытые соединения и не
+    принимает письма на адреса с bad."""
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any('bad' in address for address in message.to):
+                raise ConnectionError('рассылка отклонена')
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.OutboxBackend',
+    OUTBOX_EMAIL_BACKEND='core.tests.test_mail.CountingBackend',
+    OUTBOX_RATE=0,
+    OUTBOX_BATCH_SIZE=100,
+    OUTBOX_MAX_ATTEMPTS=2,
+)
+class OutboxTests(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+        mail.outbox = []
+
+    def test_password_reset_is_queued(self):
+        """Восстановление пароля не ждёт почту: письмо ставится в очередь
+        и уходит воркером."""
+        User.objects.create_user(username='user', email='user@test.com',
+                                 password='secret-password')
+        response = Client().post(reverse('users:password_reset'),
+                                 {'email': 'user@test.com'})
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(mail.outbox, [])
+        row = OutboxMessage.objects.get()
+        self.assertEqual(row.status, OutboxMessage.QUEUED)
+        self.assertEqual(row.to, 'user@test.com')
+        self.assertTrue(Job.objects.filter(name='core.tasks.send_outbox',
+                                           status=Job.QUEUED).exists())
+        Worker(mode='sync', poll_interval=0, leader=False).run(burst=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@test.com'])
+        row.refresh_from_db()
+        self.assertEqual(row.status, OutboxMessage.SENT)
+        self.assertIsNotNone(row.sent)
+
+    def test_batch_uses_one_connection(self):
+        """Пачка писем отправляется через одно соединение."""
+        messages = [
+            EmailMessage('Дайджест', 'Текст', 'from@test.com',
+                         ['reader{}@test.com'.format(i)])
+            for i in range(5)
+        ]
+        self.assertEqual(get_connection().send_messages(messages), 5)
+        self.assertEqual(Job.objects.filter(
+            name='core.tasks.send_outbox').count(), 1)
+        self.assertEqual(send_all(), (5, 0))
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_failed_message_is_retried(self):
+        """Неотправленное письмо повторяется с задержкой, после последней
+        попытки остаётся со статусом failed, остальные письма уходят."""
+        send_mail('Тема', 'Текст', 'from@test.com', ['bad@test.com'])
+        send_mail('Тема', 'Текст', 'from@test.com', ['good@test.com'])
+        self.assertEqual(send_all(), (1, 1))
+        bad = OutboxMessage.objects.get(to='bad@test.com')
+        self.assertEqual(bad.status, OutboxMessage.QUEUED)
+        self.assertEqual(bad.attempts, 1)
+        self.assertIn('рассылка отклонена', bad.last_error)
+        self.assertGreater(bad.next_try, timezone.now())
+        OutboxMessage.objects.filter(id=bad.id).update(
+            next_try=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(send_all(), (0, 1))
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, OutboxMessage.FAILED)
+        self.assertEqual(send_all(), (0, 0))
+
+    def test_serialize_roundtrip(self):
+        """Письмо с html-версией и вложением восстанавливается из очереди."""
+        message = mail.EmailMultiAlternatives(
+            'Тема', 'Текст', 'from@test.com', ['to@test.com'],
+            cc=['cc@test.com'], headers={'X-Tag': 'digest'},
+        )
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.attach('data.bin', b'\x00\x01', 'application/octet-stream')
+        restored = deserialize(serialize(message))
+        self.assertEqual(restored.recipients(), message.recipients())
+        self.assertEqual(restored.alternatives,
+                         [('<p>Текст</p>', 'text/html')])
+        self.assertEqual(restored.attachments,
+                         [('data.bin', b'\x00\x01',
+                           'application/octet-stream')])
+        self.assertEqual(restored.extra_headers, {'X-Tag': 'digest'})
+
+    def test_rate_limiter(self):
+        """Ограничитель выдерживает интервал между письмами."""
+        limiter = RateLimiter(50)
+        started = time.monotonic()
+        for _ in range(4):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - started, 0.06)
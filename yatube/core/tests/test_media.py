@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(256)) * 16
+URL = settings.MEDIA_URL + 'posts/big.gif'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_ACCEL=None)
+class MediaServingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'big.gif'),
+                  'wb') as f:
+            f.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_full_file(self):
+        """Файл отдаётся целиком с ETag и Accept-Ranges."""
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_ranges(self):
+        """Range отдаёт только запрошенный отрезок."""
+        ranges = {
+            'bytes=0-9': (CONTENT[:10], 'bytes 0-9/4096'),
+            'bytes=4000-': (CONTENT[4000:], 'bytes 4000-4095/4096'),
+            'bytes=-6': (CONTENT[-6:], 'bytes 4090-4095/4096'),
+            'bytes=10-99999': (CONTENT[10:], 'bytes 10-4095/4096'),
+        }
+        for header, (body, content_range) in ranges.items():
+            with self.subTest(header=header):
+                response = self.client.get(URL, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(int(response['Content-Length']), len(body))
+
+    def test_unsatisfiable_range(self):
+        """Диапазон за пределами файла даёт 416."""
+        response = self.client.get(URL, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */4096')
+
+    def test_if_range_mismatch_returns_full_file(self):
+        """При устаревшем If-Range файл отдаётся целиком."""
+        response = self.client.get(URL, HTTP_RANGE='bytes=0-9',
+                                   HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_requests(self):
+        """If-None-Match и If-Modified-Since дают 304."""
+        response = self.client.get(URL)
+        etag = response['ETag']
+        response = self.client.get(URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(
+            URL, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_and_outside_files(self):
+        """Отсутствующий файл и выход за MEDIA_ROOT дают 404."""
+        for url in (settings.MEDIA_URL + 'posts/missing.gif',
+                    settings.MEDIA_URL + '../manage.py'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_accel_redirect(self):
+        """С MEDIA_ACCEL отдача файла передаётся прокси."""
+        with self.settings(MEDIA_ACCEL='x-accel-redirect'):
+            response = self.client.get(URL)
+            self.assertEqual(response['X-Accel-Redirect'],
+                             settings.MEDIA_ACCEL_PREFIX + 'posts/big.gif')
+            self.assertEqual(response.content, b'')
+        with self.settings(MEDIA_ACCEL='x-sendfile'):
+            response = self.client.get(URL)
+            self.assertEqual(
+                response['X-Sendfile'],
+                os.path.join(TEMP_MEDIA_ROOT, 'posts', 'big.gif'),
+            )
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+from .. import object_cache
+
+User = get_user_model()
+
+
+class ObjectCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Автор поста')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [Post.objects.create(text=f'Пост {i}', author=cls.user,
+                                         group=cls.group)
+                     for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        object_cache.deactivate()
+        cache.clear()
+
+    def test_get_by_pk_and_natural_key(self):
+        """Повторный поиск по pk и естественному ключу не ходит в базу."""
+        object_cache.get(User, username='Автор поста')
+        with self.assertNumQueries(0):
+            self.assertEqual(object_cache.get(User, pk=self.user.id),
+                             self.user)
+            self.assertEqual(object_cache.get(User, username='Автор поста'),
+                             self.user)
+        with self.assertRaises(Group.DoesNotExist):
+            object_cache.get(Group, slug='missing')
+
+    def test_get_many_reads_only_misses(self):
+        """get_many дочитывает из базы одним запросом только промахи."""
+        ids = [post.id for post in self.posts]
+        object_cache.get(Post, pk=ids[0])
+        with self.assertNumQueries(1):
+            found = object_cache.get_many(Post, ids + [0])
+        self.assertEqual(found, {post.id: post for post in self.posts})
+        with self.assertNumQueries(0):
+            object_cache.get_many(Post, ids)
+
+    def test_process_local_cache_is_bypassed(self):
+        """С кешем default в памяти процесса строки читаются из базы."""
+        local = {'default': {'BACKEND': 'core.cache.TinyLFUCache'}}
+        with override_settings(CACHES=local):
+            for _ in range(2):
+                with self.assertNumQueries(1):
+                    object_cache.get(Group, slug='group')
+            self.assertIsNone(cache.get(object_cache.row_key(
+                Group, self.group.pk)))
+
+    def test_save_invalidates(self):
+        """Сохранение строки сбрасывает её запись и ссылку по slug."""
+        object_cache.get(Group, slug='group')
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertEqual(object_cache.get(Group, slug='renamed').slug,
+                         'renamed')
+        with self.assertRaises(Group.DoesNotExist):
+            object_cache.get(Group, slug='group')
+
+    def test_identity_map(self):
+        """В пределах запроса одна строка - один и тот же объект."""
+        object_cache.activate()
+        first = object_cache.get(Post, pk=self.posts[0].id)
+        with self.assertNumQueries(0):
+            self.assertIs(object_cache.get(Post, pk=self.posts[0].id),
+                          first)
+        object_cache.deactivate()
+        self.assertIsNot(object_cache.get(Post, pk=self.posts[0].id), first)
+
+    def test_hydrate(self):
+        """hydrate подставляет автора и группу без JOIN и запросов."""
+        object_cache.get(User, pk=self.user.id)
+        object_cache.get(Group, pk=self.group.id)
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(0):
+            object_cache.hydrate(posts, 'author', 'group')
+            self.assertEqual({(post.author, post.group) for post in posts},
+                             {(self.user, self.group)})
+
+    def test_views_use_cache(self):
+        """Повторные страницы группы и профиля не ищут их заново:
+        остаётся только запрос карточек постов."""
+        client = Client()
+        group_url = reverse('posts:group_list', args=['group'])
+        profile_url = reverse('posts:profile', args=['Автор поста'])
+        client.get(group_url)
+        client.get(profile_url)
+        with self.assertNumQueries(1):
+            response = client.get(group_url)
+        self.assertEqual(response.context['group'], self.group)
+        self.assertEqual(len(response.context['page_obj']), 3)
+        response = Client().get(reverse('posts:post_edit',
+                                        args=[self.posts[0].id]))
+        self.assertEqual(response.status_code, 302)
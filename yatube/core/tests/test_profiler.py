@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import profiler
+
+User = get_user_model()
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(PROFILER_DIR=self.directory,
+                                          PROFILER_KEEP=2)
+        self.settings.enable()
+        self.staff = Client()
+        self.staff.force_login(User.objects.create_user(username='staff',
+                                                        is_staff=True))
+        self.url = reverse('posts:index')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        cache.clear()
+
+    def test_staff_request_is_profiled(self):
+        """Запрос сотрудника с ?profile сохраняется вместе с SQL."""
+        response = self.staff.get(self.url, {'profile': ''})
+        name = response['X-Profile-Id']
+        self.assertEqual(profiler.names(), [name])
+        meta = profiler.load_meta(name)
+        self.assertEqual(meta['status'], 200)
+        self.assertEqual(meta['user'], 'staff')
+        self.assertTrue(meta['queries'])
+        self.assertTrue(profiler.top_functions(name, 10))
+
+    def test_who_is_profiled(self):
+        """Без ?profile, не сотрудник или с плохим токеном - без профиля."""
+        user = Client()
+        user.force_login(User.objects.create_user(username='user'))
+        responses = [
+            self.staff.get(self.url),
+            user.get(self.url, {'profile': ''}),
+            Client().get(self.url, HTTP_X_PROFILE='bad'),
+        ]
+        for response in responses:
+            self.assertNotIn('X-Profile-Id', response)
+        response = Client().get(self.url,
+                                HTTP_X_PROFILE=profiler.profile_token())
+        self.assertIn('X-Profile-Id', response)
+
+    def test_rotation(self):
+        """Хранится не больше PROFILER_KEEP последних снимков."""
+        names = [self.staff.get(self.url, {'profile': i})['X-Profile-Id']
+                 for i in range(3)]
+        self.assertEqual(set(profiler.names()), set(names[1:]))
+
+    def test_browser(self):
+        """Список и снимок видны только сотрудникам."""
+        name = self.staff.get(self.url, {'profile': ''})['X-Profile-Id']
+        detail_url = reverse('profile_detail', args=[name])
+        self.assertEqual(Client().get(detail_url).status_code, 302)
+        response = self.staff.get(reverse('profiles'))
+        self.assertContains(response, name)
+        response = self.staff.get(detail_url)
+        self.assertTrue(response.context['functions'])
+        self.assertTrue(response.context['queries'])
+        self.assertEqual(
+            self.staff.get(reverse('profile_detail',
+                                   args=['..'])).status_code, 404
+        )
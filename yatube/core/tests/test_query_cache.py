@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from posts.models import Comment, Group, Post
+
+from ..models import Job
+
+User = get_user_model()
+
+
+class QueryCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.post = Post.objects.create(text='Пост', author=self.user,
+                                        group=self.group)
+
+    def tearDown(self):
+        cache.clear()
+
+    def posts(self):
+        return Post.objects.select_related('author').filter(
+            group=self.group
+        ).cached()
+
+    def test_repeat_query_is_cached(self):
+        """Повторный запрос и COUNT берутся из кеша."""
+        self.assertEqual(list(self.posts()), [self.post])
+        self.assertEqual(self.posts().count(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(list(self.posts()), [self.post])
+            self.assertEqual(self.posts().count(), 1)
+            self.assertEqual(list(self.posts())[0].author, self.user)
+
+    def test_process_local_cache_is_bypassed(self):
+        """С кешем default в памяти процесса запросы не кешируются."""
+        local = {'default': {'BACKEND': 'core.cache.TinyLFUCache'}}
+        with override_settings(CACHES=local):
+            for _ in range(2):
+                with self.assertNumQueries(1):
+                    self.assertEqual(list(self.posts()), [self.post])
+
+    def test_writes_bump_versions(self):
+        """save(), update() и удаление сразу видны кешированным запросам."""
+        list(self.posts())
+        other = Post.objects.create(text='Второй', author=self.user,
+                                    group=self.group)
+        self.assertEqual(set(self.posts()), {self.post, other})
+        Post.objects.filter(pk=other.pk).update(group=None)
+        self.assertEqual(list(self.posts()), [self.post])
+        self.user.delete()
+        self.assertEqual(list(self.posts()), [])
+
+    def test_transaction_does_not_fill_cache(self):
+        """В транзакции видны свои записи, а откат не оставляет их в кеше."""
+        list(self.posts())
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Post.objects.create(text='Черновик', author=self.user,
+                                    group=self.group)
+                self.assertEqual(len(self.posts()), 2)
+                raise RuntimeError
+        self.assertEqual(list(self.posts()), [self.post])
+
+    def test_known_related_objects(self):
+        """Комментарии из кеша ссылаются на тот же объект поста."""
+        Comment.objects.create(text='Комментарий', author=self.user,
+                               post=self.post)
+        list(self.post.comments.cached())
+        with self.assertNumQueries(0):
+            comment, = self.post.comments.cached()
+        self.assertIs(comment.post, self.post)
+
+    def test_unregistered_tables_are_not_cached(self):
+        """Запросы к таблицам без учёта версий идут в базу."""
+        queryset = Job.objects.all()
+        list(Post.objects.filter(pk__in=queryset.values('id')).cached())
+        with self.assertNumQueries(1):
+            list(Post.objects.filter(pk__in=queryset.values('id')).cached())
+
+
+class QueryCacheInTestCaseTests(TestCase):
+    def test_results_are_not_stored(self):
+        """В TestCase весь тест - транзакция, и кеш не заполняется."""
+        user = User.objects.create_user(username='author')
+        list(Post.objects.filter(author=user).cached())
+        Post.objects.create(text='Пост', author=user)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                len(Post.objects.filter(author=user).cached()), 1
+            )
+        cache.clear()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow
+
+from .. import slow_queries
+
+User = get_user_model()
+
+
+class SlowQueryTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.log = os.path.join(self.directory, 'slow.log')
+        self.settings = override_settings(SLOW_QUERY_THRESHOLD_MS=0,
+                                          SLOW_QUERY_LOG=self.log)
+        self.settings.enable()
+        slow_queries.clear()
+
+    def tearDown(self):
+        self.settings.disable()
+        slow_queries.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_fingerprint(self):
+        """Запросы, отличающиеся значениями, дают один отпечаток."""
+        first = slow_queries.fingerprint(
+            "SELECT * FROM t WHERE id IN (%s, %s) AND name = 'a' LIMIT 10"
+        )
+        second = slow_queries.fingerprint(
+            "SELECT * FROM t WHERE id IN (%s) AND name = 'b''c'  LIMIT 20"
+        )
+        self.assertEqual(first, second)
+
+    def test_records_view_origin_and_plan(self):
+        """Запись содержит view, строку кода и план запроса."""
+        user = User.objects.create_user(username='user')
+        Client().get(reverse('posts:profile', args=['user']))
+        views = {entry['view'] for entry in slow_queries.recent()}
+        self.assertIn('posts:profile', views)
+        slow_queries.clear()
+        list(Follow.objects.filter(author=user).values_list('user_id'))
+        entry, = slow_queries.recent()
+        self.assertTrue(entry['origin'].startswith(
+            os.path.join('core', 'tests', 'test_slow_queries.py')
+        ))
+        self.assertEqual(entry['view'], '')
+        self.assertTrue(entry['plan'])
+
+    def test_summary_and_log(self):
+        """Повторы сводятся по отпечатку и в процессе, и в журнале."""
+        for user_id in (1, 2, 3):
+            list(Follow.objects.filter(user_id=user_id))
+        top, = [row for row in slow_queries.summary()
+                if 'posts_follow' in row['sql']]
+        self.assertEqual(top['count'], 3)
+        out = StringIO()
+        call_command('slow_queries', log=self.log, stdout=out)
+        self.assertIn('{} 3 раз'.format(top['fingerprint']),
+                      out.getvalue().replace('  ', ' '))
+
+    def test_params_are_redacted(self):
+        """Значения параметров не пишутся, если их не включили явно."""
+        User.objects.create_user(username='secret-user', password='pass')
+        entry = slow_queries.recent()[-1]
+        self.assertNotIn('secret-user', entry['params'])
+        self.assertNotIn('pbkdf2', entry['params'])
+        self.assertIn('str', entry['params'])
+        with open(self.log) as log:
+            self.assertNotIn('secret-user', log.read())
+        with override_settings(SLOW_QUERY_LOG_PARAMS=True):
+            list(User.objects.filter(username='secret-user'))
+        self.assertIn('secret-user', slow_queries.recent()[-1]['params'])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=None)
+    def test_disabled(self):
+        """Без порога ничего не записывается."""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertEqual(slow_queries.recent(), [])
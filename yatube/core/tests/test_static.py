@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import (Client, RequestFactory, TestCase,
+                         override_settings)
+
+from ..middleware.static import PrecompressedStaticMiddleware
+from ..storage import brotli
+
+CSS_CONTENT = b'body { margin: 0; padding: 0; }\n' * 64
+
+TEMP_STATIC_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    STATICFILES_DIRS=[TEMP_STATIC_DIR],
+    STATIC_ROOT=TEMP_STATIC_ROOT,
+    STATICFILES_STORAGE='core.storage.CompressedManifestStaticFilesStorage',
+)
+class PrecompressedStaticTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_STATIC_DIR, 'css'))
+        with open(os.path.join(TEMP_STATIC_DIR, 'css', 'site.css'),
+                  'wb') as f:
+            f.write(CSS_CONTENT)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_DIR, ignore_errors=True)
+        shutil.rmtree(TEMP_STATIC_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.hashed_name = staticfiles_storage.stored_name('css/site.css')
+        self.url = settings.STATIC_URL + self.hashed_name
+        self.client = Client()
+
+    def test_collectstatic_creates_compressed_copies(self):
+        """collectstatic сохраняет хешированный файл и его сжатые копии."""
+        self.assertNotEqual(self.hashed_name, 'css/site.css')
+        path = os.path.join(TEMP_STATIC_ROOT, self.hashed_name)
+        self.assertTrue(os.path.isfile(path + '.gz'))
+        if brotli is not None:
+            self.assertTrue(os.path.isfile(path + '.br'))
+
+    def test_hashed_file_is_immutable(self):
+        """Хешированный файл отдаётся с вечным кешем."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(b''.join(response.streaming_content), CSS_CONTENT)
+
+    def test_precompressed_variant_by_accept_encoding(self):
+        """Сжатый вариант выбирается по Accept-Encoding."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        if brotli is not None:
+            response = self.client.get(self.url,
+                                       HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+        response = self.client.get(self.url,
+                                   HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_unhashed_file_has_short_cache(self):
+        """Файл без хеша в имени кешируется ненадолго."""
+        response = self.client.get(settings.STATIC_URL + 'css/site.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_missing_file_is_not_found(self):
+        """Несуществующий файл и выход за STATIC_ROOT не обслуживаются."""
+        middleware = PrecompressedStaticMiddleware(lambda request: None)
+        for name in ('css/missing.css', '../settings.py', ''):
+            with self.subTest(name=name):
+                request = RequestFactory().get(settings.STATIC_URL + name)
+                self.assertIsNone(middleware.serve(request, name))
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+from .. import tracing
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+
+
+class TracingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        with override_settings(MEDIA_ROOT=cls.media):
+            user = User.objects.create_user(username='author')
+            group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+            Post.objects.create(
+                text='Пост', author=user, group=group,
+                image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                         content_type='image/gif'),
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.media, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file = os.path.join(self.directory, 'traces.jsonl')
+        self.settings = override_settings(TRACING_SAMPLE_RATE=1.0,
+                                          TRACING_FILE=self.file,
+                                          MEDIA_ROOT=self.media)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        cache.clear()
+
+    def traces(self):
+        with open(self.file) as file:
+            return [json.loads(line)['resourceSpans'][0]['scopeSpans'][0]
+                    ['spans'] for line in file]
+
+    def test_request_spans(self):
+        """В трассе запроса есть view, SQL, шаблоны, кеш и миниатюры."""
+        response = Client().get(reverse('posts:group_list',
+                                        args=['group']))
+        spans, = self.traces()
+        names = {span['name'] for span in spans}
+        for name in ('GET /group/group/', 'middleware.request',
+                     'middleware.response', 'GroupPostsView.dispatch',
+                     'GroupPostsView.get_queryset',
+                     'GroupPostsView.get_context_data', 'db.query',
+                     'template.render', 'cache.get', 'thumbnail'):
+            self.assertIn(name, names)
+        templates = {attribute['value']['stringValue']
+                     for span in spans if span['name'] == 'template.render'
+                     for attribute in span['attributes']}
+        self.assertIn('posts/includes/post_list.html', templates)
+        ids = {span['spanId'] for span in spans}
+        root, = [span for span in spans if not span['parentSpanId']]
+        self.assertEqual(root['kind'], tracing.SERVER)
+        self.assertTrue(all(span['parentSpanId'] in ids
+                            for span in spans if span is not root))
+        self.assertEqual(response['traceparent'], '00-{}-{}-01'.format(
+            root['traceId'], root['spanId']
+        ))
+
+    def test_traceparent_is_continued(self):
+        """Трасса продолжает trace id и родителя из traceparent."""
+        Client().get(reverse('about:author'), HTTP_TRACEPARENT=(
+            '00-{}-00f067aa0ba902b7-01'.format(TRACE_ID)
+        ))
+        spans, = self.traces()
+        self.assertEqual({span['traceId'] for span in spans}, {TRACE_ID})
+        root, = [span for span in spans
+                 if span['parentSpanId'] == '00f067aa0ba902b7']
+        self.assertEqual(root['name'], 'GET /about/author/')
+
+    def test_sampling(self):
+        """Запросы вне выборки не пишутся и не меряются."""
+        with override_settings(TRACING_SAMPLE_RATE=0.0):
+            response = Client().get(reverse('about:author'))
+        self.assertNotIn('traceparent', response)
+        self.assertFalse(os.path.exists(self.file))
+        with tracing.span('outside') as span:
+            self.assertIsNone(span)
+
+    def test_instrument_without_jinja2(self):
+        """Без пакета Jinja2 инструментирование работает без его
+        шаблонов."""
+        missing = {'jinja2': None, 'django.template.backends.jinja2': None}
+        with mock.patch.dict(sys.modules, missing), \
+                mock.patch.object(tracing, 'patch') as patch:
+            tracing.instrument()
+        names = {call[0][0].__module__ for call in patch.call_args_list}
+        self.assertIn('django.template.base', names)
+        self.assertNotIn('django.template.backends.jinja2', names)
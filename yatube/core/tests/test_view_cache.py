@@ -0,0 +1,118 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..view_cache import cache_view, page_key
+
+CALLS = []
+
+
+def counting_view(request):
+    CALLS.append(request.path)
+    return HttpResponse('render {}'.format(len(CALLS)))
+
+
+@override_settings(VIEW_CACHE_BACKGROUND=False, VIEW_CACHE_STALE=60)
+class CacheViewTests(SimpleTestCase):
+    def setUp(self):
+        CALLS.clear()
+        self.view = cache_view(20, key_prefix='test')(counting_view)
+        self.request = RequestFactory().get('/page/')
+        self.key = page_key('test', self.request)
+
+    def tearDown(self):
+        cache.clear()
+
+    def expire(self):
+        response, delta, _ = cache.get(self.key)
+        cache.set(self.key, (response, delta, time.time() - 1))
+
+    def test_fresh_page_is_served_from_cache(self):
+        """Свежая страница считается один раз и получает max-age."""
+        first = self.view(self.request)
+        second = self.view(self.request)
+        self.assertEqual(len(CALLS), 1)
+        self.assertEqual(second.content, first.content)
+        self.assertIn('max-age=20', first['Cache-Control'])
+
+    def test_post_is_not_cached(self):
+        """Изменяющие запросы идут мимо кеша."""
+        request = RequestFactory().post('/page/')
+        self.view(request)
+        self.view(request)
+        self.assertEqual(len(CALLS), 2)
+
+    def test_stale_page_served_while_locked(self):
+        """Пока страницу пересчитывает другой запрос, отдаётся старая."""
+        self.view(self.request)
+        self.expire()
+        cache.add(self.key + ':lock', 1)
+        response = self.view(self.request)
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(len(CALLS), 1)
+
+    def test_lock_holder_refreshes(self):
+        """Устаревшую страницу пересчитывает один запрос."""
+        self.view(self.request)
+        self.expire()
+        self.assertEqual(self.view(self.request).content, b'render 2')
+        self.assertEqual(self.view(self.request).content, b'render 2')
+        self.assertIsNone(cache.get(self.key + ':lock'))
+
+    def test_early_refresh(self):
+        """Чем дольше считается страница, тем раньше её пересчитывают."""
+        view = cache_view(20, key_prefix='test', beta=1e9)(counting_view)
+        view(self.request)
+        response, _, expires = cache.get(self.key)
+        cache.set(self.key, (response, 1.0, expires))
+        view(self.request)
+        self.assertEqual(len(CALLS), 2)
+
+    def test_cold_miss_waits_for_lock_holder(self):
+        """При холодном промахе ждут страницу от держателя блокировки,
+        а не считают её сами."""
+        cache.add(self.key + ':lock', 1)
+        threading.Timer(0.1, cache.set, args=(
+            self.key, (HttpResponse('from other'), 0, time.time() + 20)
+        )).start()
+        response = self.view(self.request)
+        self.assertEqual(response.content, b'from other')
+        self.assertEqual(CALLS, [])
+
+    def test_waiter_computes_when_lock_is_released(self):
+        """Если держатель блокировки ушёл без страницы, ожидающий
+        считает её сам и кладёт в кеш."""
+        cache.add(self.key + ':lock', 1)
+        timer = threading.Timer(0.1, cache.delete, args=(self.key + ':lock',))
+        timer.start()
+        response = self.view(self.request)
+        timer.join()
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(cache.get(self.key)[0].content, b'render 1')
+        self.assertIsNone(cache.get(self.key + ':lock'))
+
+    def test_refused_add_still_stores(self):
+        """Бэкенд, отказывающий в add без чужой блокировки, не мешает
+        положить страницу в кеш."""
+        with mock.patch.object(caches['default'], 'add',
+                               return_value=False):
+            response = self.view(self.request)
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(self.view(self.request).content, b'render 1')
+        self.assertEqual(len(CALLS), 1)
+
+    @override_settings(VIEW_CACHE_BACKGROUND=True)
+    def test_background_refresh(self):
+        """Устаревшая страница отдаётся сразу, а свежая считается в фоне."""
+        self.view(self.request)
+        self.expire()
+        self.assertEqual(self.view(self.request).content, b'render 1')
+        deadline = time.monotonic() + 5
+        while (cache.get(self.key + ':lock') is not None
+               and time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(self.view(self.request).content, b'render 2')
@@ -0,0 +1,72 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import engines
+from django.test import TestCase
+from django.urls import get_resolver
+
+from .. import warmup
+
+
+class WarmupTests(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_templates_compiled(self):
+        """Шаг templates компилирует шаблоны проекта и приложений."""
+        engine = engines['django']
+        with mock.patch.object(engine, 'get_template',
+                               wraps=engine.get_template) as get_template:
+            compiled = warmup.compile_templates()
+        names = {call[0][0] for call in get_template.call_args_list}
+        self.assertIn('posts/index.html', names)
+        self.assertIn('posts/includes/post_list.html', names)
+        self.assertGreater(compiled, 0)
+
+    def test_named_urls(self):
+        """Именованные URL находятся с пространством имён и получают
+        подходящие аргументы."""
+        patterns = dict(warmup.named_patterns(get_resolver()))
+        self.assertEqual(
+            warmup.sample_kwargs(patterns['posts:post_detail']),
+            {'post_id': 1},
+        )
+        self.assertEqual(
+            warmup.sample_kwargs(patterns['posts:group_list']),
+            {'slug': warmup.SAMPLE_ARGUMENT},
+        )
+        self.assertEqual(
+            warmup.sample_kwargs(patterns['media']),
+            {'path': warmup.SAMPLE_ARGUMENT},
+        )
+        # admin:app_list принимает только перечисленные app_label
+        self.assertEqual(warmup.reverse_urls(), len(patterns) - 1)
+
+    def test_failed_step_reported(self):
+        """Упавший шаг попадает в отчёт, следующие выполняются."""
+        steps = {'broken': mock.Mock(side_effect=ValueError('boom')),
+                 'fine': mock.Mock(return_value=3)}
+        with mock.patch.object(warmup, 'STEPS', steps):
+            with self.assertLogs('core.warmup', 'ERROR'):
+                report = warmup.run()
+        self.assertEqual([row['step'] for row in report], ['broken', 'fine'])
+        self.assertIn('boom', report[0]['error'])
+        self.assertEqual(report[1]['count'], 3)
+        self.assertEqual(report[1]['error'], '')
+
+    def test_selected_steps(self):
+        """run(names) выполняет только названные шаги."""
+        report = warmup.run(['urls'])
+        self.assertEqual([row['step'] for row in report], ['urls'])
+
+    def test_command_reports_timings(self):
+        """manage.py warmup показывает число и время каждого шага."""
+        out = StringIO()
+        call_command('warmup', stdout=out)
+        output = out.getvalue()
+        for name in ('templates', 'urls', 'feeds', 'thumbnails'):
+            self.assertIn(name, output)
+        self.assertIn('мс', output)
+        self.assertNotIn('ошибка', output)
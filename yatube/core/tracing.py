@@ -0,0 +1,270 @@
+"""Трассировка запросов.
+
+Трасса - дерево отрезков времени (span) одного запроса: корень - запрос
+целиком (core.middleware.tracing), под ним обработка в middleware до и
+после view, методы view (traced_view), каждый SQL-запрос, рендер каждого
+шаблона и каждого включаемого шаблона, обращения к кешам и нарезка
+миниатюр. Текущая трасса и открытые отрезки лежат в threading.local, так
+что вложенность получается сама собой.
+
+В трассу попадает доля запросов TRACING_SAMPLE_RATE; у остальных span()
+ничего не делает. Идентификаторы совместимы с W3C Trace Context: из
+заголовка traceparent берутся trace id и родительский отрезок (решение
+о записи - только по TRACING_SAMPLE_RATE), в ответ уходит traceparent
+корня. Законченная трасса дописывается одной строкой JSON в формате
+OTLP (как у файлового экспортёра OpenTelemetry Collector) в TRACING_FILE.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+STATUS_ERROR = 2
+SERVICE_NAME = 'yatube'
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+VIEW_METHODS = ('dispatch', 'get_object', 'get_queryset', 'get_context_data',
+                'form_valid', 'render_to_response')
+CACHE_METHODS = ('get', 'get_many', 'set', 'set_many', 'add', 'delete',
+                 'delete_many', 'incr', 'touch', 'has_key')
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def new_id(bits):
+    return '{:0{}x}'.format(random.getrandbits(bits), bits // 4)
+
+
+class Span:
+    __slots__ = ('name', 'kind', 'span_id', 'parent_id', 'start', 'end',
+                 'attributes', 'error')
+
+    def __init__(self, name, kind, parent_id, attributes):
+        self.name = name
+        self.kind = kind
+        self.span_id = new_id(64)
+        self.parent_id = parent_id
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes
+        self.error = None
+
+
+class Trace:
+    def __init__(self, trace_id, parent_id):
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.spans = []
+        self.stack = []
+
+    def open(self, name, kind, attributes):
+        parent = self.stack[-1].span_id if self.stack else self.parent_id
+        span = Span(name, kind, parent, attributes)
+        self.spans.append(span)
+        self.stack.append(span)
+        return span
+
+    def close(self, span):
+        span.end = time.time_ns()
+        self.stack.remove(span)
+
+
+def current():
+    return getattr(_local, 'trace', None)
+
+
+def start_trace(traceparent=None):
+    """Начинает трассу текущего потока, если запрос попал в выборку."""
+    _local.trace = None
+    if random.random() >= settings.TRACING_SAMPLE_RATE:
+        return None
+    match = TRACEPARENT_RE.match(traceparent or '')
+    trace_id, parent_id = match.groups() if match else (new_id(128), '')
+    _local.trace = Trace(trace_id, parent_id)
+    return _local.trace
+
+
+def finish_trace():
+    trace, _local.trace = current(), None
+    if trace is not None and trace.spans:
+        export(trace)
+
+
+def traceparent(trace=None):
+    """Заголовок traceparent для корневого отрезка трассы."""
+    trace = trace or current()
+    if trace is None or not trace.spans:
+        return None
+    return '00-{}-{}-01'.format(trace.trace_id, trace.spans[0].span_id)
+
+
+@contextmanager
+def span(name, kind=INTERNAL, **attributes):
+    """Отрезок трассы вокруг блока; вне трассы ничего не делает."""
+    trace = current()
+    if trace is None:
+        yield None
+        return
+    opened = trace.open(name, kind, attributes)
+    try:
+        yield opened
+    except BaseException as error:
+        opened.error = repr(error)
+        raise
+    finally:
+        trace.close(opened)
+
+
+def add_span(name, start, end, kind=INTERNAL, **attributes):
+    """Отрезок с уже известными началом и концом (в нс)."""
+    trace = current()
+    if trace is None:
+        return
+    opened = trace.open(name, kind, attributes)
+    opened.start = start
+    trace.close(opened)
+    opened.end = end
+
+
+def traced(name, kind=INTERNAL, attributes=None):
+    """Декоратор: вызов функции - отрезок трассы. attributes(*args,
+    **kwargs) возвращает атрибуты отрезка."""
+    def decorator(func):
+        if getattr(func, 'traced', False):
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if current() is None:
+                return func(*args, **kwargs)
+            extra = attributes(*args, **kwargs) if attributes else {}
+            with span(name, kind, **extra):
+                return func(*args, **kwargs)
+        wrapper.traced = True
+        return wrapper
+    return decorator
+
+
+def traced_view(cls):
+    """Декоратор класса view: его методы VIEW_METHODS - отрезки трассы."""
+    for method in VIEW_METHODS:
+        if hasattr(cls, method):
+            setattr(cls, method, traced(
+                '{}.{}'.format(cls.__name__, method)
+            )(getattr(cls, method)))
+    return cls
+
+
+def attribute(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def otlp(trace):
+    """Трасса в формате OTLP JSON (ExportTraceServiceRequest)."""
+    spans = []
+    for item in trace.spans:
+        spans.append({
+            'traceId': trace.trace_id,
+            'spanId': item.span_id,
+            'parentSpanId': item.parent_id,
+            'name': item.name,
+            'kind': item.kind,
+            'startTimeUnixNano': str(item.start),
+            'endTimeUnixNano': str(item.end or item.start),
+            'attributes': [{'key': key, 'value': attribute(value)}
+                           for key, value in item.attributes.items()],
+            'status': ({'code': STATUS_ERROR, 'message': item.error}
+                       if item.error else {}),
+        })
+    return {'resourceSpans': [{
+        'resource': {'attributes': [
+            {'key': 'service.name', 'value': attribute(SERVICE_NAME)},
+            {'key': 'process.pid', 'value': attribute(os.getpid())},
+        ]},
+        'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+    }]}
+
+
+def export(trace):
+    path = settings.TRACING_FILE
+    line = json.dumps(otlp(trace)) + '\n'
+    with _lock:
+        try:
+            if os.path.getsize(path) > settings.TRACING_FILE_MAX_BYTES:
+                os.replace(path, path + '.1')
+        except FileNotFoundError:
+            pass
+        with open(path, 'a') as file:
+            file.write(line)
+
+
+def trace_sql(execute, sql, params, many, context):
+    """Обёртка выполнения SQL: каждый запрос - отрезок трассы."""
+    if current() is None:
+        return execute(sql, params, many, context)
+    connection = context['connection']
+    with span('db.query', CLIENT, **{'db.system': connection.vendor,
+                                     'db.name': connection.alias,
+                                     'db.statement': sql}):
+        return execute(sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    """Подключает trace_sql к соединению (сигнал connection_created)."""
+    if trace_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(trace_sql)
+
+
+def patch(cls, method, name, kind=INTERNAL, attributes=None):
+    setattr(cls, method, traced(name, kind, attributes)(getattr(cls, method)))
+
+
+def instrument():
+    """Оборачивает в отрезки рендер шаблонов, миниатюры и кеши. Шаблоны
+    Jinja2 - только если пакет установлен: он необязателен."""
+    from django.template import base
+    from sorl.thumbnail.base import ThumbnailBackend
+
+    patch(base.Template, 'render', 'template.render',
+          attributes=lambda template, context: {
+              'template.name': template.name or ''})
+    try:
+        from django.template.backends.jinja2 import Template
+    except ImportError:
+        Template = None
+    if Template is not None:
+        patch(Template, 'render', 'template.render',
+              attributes=lambda template, *args, **kwargs: {
+                  'template.name': template.origin.template_name or ''})
+    patch(ThumbnailBackend, 'get_thumbnail', 'thumbnail',
+          attributes=lambda backend, file_, geometry, **options: {
+              'thumbnail.file': str(getattr(file_, 'name', file_)),
+              'thumbnail.geometry': geometry})
+    classes = {import_string(config['BACKEND'])
+               for config in settings.CACHES.values()}
+    for cls in classes:
+        for method in CACHE_METHODS:
+            if method in vars(cls):
+                patch(cls, method, 'cache.' + method, CLIENT,
+                      attributes=cache_attributes)
+
+
+def cache_attributes(cache, *args, **kwargs):
+    attributes = {'cache.backend': type(cache).__name__}
+    if args and isinstance(args[0], str):
+        attributes['cache.key'] = args[0]
+    return attributes
@@ -0,0 +1,143 @@
+"""Кеширование страниц без "эффекта толпы".
+
+cache_page хранит страницу ровно timeout секунд, и в момент истечения
+все одновременные запросы промахиваются и пересчитывают её разом.
+cache_view вместо этого:
+
+- хранит страницу timeout секунд как свежую и ещё stale секунд как
+  устаревшую; устаревшую отдаёт сразу, а пересчитывает её в фоновом
+  потоке (stale-while-revalidate) один запрос - тот, кто взял
+  блокировку cache.add (single-flight);
+- пересчитывает страницу заранее с вероятностью, растущей к концу срока
+  и пропорциональной времени её расчёта (XFetch: свежая, пока
+  now - delta * beta * ln(rand) < expires);
+- при холодном промахе остальные запросы ждут до WAIT секунд, пока
+  держатель блокировки положит страницу. Если блокировка пропала,
+  а страницы нет (держатель упал или получил не 200), ожидающий берёт
+  блокировку сам, считает страницу и кладёт её в кеш; если бэкенд
+  отказывает в add, хотя блокировки нет, страница считается и кладётся
+  без неё. Без кеша отдаётся только страница, чья блокировка всё ещё
+  занята после WAIT.
+
+Ключ, как у cache_page, не зависит от пользователя: полный URL и
+key_prefix.
+"""
+import hashlib
+import math
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.utils.cache import patch_response_headers
+from django.utils.encoding import iri_to_uri
+
+LOCK_TIMEOUT = 30
+WAIT = 5
+WAIT_STEP = 0.05
+
+
+def page_key(key_prefix, request):
+    url = hashlib.md5(
+        iri_to_uri(request.build_absolute_uri()).encode('ascii')
+    ).hexdigest()
+    return 'view_cache.{}.{}'.format(key_prefix, url)
+
+
+def is_fresh(expires, delta, beta, now):
+    return now - delta * beta * math.log(1 - random.random()) < expires
+
+
+class PageCache:
+    def __init__(self, view, timeout, key_prefix, stale, beta, cache_alias):
+        self.view = view
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+        self.stale = settings.VIEW_CACHE_STALE if stale is None else stale
+        self.beta = beta
+        self.cache_alias = cache_alias
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def __call__(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return self.view(request, *args, **kwargs)
+        key = page_key(self.key_prefix, request)
+        lock = key + ':lock'
+        entry = self.cache.get(key)
+        if entry is not None:
+            response, delta, expires = entry
+            if is_fresh(expires, delta, self.beta, time.time()):
+                return response
+            if self.cache.add(lock, 1, LOCK_TIMEOUT):
+                if not settings.VIEW_CACHE_BACKGROUND:
+                    return self.compute(key, lock, request, args, kwargs)
+                threading.Thread(
+                    target=self.refresh,
+                    args=(key, lock, request, args, kwargs),
+                    daemon=True,
+                ).start()
+            return response
+        if self.cache.add(lock, 1, LOCK_TIMEOUT):
+            return self.compute(key, lock, request, args, kwargs)
+        return self.wait(key, lock, request, args, kwargs)
+
+    def wait(self, key, lock, request, args, kwargs):
+        """Холодный промах при чужой блокировке: ждёт страницу от её
+        держателя, а если блокировка пропала без страницы - считает
+        сам."""
+        deadline = time.monotonic() + WAIT
+        while time.monotonic() < deadline:
+            found = self.cache.get_many([key, lock])
+            if key in found:
+                return found[key][0]
+            if lock not in found:
+                break
+            time.sleep(WAIT_STEP)
+        if self.cache.add(lock, 1, LOCK_TIMEOUT):
+            return self.compute(key, lock, request, args, kwargs)
+        if self.cache.get(lock) is None:
+            return self.compute(key, None, request, args, kwargs)
+        return self.view(request, *args, **kwargs)
+
+    def compute(self, key, lock, request, args, kwargs):
+        """Считает страницу и кладёт её в кеш вместе с временем расчёта.
+        lock - взятая блокировка, которую нужно снять, или None."""
+        try:
+            started = time.perf_counter()
+            response = self.view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+            delta = time.perf_counter() - started
+            if response.status_code == 200 and not response.streaming:
+                patch_response_headers(response, self.timeout)
+                self.cache.set(
+                    key, (response, delta, time.time() + self.timeout),
+                    self.timeout + self.stale,
+                )
+            return response
+        finally:
+            if lock is not None:
+                self.cache.delete(lock)
+
+    def refresh(self, key, lock, request, args, kwargs):
+        """Фоновый пересчёт: у потока свои соединения с базой, их нужно
+        закрыть самому."""
+        try:
+            self.compute(key, lock, request, args, kwargs)
+        finally:
+            connections.close_all()
+
+
+def cache_view(timeout, key_prefix='', stale=None, beta=1.0,
+               cache_alias='default'):
+    """Замена cache_page с защитой от одновременного пересчёта."""
+    def decorator(view):
+        return wraps(view)(PageCache(view, timeout, key_prefix, stale, beta,
+                                     cache_alias))
+    return decorator
@@ -1,4 +1,16 @@
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from . import profiler
+from .media import accel_response, file_etag, media_path, range_response
 
 
 def page_not_found(request, exception):
@@ -11,3 +23,80 @@ def csrf_failure(request, reason=''):
 
 def internal_server_error(request):
     return render(request, 'core/500.html')
+
+
+@require_safe
+def serve_media(request, path):
+    """Отдаёт файлы из MEDIA_ROOT: картинки постов и их миниатюры."""
+    full_path = media_path(path)
+    if full_path is None:
+        raise Http404
+    stat = os.stat(full_path)
+    headers = HttpResponse()
+    headers['ETag'] = file_etag(stat)
+    headers['Last-Modified'] = http_date(stat.st_mtime)
+    headers['Cache-Control'] = 'public, max-age={}'.format(
+        settings.MEDIA_MAX_AGE
+    )
+    conditional = get_conditional_response(
+        request, etag=headers['ETag'], last_modified=int(stat.st_mtime),
+        response=headers,
+    )
+    if conditional is not headers:
+        return conditional
+
+    if settings.MEDIA_ACCEL:
+        response = accel_response(path, full_path)
+    else:
+        response = range_response(request, full_path, stat)
+    for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+        response[header] = headers[header]
+    return response
+
+
+@staff_member_required
+def cache_stats(request):
+    """Статистика кешей процесса по префиксам ключей и горячие ключи.
+    Показываются бэкенды, которые её собирают (core.cache.TinyLFUCache)."""
+    backends = []
+    for alias in settings.CACHES:
+        backend = caches[alias]
+        if hasattr(backend, 'stats'):
+            backends.append({
+                'alias': alias,
+                'max_bytes': backend.max_bytes,
+                'stats': backend.stats(),
+                'hot_set': backend.hot_set(),
+            })
+    return render(request, 'core/cache_stats.html', {
+        'backends': backends,
+        'pid': os.getpid(),
+    })
+
+
+@staff_member_required
+def profiles(request):
+    """Снятые профили запросов, новые первыми."""
+    captured = []
+    for name in profiler.names():
+        meta = profiler.load_meta(name)
+        if meta is not None:
+            meta['name'] = name
+            meta['sql_ms'] = sum(query['ms'] for query in meta['queries'])
+            captured.append(meta)
+    return render(request, 'core/profiles.html', {'profiles': captured})
+
+
+@staff_member_required
+def profile_detail(request, name):
+    """Функции снимка по суммарному времени и его SQL-запросы."""
+    meta = profiler.load_meta(name)
+    if meta is None:
+        raise Http404
+    return render(request, 'core/profile_detail.html', {
+        'name': name,
+        'meta': meta,
+        'functions': profiler.top_functions(name, settings.PROFILER_TOP),
+        'queries': sorted(meta['queries'], key=lambda query: query['ms'],
+                          reverse=True),
+    })
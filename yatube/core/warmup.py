@@ -0,0 +1,131 @@
+"""Прогрев процесса перед первыми запросами.
+
+Первый запрос свежего воркера платит за всё, что Django и приложения
+делают лениво: разбор и компиляцию шаблонов, сборку таблиц обратного
+разрешения URL, импорт библиотек тегов и PIL, пустые кеши лент и
+метаданных миниатюр. run() выполняет шаги прогрева заранее и замеряет
+каждый.
+
+Шаг - функция без аргументов с декоратором ``@step('имя')``, которая
+возвращает, сколько всего она прогрела. Шаги templates и urls
+объявлены здесь, шаги приложений - в их модулях warmup (например,
+posts/warmup.py). Упавший шаг записывается в отчёт и не мешает
+остальным: прогрев не должен мешать воркеру стартовать.
+
+Запуск - `manage.py warmup` или, при WARMUP_ON_START, из yatube/wsgi.py
+при загрузке приложения в каждом воркере. Не из AppConfig.ready: там
+ещё нельзя ходить в базу, и это делали бы и migrate, и тесты.
+"""
+import logging
+import os
+import time
+
+from django.template import engines
+from django.urls import NoReverseMatch, URLResolver, get_resolver, reverse
+from django.urls.converters import IntConverter
+from django.urls.resolvers import RoutePattern
+from django.utils.module_loading import autodiscover_modules
+
+logger = logging.getLogger(__name__)
+
+STEPS = {}
+SAMPLE_ARGUMENT = 'warmup'
+
+
+def step(name):
+    """Регистрирует функцию как шаг прогрева с именем name."""
+    def register(func):
+        STEPS[name] = func
+        return func
+    return register
+
+
+def autodiscover():
+    """Импортирует модули warmup всех приложений с их шагами."""
+    autodiscover_modules('warmup')
+
+
+def run(names=None):
+    """Выполняет шаги (все или только names) по порядку регистрации.
+    Возвращает отчёт: по строке на шаг с числом прогретого,
+    длительностью в миллисекундах и ошибкой, если шаг упал."""
+    autodiscover()
+    report = []
+    for name, func in STEPS.items():
+        if names is not None and name not in names:
+            continue
+        started = time.perf_counter()
+        count, error = 0, ''
+        try:
+            count = func()
+        except Exception as exc:
+            error = repr(exc)
+            logger.exception('Warm-up step %s failed', name)
+        ms = (time.perf_counter() - started) * 1000
+        logger.info('Warm-up step %s: %s in %.1f ms', name, count, ms)
+        report.append({'step': name, 'count': count, 'ms': ms,
+                       'error': error})
+    return report
+
+
+def template_names(directory):
+    for root, _, files in os.walk(directory):
+        for file in files:
+            yield os.path.relpath(os.path.join(root, file), directory)
+
+
+@step('templates')
+def compile_templates():
+    """Компилирует все шаблоны каждого движка. Скомпилированные шаблоны
+    остаются в памяти у cached loader Django (он включён при DEBUG =
+    False) и в кеше окружения Jinja2."""
+    compiled = 0
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name.replace(os.sep, '/'))
+                except Exception:
+                    logger.debug('Template %s is not compilable by %s',
+                                 name, engine.name, exc_info=True)
+                    continue
+                compiled += 1
+    return compiled
+
+
+def sample_kwargs(pattern):
+    """Аргументы, на которых reverse() пройдёт для pattern."""
+    if isinstance(pattern.pattern, RoutePattern):
+        return {name: 1 if isinstance(converter, IntConverter)
+                else SAMPLE_ARGUMENT
+                for name, converter in pattern.pattern.converters.items()}
+    return {name: SAMPLE_ARGUMENT
+            for name in pattern.pattern.regex.groupindex}
+
+
+def named_patterns(resolver, namespace=''):
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            inner = namespace
+            if pattern.namespace:
+                inner = namespace + pattern.namespace + ':'
+            yield from named_patterns(pattern, inner)
+        elif pattern.name:
+            yield namespace + pattern.name, pattern
+
+
+@step('urls')
+def reverse_urls():
+    """Обращает каждый именованный URL: резолвер собирает таблицы
+    обратного разрешения всех пространств имён и шаблоны их путей.
+    URL, для которых пробные аргументы не подходят (регулярные выражения
+    с перечислением значений), пропускаются - таблицы для них всё равно
+    уже собраны."""
+    reversed_ = 0
+    for name, pattern in named_patterns(get_resolver()):
+        try:
+            reverse(name, kwargs=sample_kwargs(pattern))
+        except NoReverseMatch:
+            continue
+        reversed_ += 1
+    return reversed_
@@ -3,3 +3,15 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from core import object_cache, query_cache
+
+        from . import signals  # noqa: F401
+        from .models import Comment, Follow, Group, Post, User
+
+        object_cache.register(Post)
+        object_cache.register(Group, natural_keys=['slug'])
+        object_cache.register(User, natural_keys=['username'])
+        for model in (Post, Comment, Follow, Group, User):
+            query_cache.register(model)
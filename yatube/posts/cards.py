@@ -0,0 +1,91 @@
+"""Карточки постов для лент.
+
+Лентам нужны текст, дата, картинка, имя автора и slug группы, а не
+целые Post, User (с хешем пароля и почтой) и Group. PostCard - запись
+со __slots__, которую project() собирает из values_list() только с
+нужными столбцами, сразу вычисляя ссылки на пост, автора и группу:
+шаблону не приходится вызывать {% url %} и get_full_name().
+
+CardFeed отдаёт пагинатору карточки вместо моделей: страницы из буфера
+RingFeed читаются по id через кеш запросов (core.query_cache), так что
+тёплая страница - это распаковка кортежей без запросов и без
+инициализации моделей, остальные - тем же queryset, что и раньше.
+"""
+from django.urls import reverse
+
+from .feed_ids import RingFeed
+from .models import Post
+
+CARD_FIELDS = (
+    'id', 'text', 'pub_date', 'image', 'author__username',
+    'author__first_name', 'author__last_name', 'group__slug',
+)
+
+
+class PostCard:
+    __slots__ = ('id', 'text', 'pub_date', 'image', 'author_username',
+                 'author_name', 'group_slug', 'url', 'author_url',
+                 'group_url')
+
+    def __init__(self, row, author_url, group_url):
+        (self.id, self.text, self.pub_date, self.image, self.author_username,
+         first_name, last_name, self.group_slug) = row
+        self.author_name = '{} {}'.format(first_name, last_name).strip()
+        self.url = reverse('posts:post_detail', args=[self.id])
+        self.author_url = author_url
+        self.group_url = group_url
+
+    def __repr__(self):
+        return '<PostCard {}>'.format(self.id)
+
+
+def cards(rows):
+    """Карточки из строк CARD_FIELDS; ссылка на автора и группу
+    вычисляется один раз на страницу."""
+    authors, groups = {}, {}
+    result = []
+    for row in rows:
+        username, slug = row[4], row[7]
+        if username not in authors:
+            authors[username] = reverse('posts:profile', args=[username])
+        if slug and slug not in groups:
+            groups[slug] = reverse('posts:group_list', args=[slug])
+        result.append(PostCard(row, authors[username], groups.get(slug)))
+    return result
+
+
+def project(queryset):
+    return cards(queryset.values_list(*CARD_FIELDS))
+
+
+def cards_by_id(ids):
+    """Карточки постов ids в том же порядке; удалённые пропускаются."""
+    rows = (Post.objects.filter(pk__in=ids).order_by()
+            .values_list(*CARD_FIELDS).cached())
+    rows = {row[0]: row for row in rows}
+    return cards(rows[post_id] for post_id in ids if post_id in rows)
+
+
+class CardFeed:
+    """Последовательность карточек для Paginator поверх queryset
+    или RingFeed."""
+    ordered = True
+
+    def __init__(self, source):
+        self.source = source
+
+    def count(self):
+        return self.source.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if isinstance(self.source, RingFeed):
+            ids = self.source.ids(index)
+            if ids is not None:
+                return cards_by_id(ids)
+            return project(self.source.queryset[index])
+        return project(self.source[index])
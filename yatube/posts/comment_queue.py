@@ -0,0 +1,157 @@
+"""Отложенная запись комментариев (write-behind).
+
+При COMMENT_WRITE_BEHIND = True комментарий после валидации не пишется
+в основную базу, а дописывается в локальную очередь - отдельный файл
+SQLite в режиме WAL со своей блокировкой, - и пользователь сразу получает
+ответ. Команда flush_comments выгружает очередь пачками через
+bulk_create в порядке поступления, поэтому id комментариев каждого поста
+растут в том же порядке, в каком они были приняты (created при этом -
+время выгрузки).
+
+Выгрузка ровно один раз: номер последнего выгруженного элемента очереди
+хранится в основной базе (CommentQueueCursor) и сдвигается в одной
+транзакции с bulk_create; сдвиг сделан как compare-and-swap, так что
+второй одновременный выгрузчик откатится, а не задвоит комментарии.
+Номера seq свои у каждого файла очереди, поэтому и курсор у каждого
+файла свой: при создании файл получает случайный id (таблица meta),
+и курсор называется по нему. Новый файл - пересозданный или на другом
+хосте - начинает с нулевого курсора, а не с позиции чужой очереди.
+"""
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Comment, CommentQueueCursor, Post, User
+
+CURSOR_NAME = 'comments'
+FLUSH_BATCH_SIZE = 500
+
+_local = threading.local()
+
+
+def connection():
+    path = settings.COMMENT_QUEUE_PATH
+    if not hasattr(_local, 'connections'):
+        _local.connections = {}
+    conn = _local.connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=FULL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS queue ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'post_id INTEGER NOT NULL, '
+            'author_id INTEGER NOT NULL, '
+            'text TEXT NOT NULL, '
+            'queued REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS queue_post_author '
+                     'ON queue (post_id, author_id)')
+        conn.execute('CREATE TABLE IF NOT EXISTS meta ('
+                     'key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        conn.execute("INSERT OR IGNORE INTO meta VALUES ('queue_id', ?)",
+                     (uuid.uuid4().hex,))
+        _local.connections[path] = conn
+    return conn
+
+
+def cursor_name():
+    """Имя курсора этого файла очереди в CommentQueueCursor."""
+    queue_id = connection().execute(
+        "SELECT value FROM meta WHERE key = 'queue_id'"
+    ).fetchone()[0]
+    return '{}:{}'.format(CURSOR_NAME, queue_id)
+
+
+def enabled():
+    return settings.COMMENT_WRITE_BEHIND
+
+
+def push(post_id, author_id, text):
+    """Ставит комментарий в очередь и возвращает его номер."""
+    cursor = connection().execute(
+        'INSERT INTO queue (post_id, author_id, text, queued) '
+        'VALUES (?, ?, ?, ?)',
+        (post_id, author_id, text, time.time()),
+    )
+    return cursor.lastrowid
+
+
+def size():
+    return connection().execute('SELECT COUNT(*) FROM queue').fetchone()[0]
+
+
+def flushed_position():
+    return (CommentQueueCursor.objects.filter(name=cursor_name())
+            .values_list('position', flat=True).first() or 0)
+
+
+def pending_for(post, user):
+    """Ещё не выгруженные комментарии user к post - для read-your-writes.
+
+    Возвращает несохранённые экземпляры Comment в порядке поступления.
+    """
+    if not enabled() or not user.is_authenticated:
+        return []
+    rows = connection().execute(
+        'SELECT seq, text FROM queue WHERE post_id = ? AND author_id = ? '
+        'ORDER BY seq',
+        (post.id, user.id),
+    ).fetchall()
+    if not rows:
+        return []
+    # Строки, выгруженные, но ещё не удалённые из очереди, уже в базе.
+    position = flushed_position()
+    return [Comment(post=post, author=user, text=text)
+            for seq, text in rows if seq > position]
+
+
+def flush(batch_size=FLUSH_BATCH_SIZE):
+    """Выгружает одну пачку; возвращает число выгруженных комментариев."""
+    conn = connection()
+    name = cursor_name()
+    with transaction.atomic():
+        cursor, _ = CommentQueueCursor.objects.get_or_create(name=name)
+        conn.execute('DELETE FROM queue WHERE seq <= ?', (cursor.position,))
+        rows = conn.execute(
+            'SELECT seq, post_id, author_id, text FROM queue '
+            'ORDER BY seq LIMIT ?',
+            (batch_size,),
+        ).fetchall()
+        if not rows:
+            return 0
+        last = rows[-1][0]
+        moved = CommentQueueCursor.objects.filter(
+            name=name, position=cursor.position
+        ).update(position=last)
+        if not moved:
+            # Эту пачку уже выгрузил параллельный flush.
+            transaction.set_rollback(True)
+            return 0
+        # Пост или автора могли удалить, пока комментарий ждал в очереди.
+        posts = set(Post.objects.filter(pk__in={row[1] for row in rows})
+                    .values_list('pk', flat=True))
+        users = set(User.objects.filter(pk__in={row[2] for row in rows})
+                    .values_list('pk', flat=True))
+        Comment.objects.bulk_create([
+            Comment(post_id=post_id, author_id=author_id, text=text)
+            for _, post_id, author_id, text in rows
+            if post_id in posts and author_id in users
+        ])
+    conn.execute('DELETE FROM queue WHERE seq <= ?', (last,))
+    return len(rows)
+
+
+def flush_all(batch_size=FLUSH_BATCH_SIZE):
+    total = 0
+    flushed = flush(batch_size)
+    while flushed:
+        total += flushed
+        flushed = flush(batch_size)
+    return total
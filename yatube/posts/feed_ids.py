@@ -0,0 +1,161 @@
+"""Кольцевые буферы id свежих постов для первых страниц лент.
+
+Почти все просмотры лент - первые страницы главной, популярных групп
+и профилей. Для каждой такой ленты в общем кеше лежит запись
+{'ids': [...], 'count': N}: до RING_SIZE id самых новых постов в порядке
+ленты и общее число постов в ней. RingFeed отдаёт пагинатору срезы из
+этих id: сами посты и их авторы и группы берутся из core.object_cache,
+а промахи дочитываются запросами pk IN (...) без фильтрации и сортировки
+всей таблицы и без COUNT; страницы дальше буфера читаются обычным
+запросом. Ленты на страницах читают из буфера только id - см.
+posts.cards.
+
+Буферы обновляются сигналами после коммита: новый пост добавляется
+в начало, удалённый вычёркивается. Одновременные обновления
+сериализуются блокировкой cache.add, а тот, кому блокировка не досталась,
+просто сбрасывает буфер - его пересоберёт следующий запрос. Запись живёт
+RING_TIMEOUT секунд, так что любая гонка с пересборкой ограничена этим
+сроком.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from core import object_cache
+
+RING_SIZE = 50
+RING_TIMEOUT = 10 * 60
+LOCK_TIMEOUT = 5
+INDEX_KEY = 'feed_ids:index'
+GROUP_KEY = 'feed_ids:group:{}'
+AUTHOR_KEY = 'feed_ids:author:{}'
+
+
+def index_key():
+    return INDEX_KEY
+
+
+def group_key(group_id):
+    return GROUP_KEY.format(group_id)
+
+
+def author_key(author_id):
+    return AUTHOR_KEY.format(author_id)
+
+
+def keys_for(post, group_id=None):
+    keys = [INDEX_KEY, author_key(post.author_id)]
+    group_id = post.group_id if group_id is None else group_id
+    if group_id:
+        keys.append(group_key(group_id))
+    return keys
+
+
+def build(queryset):
+    ids = list(queryset.values_list('id', flat=True)[:RING_SIZE])
+    count = len(ids) if len(ids) < RING_SIZE else queryset.count()
+    return {'ids': ids, 'count': count}
+
+
+def load(key, queryset):
+    entry = cache.get(key)
+    if entry is None:
+        entry = build(queryset)
+        cache.set(key, entry, RING_TIMEOUT)
+    return entry
+
+
+def update(key, change):
+    """Применяет change к буферу под блокировкой. Нет буфера - нечего
+    обновлять; нет блокировки - буфер сбрасывается."""
+    lock = key + ':lock'
+    if not cache.add(lock, 1, LOCK_TIMEOUT):
+        cache.delete(key)
+        return
+    try:
+        entry = cache.get(key)
+        if entry is not None:
+            change(entry)
+            cache.set(key, entry, RING_TIMEOUT)
+    finally:
+        cache.delete(lock)
+
+
+def push(keys, post_id):
+    def change(entry):
+        entry['ids'] = [post_id] + entry['ids'][:RING_SIZE - 1]
+        entry['count'] += 1
+    for key in keys:
+        update(key, change)
+
+
+def remove(keys, post_id):
+    def change(entry):
+        if post_id in entry['ids']:
+            entry['ids'].remove(post_id)
+        entry['count'] = max(entry['count'] - 1, 0)
+    for key in keys:
+        update(key, change)
+
+
+def post_created(post):
+    keys = keys_for(post)
+    transaction.on_commit(lambda: push(keys, post.id))
+
+
+def post_deleted(post):
+    keys, post_id = keys_for(post), post.id
+    transaction.on_commit(lambda: remove(keys, post_id))
+
+
+def invalidate(keys):
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class RingFeed:
+    """Последовательность для Paginator: count() и срезы в пределах
+    буфера берутся из кеша, остальное - из queryset."""
+    ordered = True
+
+    def __init__(self, key, queryset):
+        self.key = key
+        self.queryset = queryset
+        self.model = queryset.model
+        related = queryset.query.select_related
+        self.related = list(related) if isinstance(related, dict) else []
+        self._entry = None
+
+    @property
+    def entry(self):
+        if self._entry is None:
+            self._entry = load(self.key, self.queryset)
+        return self._entry
+
+    def count(self):
+        return self.entry['count']
+
+    def __len__(self):
+        return self.count()
+
+    def covers(self, stop):
+        ids = self.entry['ids']
+        return stop <= len(ids) or len(ids) == self.entry['count']
+
+    def ids(self, index):
+        """id постов среза index из буфера или None, если срез выходит
+        за буфер."""
+        if index.step or index.stop is None or not self.covers(index.stop):
+            return None
+        return self.entry['ids'][index]
+
+    def __getitem__(self, index):
+        ids = self.ids(index) if isinstance(index, slice) else None
+        if ids is None:
+            return self.queryset[index]
+        posts = object_cache.get_many(self.model, ids)
+        return object_cache.hydrate(
+            [posts[post_id] for post_id in ids if post_id in posts],
+            *self.related
+        )
+
+    def __iter__(self):
+        return iter(self[:self.count()])
@@ -0,0 +1,133 @@
+"""Кеш графа подписок в памяти процесса.
+
+Для каждого пользователя хранится отсортированный array('l') с id авторов,
+на которых он подписан, так что проверка подписки - бинарный поиск без
+запроса к базе. Свежесть списка сверяется с токеном версии в общем кеше
+(core.cache.shared_cache): любое изменение подписок пользователя меняет
+токен, и остальные процессы перечитывают его список при следующем
+обращении. Если кеш default в памяти процесса, токены не хранятся вовсе
+и список каждый раз читается из базы: иначе воркеры, где подписки не
+меняли, отдавали бы устаревший граф.
+"""
+import threading
+import uuid
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.db import transaction
+
+from core.cache import shared_cache
+
+from .models import Follow
+
+FOLLOW_CACHE_MAX_USERS = 10000
+VERSION_KEY = 'follow_graph:{}'
+
+_graph = OrderedDict()
+_lock = threading.Lock()
+
+
+def new_token():
+    return uuid.uuid4().hex
+
+
+def get_tokens(user_ids):
+    keys = {VERSION_KEY.format(user_id): user_id for user_id in user_ids}
+    cache = shared_cache()
+    found = cache.get_many(keys)
+    missing = {key: new_token() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: token for key, token in found.items()}
+
+
+def load(user_ids):
+    graph = {user_id: array('l') for user_id in user_ids}
+    rows = (Follow.objects.filter(user_id__in=user_ids)
+            .order_by('user_id', 'author_id')
+            .values_list('user_id', 'author_id'))
+    for user_id, author_id in rows:
+        graph[user_id].append(author_id)
+    return graph
+
+
+def following(user_ids):
+    """Словарь user_id -> отсортированный array id авторов."""
+    user_ids = set(user_ids)
+    tokens = get_tokens(user_ids)
+    result = {}
+    with _lock:
+        for user_id in user_ids:
+            entry = _graph.get(user_id)
+            if entry is not None and entry[0] == tokens[user_id]:
+                _graph.move_to_end(user_id)
+                result[user_id] = entry[1]
+    stale = user_ids - set(result)
+    if stale:
+        loaded = load(stale)
+        with _lock:
+            for user_id, authors in loaded.items():
+                _graph[user_id] = (tokens[user_id], authors)
+                _graph.move_to_end(user_id)
+            while len(_graph) > FOLLOW_CACHE_MAX_USERS:
+                _graph.popitem(last=False)
+        result.update(loaded)
+    return result
+
+
+def contains(authors, author_id):
+    index = bisect_left(authors, author_id)
+    return index < len(authors) and authors[index] == author_id
+
+
+def is_following(user_id, author_id):
+    """Подписан ли user_id на author_id; для гостя (None) - всегда нет."""
+    if user_id is None or author_id is None:
+        return False
+    return contains(following([user_id])[user_id], author_id)
+
+
+def followed_among(user_id, author_ids):
+    """Те из author_ids, на кого подписан user_id."""
+    if user_id is None:
+        return set()
+    authors = following([user_id])[user_id]
+    return {author_id for author_id in author_ids
+            if contains(authors, author_id)}
+
+
+def followers_among(user_ids, author_id):
+    """Те из user_ids, кто подписан на author_id (плашка "подписан на вас")."""
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if not user_ids or author_id is None:
+        return set()
+    return {user_id for user_id, authors in following(user_ids).items()
+            if contains(authors, author_id)}
+
+
+def invalidate(user_ids):
+    """Меняет токены версий: все процессы перечитают эти списки."""
+    user_ids = set(user_ids)
+    shared_cache().set_many(
+        {VERSION_KEY.format(user_id): new_token() for user_id in user_ids},
+        timeout=None,
+    )
+    with _lock:
+        for user_id in user_ids:
+            _graph.pop(user_id, None)
+
+
+def invalidate_on_commit(user_ids):
+    """Сбрасывает списки сразу (это соединение уже видит изменения)
+    и ещё раз после коммита, чтобы другие процессы не закешировали
+    состояние до коммита."""
+    user_ids = set(user_ids)
+    invalidate(user_ids)
+    transaction.on_commit(lambda: invalidate(user_ids))
+
+
+def clear():
+    with _lock:
+        _graph.clear()
@@ -0,0 +1,166 @@
+import time
+from itertools import islice
+
+from . import follow_cache, unread
+from .models import Follow, User
+
+FOLLOW_BATCH_SIZE = 1000
+# пар на запрос: id пользователей и авторов вместе не больше 900
+# параметров, лимит старых сборок SQLite - 999
+PAIRS_PER_QUERY = 450
+
+
+def chunks(items, size):
+    """Режет итерируемое на списки по size, не загружая его целиком."""
+    iterator = iter(items)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+class FollowBatchReport:
+    """Итоги пакетной подписки или отписки."""
+
+    def __init__(self):
+        self.pairs = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.unknown_users = set()
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        """Обработано пар в секунду."""
+        return self.pairs / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'pairs': self.pairs,
+            'changed': self.changed,
+            'unchanged': self.unchanged,
+            'skipped': self.skipped,
+            'unknown_users': sorted(self.unknown_users),
+            'elapsed': round(self.elapsed, 3),
+            'rate': round(self.rate, 1),
+        }
+
+    def __str__(self):
+        return (
+            'пар: {}, изменено: {}, без изменений: {}, пропущено: {} '
+            '(неизвестных пользователей: {}), {:.2f} с, {:.0f} пар/с'.format(
+                self.pairs, self.changed, self.unchanged, self.skipped,
+                len(self.unknown_users), self.elapsed, self.rate,
+            )
+        )
+
+
+def resolve_pairs(pairs, report):
+    """Превращает пары имён (user, author) в пары id одним запросом.
+
+    Пары с неизвестными именами и подписки на себя отбрасываются
+    и учитываются в отчёте как пропущенные.
+    """
+    names = {name for pair in pairs for name in pair}
+    ids = dict(
+        User.objects.filter(username__in=names).values_list('username', 'id')
+    )
+    report.unknown_users.update(names - set(ids))
+    resolved = set()
+    for user, author in pairs:
+        if user in ids and author in ids and user != author:
+            resolved.add((ids[user], ids[author]))
+        else:
+            report.skipped += 1
+    return resolved
+
+
+def existing_follows(pairs):
+    """(user_id, author_id) -> pk существующих подписок из набора pairs.
+
+    Пары идут запросами по PAIRS_PER_QUERY с условием user_id IN (...)
+    AND author_id IN (...): цепочка OR на каждого пользователя упирается
+    в предел глубины выражения SQLite уже на тысяче подписчиков. Такое
+    условие шире самих пар, лишние строки отсекаются здесь. Пары
+    отсортированы, так что пользователей в запросе немного и он идёт
+    по индексу unique_follow.
+    """
+    found = {}
+    for chunk in chunks(sorted(pairs), PAIRS_PER_QUERY):
+        wanted = set(chunk)
+        rows = Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in chunk},
+            author_id__in={author_id for _, author_id in chunk},
+        ).values_list('user_id', 'author_id', 'pk')
+        found.update(((user_id, author_id), pk)
+                     for user_id, author_id, pk in rows
+                     if (user_id, author_id) in wanted)
+    return found
+
+
+def existing_pairs(pairs):
+    return set(existing_follows(pairs))
+
+
+def process_in_batches(pairs, batch_size, apply):
+    """Гоняет пары пачками через apply(resolved) -> число изменённых."""
+    report = FollowBatchReport()
+    started = time.perf_counter()
+    for chunk in chunks(pairs, batch_size):
+        skipped = report.skipped
+        resolved = resolve_pairs(chunk, report)
+        changed = apply(resolved) if resolved else 0
+        report.pairs += len(chunk)
+        report.changed += changed
+        report.unchanged += (
+            len(chunk) - (report.skipped - skipped) - changed
+        )
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def create_follows(resolved):
+    new = resolved - existing_pairs(resolved)
+    Follow.objects.bulk_create(
+        [Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in new],
+        ignore_conflicts=True,
+    )
+    # bulk_create не шлёт post_save, поэтому кеш графа сбрасываем сами.
+    user_ids = {user_id for user_id, _ in new}
+    follow_cache.invalidate_on_commit(user_ids)
+    unread.invalidate_on_commit(user_ids)
+    return len(new)
+
+
+def delete_follows(resolved):
+    deleted = 0
+    for pks in chunks(existing_follows(resolved).values(),
+                      2 * PAIRS_PER_QUERY):
+        count, _ = Follow.objects.filter(pk__in=pks).delete()
+        deleted += count
+    return deleted
+
+
+def follow(user, author):
+    """Одиночная подписка одним INSERT без гонки с unique_follow."""
+    Follow.objects.bulk_create([Follow(user=user, author=author)],
+                               ignore_conflicts=True)
+    follow_cache.invalidate_on_commit([user.id])
+    unread.invalidate_on_commit([user.id])
+
+
+def bulk_follow(pairs, batch_size=FOLLOW_BATCH_SIZE):
+    """Создаёт подписки по списку пар имён (user, author).
+
+    На каждую пачку уходит три запроса: имена, уже существующие подписки
+    и один INSERT. Повторный вызов с теми же парами ничего не меняет,
+    а гонки с параллельными запросами гасит ignore_conflicts.
+    """
+    return process_in_batches(pairs, batch_size, create_follows)
+
+
+def bulk_unfollow(pairs, batch_size=FOLLOW_BATCH_SIZE):
+    """Удаляет подписки по списку пар имён (user, author)."""
+    return process_in_batches(pairs, batch_size, delete_follows)
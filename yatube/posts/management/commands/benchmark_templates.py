@@ -0,0 +1,86 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.template import engines
+from django.template.backends.jinja2 import Jinja2
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from posts.cards import cards
+from posts.models import Group
+from posts.views import POST_DISPLAY
+
+TEMPLATES = ('posts/index.html', 'posts/group_list.html')
+
+
+def jinja2_engine():
+    """Движок Jinja2 из настроек, даже если он не включён в TEMPLATES."""
+    if settings.POSTS_TEMPLATE_ENGINE == 'jinja2':
+        return engines['jinja2']
+    params = dict(settings.JINJA2_TEMPLATES)
+    params.pop('BACKEND')
+    params['NAME'] = 'jinja2'
+    return Jinja2(params)
+
+
+def make_context(posts_count):
+    """Контекст ленты без базы данных, чтобы замер не упирался в неё:
+    карточки PostCard, как у представлений (posts.cards), из строк
+    CARD_FIELDS, собранных на месте."""
+    group = Group(id=1, title='Группа', slug='group', description='Описание')
+    posts = cards(
+        (i, 'Текст поста {}'.format(i) * 10, timezone.now(), '', 'author',
+         'Имя', 'Фамилия', group.slug)
+        for i in range(1, posts_count + 1)
+    )
+    page_obj = Paginator(posts, POST_DISPLAY).page(1)
+    return {
+        'page_obj': page_obj,
+        'paginator': page_obj.paginator,
+        'object_list': page_obj.object_list,
+        'is_paginated': page_obj.has_other_pages(),
+        'group': group,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время рендеринга лент постов шаблонами Django '
+            'и Jinja2.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument('--posts', type=int, default=POST_DISPLAY * 3)
+
+    def handle(self, *args, **options):
+        try:
+            jinja2 = jinja2_engine()
+        except ImportError:
+            raise CommandError('Для сравнения нужен пакет Jinja2.')
+        request = RequestFactory().get(reverse('posts:index'))
+        request.user = AnonymousUser()
+        request.resolver_match = resolve(request.path_info)
+        context = make_context(options['posts'])
+        iterations = options['iterations']
+
+        for name in TEMPLATES:
+            timings = {}
+            for engine in (engines['django'], jinja2):
+                template = engine.get_template(name)
+                template.render(context, request)
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    template.render(context, request)
+                timings[engine.name] = (
+                    (time.perf_counter() - start) / iterations * 1000
+                )
+            self.stdout.write(
+                '{}: django {:.3f} мс, jinja2 {:.3f} мс, '
+                'ускорение x{:.1f}'.format(
+                    name, timings['django'], timings['jinja2'],
+                    timings['django'] / timings['jinja2'],
+                )
+            )
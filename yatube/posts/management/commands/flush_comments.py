@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import comment_queue
+
+
+class Command(BaseCommand):
+    help = ('Выгружает комментарии из очереди отложенной записи в базу. '
+            'С --loop работает постоянно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true')
+        parser.add_argument('--interval', type=float, default=0.5)
+        parser.add_argument('--batch-size', type=int,
+                            default=comment_queue.FLUSH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            count = comment_queue.flush_all(options['batch_size'])
+            if count:
+                elapsed = time.perf_counter() - started
+                self.stdout.write('Выгружено комментариев: {}, {:.0f} в '
+                                  'секунду'.format(count, count / elapsed))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,42 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.follows import FOLLOW_BATCH_SIZE, bulk_follow, bulk_unfollow
+
+
+def read_pairs(file):
+    for line_number, row in enumerate(csv.reader(file), start=1):
+        if not row or row[0].startswith('#'):
+            continue
+        if len(row) != 2:
+            raise CommandError(
+                'Строка {}: ожидается "подписчик,автор".'.format(line_number)
+            )
+        yield row[0].strip(), row[1].strip()
+
+
+class Command(BaseCommand):
+    help = ('Пакетно создаёт (или удаляет с --unfollow) подписки из CSV '
+            'с парами "подписчик,автор". "-" вместо файла - читать stdin.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--unfollow', action='store_true')
+        parser.add_argument('--batch-size', type=int,
+                            default=FOLLOW_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        process = bulk_unfollow if options['unfollow'] else bulk_follow
+        if options['path'] == '-':
+            report = process(read_pairs(sys.stdin), options['batch_size'])
+        else:
+            try:
+                with open(options['path'], newline='',
+                          encoding='utf-8') as file:
+                    report = process(read_pairs(file),
+                                     options['batch_size'])
+            except OSError as error:
+                raise CommandError(error)
+        self.stdout.write(str(report))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.suggestions import SUGGESTIONS_TOP, refresh
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации "на кого подписаться" (нужны numpy '
+            'и scipy). Без --full пересчитываются только пользователи, '
+            'у которых изменились подписки на расстоянии двух шагов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true')
+        parser.add_argument('--top', type=int, default=SUGGESTIONS_TOP)
+
+    def handle(self, *args, **options):
+        try:
+            report = refresh(full=options['full'], top=options['top'])
+        except ImportError as error:
+            raise CommandError(
+                'Для пересчёта рекомендаций нужны numpy и scipy: '
+                '{}'.format(error)
+            )
+        self.stdout.write(str(report))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.hot import score_posts
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинг горячей ленты (нужен numpy). '
+            'Запускается периодически, например раз в несколько минут.')
+
+    def handle(self, *args, **options):
+        try:
+            count, elapsed = score_posts()
+        except ImportError as error:
+            raise CommandError('Для расчёта рейтинга нужен numpy: '
+                               '{}'.format(error))
+        self.stdout.write(
+            'Оценено постов: {}, {:.2f} с'.format(count, elapsed)
+        )
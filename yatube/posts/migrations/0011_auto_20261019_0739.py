@@ -0,0 +1,22 @@
+# Generated by Django 2.2.16 on 2026-10-19 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_auto_20261019_0736'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Рейтинг в горячем'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-hot_score', '-id'], name='post_hot_score'),
+        ),
+    ]
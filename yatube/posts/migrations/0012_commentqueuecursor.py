@@ -0,0 +1,20 @@
+# Generated by Django 2.2.16 on 2026-10-19 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_auto_20261019_0739'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentQueueCursor',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('position', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.query_cache import CachedManager
+
 SHOW_POST_NAME = 15
 
 User = get_user_model()
@@ -11,6 +13,8 @@ class Group(models.Model):
     slug = models.SlugField(unique=True)
     description = models.TextField()
 
+    objects = CachedManager()
+
     def __str__(self):
         return self.title
 
@@ -44,12 +48,27 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
     )
+    hot_score = models.FloatField(
+        'Рейтинг в горячем',
+        default=0,
+        editable=False,
+    )
+
+    objects = CachedManager()
 
     def __str__(self):
         return self.text[:SHOW_POST_NAME]
 
+    def is_editable_by(self, user):
+        """Редактировать пост может только его автор."""
+        return user.is_authenticated and self.author_id == user.id
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-hot_score', '-id'],
+                         name='post_hot_score'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -76,11 +95,20 @@ class Comment(models.Model):
         verbose_name='Пост',
     )
 
+    objects = CachedManager()
+
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Коментарии'
 
 
+class CommentQueueCursor(models.Model):
+    """Номер последнего комментария, выгруженного из очереди
+    отложенной записи (см. posts.comment_queue)."""
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.BigIntegerField(default=0)
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -95,6 +123,8 @@ class Follow(models.Model):
         verbose_name='Автор',
     )
 
+    objects = CachedManager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'author'],
@@ -103,3 +133,47 @@ class Follow(models.Model):
         ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+
+    @staticmethod
+    def can_follow(user, author):
+        """Подписаться можно на любого автора, кроме себя."""
+        return user.is_authenticated and user.id != author.id
+
+
+class FollowSuggestion(models.Model):
+    """Рекомендация "на кого подписаться": автор, на которого подписаны
+    те, на кого подписан пользователь. Заполняется командой
+    refresh_suggestions."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Пользователь',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    score = models.PositiveIntegerField('Общих подписок')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-score'],
+                         name='follow_suggestion_user_score'),
+        ]
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+
+
+class FollowSuggestionState(models.Model):
+    """Сигнатура подписок пользователя на момент последнего пересчёта
+    рекомендаций, по ней находятся изменившиеся строки графа."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+    )
+    signature = models.BigIntegerField()
@@ -0,0 +1,48 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import feed_ids, follow_cache, unread
+from .models import Follow, Post
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    follow_cache.invalidate_on_commit([instance.user_id])
+    unread.invalidate_on_commit([instance.user_id])
+
+
+@receiver(pre_save, sender=Post)
+def post_group_before_save(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._saved_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        feed_ids.post_created(instance)
+        unread.post_created(instance)
+        return
+    saved_group_id = getattr(instance, '_saved_group_id', None)
+    if saved_group_id != instance.group_id:
+        feed_ids.invalidate([feed_ids.group_key(group_id) for group_id
+                             in (saved_group_id, instance.group_id)
+                             if group_id])
+
+
+@receiver(pre_delete, sender=Post)
+def post_fields_before_delete(sender, instance, **kwargs):
+    # после удаления отложенные поля (.only()) уже не дочитать
+    deferred = instance.get_deferred_fields() & {'author_id', 'group_id'}
+    if deferred:
+        instance.refresh_from_db(fields=deferred)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    feed_ids.post_deleted(instance)
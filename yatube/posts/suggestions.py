@@ -0,0 +1,179 @@
+"""Рекомендации "на кого подписаться" по друзьям друзей.
+
+Граф подписок выгружается в разреженную матрицу смежности A (строка -
+подписчик, столбец - автор). Строка (A @ A)[u] считает для каждого автора,
+сколько из тех, на кого подписан u, подписаны на него. Из неё убираются
+уже существующие подписки и сам u, а top-k оставшихся сохраняются
+в FollowSuggestion, откуда страницы читают их одним запросом по индексу.
+
+При инкрементальном пересчёте умножаются только строки пользователей,
+чьё окружение на два шага изменилось: сигнатура их подписок или подписок
+их авторов не совпала с сохранённой в FollowSuggestionState.
+"""
+import time
+
+from django.db import transaction
+
+from .models import Follow, FollowSuggestion, FollowSuggestionState
+
+SUGGESTIONS_TOP = 10
+SUGGESTIONS_SHOWN = 5
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+class RefreshReport:
+    def __init__(self):
+        self.users = 0
+        self.edges = 0
+        self.changed = 0
+        self.recomputed = 0
+        self.suggestions = 0
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return (
+            'пользователей в графе: {}, подписок: {}, изменилось: {}, '
+            'пересчитано: {}, рекомендаций: {}, {:.2f} с'.format(
+                self.users, self.edges, self.changed, self.recomputed,
+                self.suggestions, self.elapsed,
+            )
+        )
+
+
+def load_graph():
+    """Возвращает (id пользователей по индексам, матрицу смежности CSR)."""
+    import numpy as np
+    from scipy import sparse
+
+    edges = np.array(
+        list(Follow.objects.order_by('user_id', 'author_id')
+             .values_list('user_id', 'author_id')),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    ids, index = np.unique(edges, return_inverse=True)
+    index = index.reshape(-1, 2)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(edges), dtype=np.int32), (index[:, 0], index[:, 1])),
+        shape=(len(ids), len(ids)),
+    )
+    return ids, matrix
+
+
+def signatures(ids, matrix):
+    """Сигнатура множества авторов каждой строки: сумма хешей их id
+    по модулю 2**64, не зависящая от порядка."""
+    import numpy as np
+
+    hashes = ids[matrix.indices].astype(np.uint64) * np.uint64(
+        HASH_MULTIPLIER
+    )
+    hashes ^= hashes >> np.uint64(31)
+    result = np.zeros(len(ids), dtype=np.uint64)
+    rows = np.flatnonzero(np.diff(matrix.indptr))
+    if len(rows):
+        result[rows] = np.add.reduceat(hashes, matrix.indptr[rows])
+    return result.view(np.int64)
+
+
+def changed_rows(ids, current):
+    """Индексы строк, чья сигнатура разошлась с сохранённой, и id
+    пользователей, которые из графа выпали совсем."""
+    import numpy as np
+
+    stored = dict(FollowSuggestionState.objects.values_list('user_id',
+                                                            'signature'))
+    previous = np.array([stored.pop(user_id, 0) for user_id in ids.tolist()],
+                        dtype=np.int64)
+    return np.flatnonzero(previous != current), list(stored)
+
+
+def affected_rows(matrix, changed):
+    """Строки, для которых изменились подписки их самих или их авторов."""
+    import numpy as np
+
+    marker = np.zeros(matrix.shape[0], dtype=np.int32)
+    marker[changed] = 1
+    affected = (matrix @ marker) > 0
+    affected[changed] = True
+    return np.flatnonzero(affected)
+
+
+def top_candidates(matrix, rows, top):
+    """Для каждой строки из rows - список пар (индекс автора, счёт)."""
+    import numpy as np
+    from scipy import sparse
+
+    block = matrix[rows]
+    itself = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (np.arange(len(rows)), rows)),
+        shape=block.shape,
+    )
+    second = block @ matrix
+    # Убираем тех, на кого пользователь уже подписан, и его самого.
+    second = second - second.multiply(block + itself)
+    second.eliminate_zeros()
+    result = []
+    for position in range(len(rows)):
+        start, end = second.indptr[position], second.indptr[position + 1]
+        columns = second.indices[start:end]
+        scores = second.data[start:end]
+        if len(scores) > top:
+            best = np.argpartition(-scores, top - 1)[:top]
+            columns, scores = columns[best], scores[best]
+        order = np.lexsort((columns, -scores))
+        result.append(list(zip(columns[order].tolist(),
+                               scores[order].tolist())))
+    return result
+
+
+def refresh(full=False, top=SUGGESTIONS_TOP, batch_size=1000):
+    """Пересчитывает рекомендации; без full - только затронутые строки."""
+    report = RefreshReport()
+    started = time.perf_counter()
+    ids, matrix = load_graph()
+    current = signatures(ids, matrix)
+    changed, dropped = changed_rows(ids, current)
+    rows = (list(range(len(ids))) if full
+            else affected_rows(matrix, changed).tolist())
+    report.users, report.edges = len(ids), matrix.nnz
+    report.changed, report.recomputed = len(changed) + len(dropped), len(rows)
+
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id__in=dropped).delete()
+        FollowSuggestionState.objects.filter(user_id__in=dropped).delete()
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start:start + batch_size]
+            user_ids = ids[chunk].tolist()
+            suggestions = [
+                FollowSuggestion(user_id=user_id, author_id=int(ids[column]),
+                                 score=score)
+                for user_id, candidates in zip(
+                    user_ids, top_candidates(matrix, chunk, top)
+                )
+                for column, score in candidates
+            ]
+            FollowSuggestion.objects.filter(user_id__in=user_ids).delete()
+            FollowSuggestion.objects.bulk_create(suggestions)
+            report.suggestions += len(suggestions)
+        FollowSuggestionState.objects.filter(
+            user_id__in=ids[changed].tolist()
+        ).delete()
+        FollowSuggestionState.objects.bulk_create(
+            [FollowSuggestionState(user_id=int(ids[row]),
+                                   signature=int(current[row]))
+             for row in changed],
+            batch_size=batch_size,
+        )
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def suggestions_for(user, limit=SUGGESTIONS_SHOWN):
+    """Рекомендации для страницы: один запрос по индексу (user, -score)."""
+    if not user.is_authenticated:
+        return []
+    return list(
+        FollowSuggestion.objects.filter(user=user)
+        .select_related('author')
+        .order_by('-score', 'author_id')[:limit]
+    )
@@ -0,0 +1,48 @@
+"""Фоновые задачи приложения posts для `manage.py runworker`."""
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from core.jobs import task
+
+from . import comment_queue, hot, suggestions, trending, unread
+from .models import Post
+
+# те же параметры, что у {% thumbnail %} в шаблонах ленты и поста
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+@task
+def make_thumbnail(post_id):
+    """Заранее нарезает превью картинки поста, чтобы его не делал
+    первый запрос ленты."""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is not None and post.image:
+        get_thumbnail(post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
+
+
+@task
+def bump_unread(author_id, post_id):
+    """Счётчики новых постов у подписчиков автора (posts.unread)."""
+    unread.bump(author_id, post_id)
+
+
+@task(every=10)
+def flush_comments():
+    if settings.COMMENT_WRITE_BEHIND:
+        comment_queue.flush_all()
+
+
+@task(every=15)
+def fold_trending():
+    trending.refresh()
+
+
+@task(every=5 * 60)
+def score_hot_posts():
+    hot.score_posts()
+
+
+@task(every=60 * 60)
+def refresh_suggestions():
+    suggestions.refresh()
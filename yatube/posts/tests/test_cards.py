@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .. import feed_ids
+from ..cards import CardFeed, PostCard, project
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author',
+                                            first_name='Лев',
+                                            last_name='Толстой')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='В группе', author=cls.user,
+                                       group=cls.group)
+        cls.lone = Post.objects.create(text='Без группы', author=cls.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_card_fields(self):
+        """Карточка содержит поля ленты и готовые ссылки."""
+        lone, post = project(Post.objects.all())
+        self.assertIsInstance(post, PostCard)
+        self.assertFalse(hasattr(post, '__dict__'))
+        self.assertEqual(post.text, 'В группе')
+        self.assertEqual(post.author_name, 'Лев Толстой')
+        self.assertEqual(post.url, reverse('posts:post_detail',
+                                           args=[self.post.id]))
+        self.assertEqual(post.author_url, reverse('posts:profile',
+                                                  args=['author']))
+        self.assertEqual(post.group_url, reverse('posts:group_list',
+                                                 args=['group']))
+        self.assertIsNone(lone.group_url)
+
+    def test_feed_renders_cards(self):
+        """Лента рендерит карточки с теми же ссылками, что и раньше."""
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'Лев Толстой')
+        self.assertContains(response, reverse('posts:group_list',
+                                              args=['group']))
+        self.assertContains(response, reverse('posts:post_detail',
+                                              args=[self.lone.id]))
+
+
+class CardFeedTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.posts = [Post.objects.create(text=f'Пост {i}', author=self.user)
+                      for i in range(5)]
+
+    def tearDown(self):
+        cache.clear()
+
+    def feed(self):
+        return CardFeed(feed_ids.RingFeed(feed_ids.index_key(),
+                                          Post.objects.all()))
+
+    def test_warm_page_skips_queries(self):
+        """Тёплая страница из буфера не ходит в базу."""
+        list(Paginator(self.feed(), 3).get_page(1))
+        with self.assertNumQueries(0):
+            page = Paginator(self.feed(), 3).get_page(1)
+            self.assertEqual([card.id for card in page],
+                             [post.id for post in self.posts[:1:-1]])
+
+    def test_edit_is_visible(self):
+        """Правка поста сразу видна в карточке."""
+        list(Paginator(self.feed(), 3).get_page(1))
+        post = self.posts[-1]
+        post.text = 'Исправлено'
+        post.save()
+        self.assertEqual(Paginator(self.feed(), 3).get_page(1)[0].text,
+                         'Исправлено')
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import comment_queue
+from ..models import Comment, CommentQueueCursor, Post
+
+TEMP_QUEUE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+@override_settings(
+    COMMENT_WRITE_BEHIND=True,
+    COMMENT_QUEUE_PATH=os.path.join(TEMP_QUEUE_DIR, 'queue.sqlite3'),
+)
+class CommentQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.commenter = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_QUEUE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        comment_queue.connection().execute('DELETE FROM queue')
+        self.client = Client()
+        self.client.force_login(CommentQueueTests.commenter)
+        self.add_url = reverse('posts:add_comment',
+                               args=[CommentQueueTests.post.id])
+        self.detail_url = reverse('posts:post_detail',
+                                  args=[CommentQueueTests.post.id])
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_comment_is_acknowledged_and_queued(self):
+        """Комментарий принимается сразу, но в базу пока не пишется."""
+        response = self.client.post(self.add_url, {'text': 'В очереди'})
+        self.assertRedirects(response, self.detail_url)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(comment_queue.size(), 1)
+
+    def test_read_your_writes(self):
+        """Автор видит свой комментарий до выгрузки, остальные - нет."""
+        self.client.post(self.add_url, {'text': 'Мой комментарий'})
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Мой комментарий')
+        other = Client()
+        other.force_login(CommentQueueTests.author)
+        self.assertNotContains(other.get(self.detail_url),
+                               'Мой комментарий')
+
+    def test_flush_keeps_order(self):
+        """Выгрузка пачками сохраняет порядок поступления."""
+        texts = [f'Комментарий {i}' for i in range(5)]
+        for text in texts:
+            self.client.post(self.add_url, {'text': text})
+        self.assertEqual(comment_queue.flush_all(batch_size=2), 5)
+        self.assertEqual(
+            list(Comment.objects.order_by('id').values_list('text',
+                                                            flat=True)),
+            texts,
+        )
+        self.assertEqual(comment_queue.size(), 0)
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, texts[0], count=1)
+
+    def test_flush_is_exactly_once(self):
+        """Выгруженные, но не удалённые из очереди элементы не дублируются."""
+        self.client.post(self.add_url, {'text': 'Один раз'})
+        self.client.post(self.add_url, {'text': 'Второй'})
+        seq = comment_queue.connection().execute(
+            'SELECT MIN(seq) FROM queue'
+        ).fetchone()[0]
+        # Как будто процесс упал после коммита, но до очистки очереди.
+        Comment.objects.create(post=CommentQueueTests.post,
+                               author=CommentQueueTests.commenter,
+                               text='Один раз')
+        CommentQueueCursor.objects.create(name=comment_queue.cursor_name(),
+                                          position=seq)
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Один раз', count=1)
+        comment_queue.flush_all()
+        self.assertEqual(Comment.objects.filter(text='Один раз').count(), 1)
+        self.assertEqual(Comment.objects.filter(text='Второй').count(), 1)
+
+    def test_new_queue_file_gets_own_cursor(self):
+        """Новый файл очереди не наследует позицию прежнего."""
+        for text in ('Первый', 'Второй'):
+            self.client.post(self.add_url, {'text': text})
+        comment_queue.flush_all()
+        path = os.path.join(TEMP_QUEUE_DIR, 'new_queue.sqlite3')
+        with self.settings(COMMENT_QUEUE_PATH=path):
+            self.assertEqual(comment_queue.flushed_position(), 0)
+            self.client.post(self.add_url, {'text': 'Третий'})
+            self.assertEqual(comment_queue.flush_all(), 1)
+        self.assertEqual(Comment.objects.filter(text='Третий').count(), 1)
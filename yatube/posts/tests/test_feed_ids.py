@@ -0,0 +1,126 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .. import feed_ids
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class RingFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.posts = [Post.objects.create(text=f'Пост {i}', author=cls.user)
+                     for i in range(5)]
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def feed(self):
+        return feed_ids.RingFeed(feed_ids.index_key(),
+                                 Post.objects.select_related('author'))
+
+    def test_warm_page_skips_queries(self):
+        """Страница из тёплого буфера и кеша объектов не ходит в базу."""
+        list(Paginator(self.feed(), 3).get_page(1))
+        with self.assertNumQueries(0):
+            page = Paginator(self.feed(), 3).get_page(1)
+            posts = list(page)
+        self.assertEqual(posts, list(Post.objects.all()[:3]))
+        self.assertEqual(page.paginator.count, 5)
+
+    def test_page_beyond_ring_uses_queryset(self):
+        """Страница дальше буфера читается обычным запросом."""
+        with mock.patch.object(feed_ids, 'RING_SIZE', 2):
+            feed = self.feed()
+            self.assertEqual(feed.count(), 5)
+            self.assertEqual(list(feed[2:4]), list(Post.objects.all()[2:4]))
+        self.assertEqual(len(cache.get(feed_ids.index_key())['ids']), 2)
+
+    def test_push_and_remove(self):
+        """Новый id встаёт в начало буфера, удалённый вычёркивается."""
+        key = feed_ids.index_key()
+        self.feed().count()
+        feed_ids.push([key], 1000)
+        entry = cache.get(key)
+        self.assertEqual(entry['ids'][0], 1000)
+        self.assertEqual(entry['count'], 6)
+        feed_ids.remove([key], 1000)
+        self.assertEqual(cache.get(key)['ids'],
+                         [post.id for post in Post.objects.all()])
+        self.assertEqual(cache.get(key)['count'], 5)
+
+    def test_busy_lock_drops_ring(self):
+        """Если буфер обновляет кто-то другой, он сбрасывается."""
+        key = feed_ids.index_key()
+        self.feed().count()
+        cache.add(key + ':lock', 1)
+        feed_ids.push([key], 1000)
+        self.assertIsNone(cache.get(key))
+
+
+class RingSignalTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group{i}',
+                                 description='Описание')
+            for i in range(2)
+        ]
+        self.client = Client()
+
+    def tearDown(self):
+        cache.clear()
+
+    def ring(self, key):
+        return cache.get(key)['ids']
+
+    def test_create_and_delete_update_rings(self):
+        """Создание и удаление поста сразу видны во всех его лентах."""
+        group = self.groups[0]
+        self.client.get(reverse('posts:profile', args=['author']))
+        self.client.get(reverse('posts:group_list', args=[group.slug]))
+        post = Post.objects.create(text='Новый', author=self.user,
+                                   group=group)
+        author_key = feed_ids.author_key(self.user.id)
+        self.assertEqual(self.ring(author_key), [post.id])
+        self.assertEqual(self.ring(feed_ids.group_key(group.id)), [post.id])
+        post.delete()
+        self.assertEqual(self.ring(author_key), [])
+        self.assertEqual(cache.get(author_key)['count'], 0)
+
+    def test_group_change_invalidates(self):
+        """Перенос поста в другую группу сбрасывает буферы обеих групп."""
+        old, new = self.groups
+        post = Post.objects.create(text='Пост', author=self.user, group=old)
+        for group in self.groups:
+            self.client.get(reverse('posts:group_list', args=[group.slug]))
+        post.group = new
+        post.save()
+        self.assertIsNone(cache.get(feed_ids.group_key(old.id)))
+        self.assertIsNone(cache.get(feed_ids.group_key(new.id)))
+        response = self.client.get(reverse('posts:group_list',
+                                           args=[new.slug]))
+        self.assertEqual([card.id for card in response.context['page_obj']],
+                         [post.id])
+
+    def test_delete_with_deferred_fields(self):
+        """Удаление поста, загруженного через .only(), тоже убирает его
+        из буфера группы."""
+        group = self.groups[0]
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   group=group)
+        self.client.get(reverse('posts:group_list', args=[group.slug]))
+        Post.objects.only('id').get(pk=post.id).delete()
+        self.assertEqual(self.ring(feed_ids.group_key(group.id)), [])
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import follow_cache
+from ..follows import bulk_follow
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.authors = [User.objects.create_user(username=f'author{i}')
+                       for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        follow_cache.clear()
+
+    def test_lookup_is_cached(self):
+        """Повторная проверка подписки не ходит в базу."""
+        author = FollowCacheTests.authors[0]
+        Follow.objects.create(user=FollowCacheTests.user, author=author)
+        self.assertTrue(follow_cache.is_following(FollowCacheTests.user.id,
+                                                  author.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_cache.is_following(
+                FollowCacheTests.user.id, author.id
+            ))
+            self.assertFalse(follow_cache.is_following(
+                FollowCacheTests.user.id, FollowCacheTests.authors[1].id
+            ))
+            self.assertFalse(follow_cache.is_following(None, author.id))
+
+    def test_save_and_delete_invalidate(self):
+        """Подписка и отписка сразу видны в кеше."""
+        user_id = FollowCacheTests.user.id
+        author = FollowCacheTests.authors[1]
+        self.assertFalse(follow_cache.is_following(user_id, author.id))
+        follow = Follow.objects.create(user=FollowCacheTests.user,
+                                       author=author)
+        self.assertTrue(follow_cache.is_following(user_id, author.id))
+        follow.delete()
+        self.assertFalse(follow_cache.is_following(user_id, author.id))
+
+    def test_version_token_invalidates_other_processes(self):
+        """Смена токена в общем кеше заставляет перечитать список."""
+        user_id = FollowCacheTests.user.id
+        author = FollowCacheTests.authors[2]
+        self.assertFalse(follow_cache.is_following(user_id, author.id))
+        # Запись в обход сигналов, как будто её сделал другой процесс.
+        Follow.objects.bulk_create([Follow(user_id=user_id,
+                                           author_id=author.id)])
+        self.assertFalse(follow_cache.is_following(user_id, author.id))
+        cache.set(follow_cache.VERSION_KEY.format(user_id), 'other')
+        self.assertTrue(follow_cache.is_following(user_id, author.id))
+
+    def test_process_local_cache_reads_database(self):
+        """С кешем в памяти процесса граф не кешируется."""
+        author = FollowCacheTests.authors[0]
+        local = {'default': {'BACKEND': 'core.cache.TinyLFUCache'}}
+        with override_settings(CACHES=local):
+            follow_cache.is_following(FollowCacheTests.user.id, author.id)
+            with self.assertNumQueries(1):
+                follow_cache.is_following(FollowCacheTests.user.id,
+                                          author.id)
+
+    def test_bulk_follow_invalidates(self):
+        """Пакетная подписка сбрасывает кеш."""
+        user_id = FollowCacheTests.user.id
+        self.assertEqual(follow_cache.followed_among(
+            user_id, [author.id for author in FollowCacheTests.authors]
+        ), set())
+        bulk_follow([('user', 'author0'), ('user', 'author1')])
+        self.assertEqual(follow_cache.followed_among(
+            user_id, [author.id for author in FollowCacheTests.authors]
+        ), {FollowCacheTests.authors[0].id, FollowCacheTests.authors[1].id})
+        self.assertEqual(
+            follow_cache.followers_among(
+                [user_id, FollowCacheTests.authors[2].id],
+                FollowCacheTests.authors[0].id,
+            ),
+            {user_id},
+        )
+
+    def test_profile_follow_badges(self):
+        """Профиль показывает подписку и плашку "подписан на вас"."""
+        author = FollowCacheTests.authors[0]
+        Follow.objects.create(user=author, author=FollowCacheTests.user)
+        client = Client()
+        client.force_login(FollowCacheTests.user)
+        response = client.get(reverse('posts:profile',
+                                      args=[author.username]))
+        self.assertFalse(response.context['following'])
+        self.assertTrue(response.context['follows_you'])
+        client.get(reverse('posts:profile_follow', args=[author.username]))
+        response = client.get(reverse('posts:profile',
+                                      args=[author.username]))
+        self.assertTrue(response.context['following'])
@@ -0,0 +1,88 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..follows import FOLLOW_BATCH_SIZE, bulk_follow, bulk_unfollow
+from ..models import Follow
+
+User = get_user_model()
+
+USERS_COUNT = 6
+
+
+class BulkFollowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [User.objects.create_user(username=f'user{i}')
+                     for i in range(USERS_COUNT)]
+        cls.pairs = [(user.username, author.username)
+                     for user in cls.users for author in cls.users
+                     if user != author]
+
+    def test_bulk_follow_is_idempotent(self):
+        """Повторный импорт тех же пар ничего не меняет."""
+        report = bulk_follow(BulkFollowTests.pairs, batch_size=7)
+        self.assertEqual(report.changed, len(BulkFollowTests.pairs))
+        self.assertEqual(Follow.objects.count(), len(BulkFollowTests.pairs))
+        report = bulk_follow(BulkFollowTests.pairs, batch_size=7)
+        self.assertEqual(report.changed, 0)
+        self.assertEqual(report.unchanged, len(BulkFollowTests.pairs))
+        self.assertEqual(Follow.objects.count(), len(BulkFollowTests.pairs))
+
+    def test_bulk_follow_skips_unknown_and_self(self):
+        """Неизвестные пользователи и подписки на себя пропускаются."""
+        report = bulk_follow([('user0', 'user1'), ('user0', 'user1'),
+                              ('user0', 'user0'), ('user0', 'nobody')])
+        self.assertEqual(report.pairs, 4)
+        self.assertEqual(report.changed, 1)
+        self.assertEqual(report.unchanged, 1)
+        self.assertEqual(report.skipped, 2)
+        self.assertEqual(report.unknown_users, {'nobody'})
+
+    def test_bulk_follow_query_count(self):
+        """На пачку уходит постоянное число запросов."""
+        with self.assertNumQueries(3):
+            bulk_follow(BulkFollowTests.pairs)
+
+    def test_bulk_unfollow(self):
+        """Пакетная отписка удаляет только указанные подписки."""
+        bulk_follow(BulkFollowTests.pairs)
+        report = bulk_unfollow([('user0', 'user1'), ('user0', 'user2'),
+                                ('user0', 'user2')])
+        self.assertEqual(report.changed, 2)
+        self.assertEqual(report.unchanged, 1)
+        self.assertEqual(Follow.objects.count(),
+                         len(BulkFollowTests.pairs) - 2)
+
+    def test_full_batch_of_distinct_followers(self):
+        """Пачка по умолчанию из разных подписчиков одного автора
+        проходит одним вызовом и в подписку, и в отписку."""
+        User.objects.bulk_create(
+            [User(username=f'follower{i}') for i in range(FOLLOW_BATCH_SIZE)]
+        )
+        pairs = [(f'follower{i}', 'user0') for i in range(FOLLOW_BATCH_SIZE)]
+        report = bulk_follow(pairs)
+        self.assertEqual(report.changed, FOLLOW_BATCH_SIZE)
+        report = bulk_follow(pairs)
+        self.assertEqual(report.unchanged, FOLLOW_BATCH_SIZE)
+        report = bulk_unfollow(pairs)
+        self.assertEqual(report.changed, FOLLOW_BATCH_SIZE)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_import_follows_command(self):
+        """Команда import_follows читает пары из CSV и печатает отчёт."""
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as file:
+            file.write('# подписчик,автор\nuser0,user1\nuser1,user0\n')
+        out = StringIO()
+        try:
+            call_command('import_follows', path, stdout=out)
+        finally:
+            os.remove(path)
+        self.assertIn('изменено: 2', out.getvalue())
+        self.assertEqual(Follow.objects.count(), 2)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..hot import HOT_WINDOW, hot_scores, score_posts
+from ..models import Comment, Follow, Post
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+User = get_user_model()
+
+
+@skipIf(numpy is None, 'numpy не установлен')
+class HotFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.popular = User.objects.create_user(username='popular')
+        for i in range(5):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'follower{i}'),
+                author=cls.popular,
+            )
+        cls.quiet = Post.objects.create(author=cls.author, text='Тихий')
+        cls.discussed = Post.objects.create(author=cls.author,
+                                            text='Обсуждаемый')
+        cls.followed = Post.objects.create(author=cls.popular,
+                                           text='Популярного автора')
+        cls.old = Post.objects.create(author=cls.author, text='Старый',
+                                      hot_score=1)
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=timezone.now() - HOT_WINDOW - timedelta(hours=1)
+        )
+        for _ in range(5):
+            Comment.objects.create(author=cls.author, post=cls.discussed,
+                                   text='Комментарий')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_scores(self):
+        """Рейтинг растёт с комментариями и подписчиками и падает с
+        возрастом."""
+        fresh, commented, followed, aged = hot_scores(
+            [0, 0, 0, 10], [0, 3, 0, 0], [0, 0, 10, 0]
+        )
+        self.assertGreater(commented, fresh)
+        self.assertGreater(followed, fresh)
+        self.assertLess(aged, fresh)
+
+    def test_hot_feed_order(self):
+        """Горячая лента упорядочена по рейтингу, старые посты выпадают."""
+        count, _ = score_posts()
+        self.assertEqual(count, 3)
+        response = Client().get(reverse('posts:index'), {'mode': 'hot'})
+        self.assertEqual(
+            [card.id for card in response.context['page_obj']],
+            [HotFeedTests.discussed.id, HotFeedTests.followed.id,
+             HotFeedTests.quiet.id],
+        )
+        self.assertTrue(response.context['hot'])
+        HotFeedTests.old.refresh_from_db()
+        self.assertEqual(HotFeedTests.old.hot_score, 0)
+
+    def test_large_window_without_id_lists(self):
+        """Окно больше лимита параметров SQLite считается без списков id
+        в запросах."""
+        Post.objects.bulk_create(
+            [Post(author=HotFeedTests.author, text=f'Пост {i}')
+             for i in range(1000)]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            count, _ = score_posts()
+        self.assertEqual(count, 1003)
+        selects = [query['sql'] for query in queries
+                   if query['sql'].startswith('SELECT')]
+        self.assertLess(max(map(len, selects)), 1000)
+
+    def test_default_feed_is_chronological(self):
+        """Без mode=hot лента остаётся хронологической."""
+        score_posts()
+        response = Client().get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'][0].id,
+                         HotFeedTests.followed.id)
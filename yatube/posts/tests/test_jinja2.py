@@ -0,0 +1,116 @@
+import shutil
+import tempfile
+from unittest import skipIf
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import engines
+from django.test import (Client, RequestFactory, TestCase,
+                         override_settings)
+from django.urls import resolve, reverse
+
+from ..management.commands.benchmark_templates import (jinja2_engine,
+                                                       make_context)
+from ..models import Follow, Group, Post
+from .test_views import SMALL_GIF
+
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+@skipIf(jinja2 is None, 'Jinja2 не установлен')
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POSTS_TEMPLATE_ENGINE='jinja2',
+    TEMPLATES=settings.TEMPLATES[:1] + [settings.JINJA2_TEMPLATES],
+)
+class Jinja2TemplatesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author',
+                                            first_name='Лев',
+                                            last_name='Толстой')
+        cls.follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=cls.follower, author=cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый пост',
+            image=SimpleUploadedFile(name='small.gif', content=SMALL_GIF,
+                                     content_type='image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(Jinja2TemplatesTests.follower)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_feeds_render_post_cards(self):
+        """Ленты на Jinja2 выводят карточки постов со ссылками."""
+        post = Jinja2TemplatesTests.post
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, post.text)
+                self.assertContains(
+                    response, reverse('posts:post_detail', args=[post.id])
+                )
+                self.assertContains(response, '<img class="card-img my-2"')
+                self.assertContains(response,
+                                    post.pub_date.strftime('%Y'))
+
+    def test_benchmark_context_renders_links(self):
+        """Контекст benchmark_templates - карточки со ссылками, как
+        в представлениях."""
+        context = make_context(3)
+        request = RequestFactory().get(reverse('posts:index'))
+        request.user = AnonymousUser()
+        request.resolver_match = resolve(request.path_info)
+        for engine in (engines['django'], jinja2_engine()):
+            with self.subTest(engine=engine.name):
+                html = engine.get_template('posts/index.html').render(
+                    context, request
+                )
+                self.assertIn(reverse('posts:post_detail', args=[1]), html)
+                self.assertNotIn('href=""', html)
+
+    def test_profile_uses_follow_state(self):
+        """Профиль на Jinja2 учитывает подписку и скрывает автора."""
+        response = self.client.get(
+            reverse('posts:profile', args=[self.user.username])
+        )
+        self.assertContains(
+            response, reverse('posts:profile_unfollow',
+                              args=[self.user.username])
+        )
+        self.assertContains(response, 'Всего постов: 1')
+        self.assertNotContains(response, 'Автор:')
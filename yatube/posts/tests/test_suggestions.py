@@ -0,0 +1,73 @@
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, FollowSuggestion
+from ..suggestions import refresh, suggestions_for
+
+try:
+    import scipy
+except ImportError:
+    scipy = None
+
+User = get_user_model()
+
+
+@skipIf(scipy is None, 'scipy не установлен')
+class SuggestionsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('user', 'a', 'b', 'c', 'd', 'e', 'lonely')
+        }
+        for user, author in (('user', 'a'), ('user', 'b'), ('a', 'c'),
+                             ('a', 'd'), ('b', 'c')):
+            Follow.objects.create(user=cls.users[user],
+                                  author=cls.users[author])
+
+    def suggested(self, name):
+        return [(suggestion.author.username, suggestion.score)
+                for suggestion in suggestions_for(self.users[name])]
+
+    def test_friends_of_friends(self):
+        """Рекомендуются авторы на расстоянии двух шагов по числу путей."""
+        refresh()
+        self.assertEqual(self.suggested('user'), [('c', 2), ('d', 1)])
+        self.assertEqual(self.suggested('lonely'), [])
+        self.assertFalse(FollowSuggestion.objects.filter(
+            user=self.users['user'],
+            author__in=[self.users['a'], self.users['b'], self.users['user']],
+        ).exists())
+
+    def test_incremental_refresh(self):
+        """Повторный пересчёт трогает только изменившееся окружение."""
+        refresh()
+        report = refresh()
+        self.assertEqual(report.recomputed, 0)
+        Follow.objects.create(user=self.users['b'], author=self.users['e'])
+        report = refresh()
+        self.assertEqual(report.changed, 1)
+        self.assertEqual(report.recomputed, 2)
+        self.assertEqual(self.suggested('user'),
+                         [('c', 2), ('d', 1), ('e', 1)])
+        Follow.objects.filter(user=self.users['user']).delete()
+        refresh()
+        self.assertEqual(self.suggested('user'), [])
+
+    def test_pages_show_suggestions(self):
+        """Рекомендации видны в профиле и в ленте подписок."""
+        refresh()
+        client = Client()
+        client.force_login(self.users['user'])
+        for url in (reverse('posts:follow_index'),
+                    reverse('posts:profile', args=['a'])):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertContains(response, 'На кого подписаться')
+                self.assertContains(
+                    response, reverse('posts:profile_follow', args=['d'])
+                )
@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.jobs import Worker
+from core.models import Job
+
+from ..models import Post
+from ..tasks import make_thumbnail
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTaskTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_new_image_enqueues_thumbnail(self):
+        """Пост с картинкой ставит нарезку превью в очередь, воркер её
+        выполняет."""
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'С картинкой',
+            'image': SimpleUploadedFile('small.gif', SMALL_GIF,
+                                        content_type='image/gif'),
+        })
+        post = Post.objects.get()
+        job = Job.objects.get(name=make_thumbnail.task_name)
+        self.assertEqual(job.dedup_key, 'thumbnail:{}'.format(post.id))
+        Worker(mode='sync', poll_interval=0, leader=False).run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE, job.last_error)
+
+    def test_text_only_edit_enqueues_nothing(self):
+        """Правка без новой картинки задачу превью не создаёт."""
+        post = Post.objects.create(author=self.user, text='Без картинки')
+        self.client.post(reverse('posts:post_edit', args=[post.id]),
+                         {'text': 'Новый текст'})
+        self.assertFalse(
+            Job.objects.filter(name=make_thumbnail.task_name).exists()
+        )
+
+    def test_failed_enqueue_rolls_back_post(self):
+        """Пост и задача превью сохраняются в одной транзакции."""
+        with mock.patch('posts.views.enqueue', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse('posts:post_create'), {
+                    'text': 'С картинкой',
+                    'image': SimpleUploadedFile('small.gif', SMALL_GIF,
+                                                content_type='image/gif'),
+                })
+        self.assertFalse(Post.objects.exists())
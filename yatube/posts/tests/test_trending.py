@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.jobs import Worker, enqueue
+
+from .. import tasks, trending
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+HOUR = 60 * 60
+
+
+class DecayedSpaceSavingTests(TestCase):
+    def test_decay(self):
+        """Счётчик за период полураспада уменьшается вдвое."""
+        summary = trending.DecayedSpaceSaving(HOUR)
+        summary.add('old', 4, now=0)
+        summary.add('new', 3, now=HOUR)
+        self.assertEqual(summary.top(2, now=HOUR), ['new', 'old'])
+
+    def test_eviction_keeps_heavy_hitters(self):
+        """При переполнении вытесняется самый слабый счётчик."""
+        summary = trending.DecayedSpaceSaving(HOUR, capacity=2)
+        summary.add('heavy', 10, now=0)
+        summary.add('light', 1, now=0)
+        summary.add('newcomer', 1, now=0)
+        self.assertEqual(set(summary.counters), {'heavy', 'newcomer'})
+        self.assertEqual(summary.top(1, now=0), ['heavy'])
+
+
+class TrendingViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(TrendingViewTests.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_comments_raise_post(self):
+        """Обсуждаемый пост поднимается в популярном вместе с группой."""
+        quiet = Post.objects.create(author=self.user, text='Тихий пост')
+        hot = Post.objects.create(author=self.user, group=self.group,
+                                  text='Горячий пост')
+        trending.refresh()
+        for _ in range(3):
+            self.client.post(reverse('posts:add_comment', args=[hot.id]),
+                             {'text': 'Комментарий'})
+        Comment.objects.create(author=self.user, post=quiet, text='Один')
+        enqueue(tasks.fold_trending)
+        Worker(mode='sync', poll_interval=0, leader=False).run(burst=True)
+        top = trending.top('hour')
+        self.assertEqual(top['posts'], [hot.id, quiet.id])
+        self.assertEqual(top['groups'], [self.group.id])
+
+        response = Client().get(reverse('posts:trending'),
+                                {'window': 'hour'})
+        self.assertEqual([card.id for card in response.context['posts']],
+                         [hot.id, quiet.id])
+        self.assertEqual(list(response.context['groups']), [self.group])
+
+    def test_fold_counts_each_row_once(self):
+        """Проход задачи добавляет только строки, появившиеся после
+        сводки."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        self.assertTrue(trending.refresh())
+        self.assertFalse(trending.refresh())
+        Comment.objects.create(author=self.user, post=post,
+                               text='Комментарий')
+        self.assertTrue(trending.refresh())
+        self.assertFalse(trending.refresh())
+        summary = cache.get(trending.STATE_KEY)['windows']['hour']['posts']
+        value, _ = summary.counters[post.id]
+        self.assertAlmostEqual(value, trending.POST_WEIGHT
+                               + trending.COMMENT_WEIGHT, places=2)
+
+    def test_rebuild_after_eviction(self):
+        """Вытесненная сводка собирается заново из базы."""
+        quiet = Post.objects.create(author=self.user, text='Тихий пост')
+        hot = Post.objects.create(author=self.user, group=self.group,
+                                  text='Горячий пост')
+        for _ in range(3):
+            Comment.objects.create(author=self.user, post=hot, text='Да')
+        trending.refresh()
+        top = trending.top('hour')
+        cache.delete(trending.STATE_KEY)
+        trending.refresh()
+        self.assertEqual(trending.top('hour'), top)
+        self.assertEqual(top['posts'], [hot.id, quiet.id])
+
+    def test_busy_refresh_is_skipped(self):
+        """Пока идёт один проход задачи, второй ничего не делает."""
+        Post.objects.create(author=self.user, text='Пост')
+        cache.add(trending.LOCK_KEY, 1)
+        self.assertFalse(trending.refresh())
+        self.assertIsNone(cache.get(trending.STATE_KEY))
+
+    def test_page_does_not_rebuild(self):
+        """Без сводки страница пуста и не читает историю из базы."""
+        Post.objects.create(author=self.user, text='Пост')
+        with self.assertNumQueries(0):
+            response = Client().get(reverse('posts:trending'))
+        self.assertEqual(list(response.context['posts']), [])
+
+    def test_page_queries_do_not_depend_on_history(self):
+        """Страница популярного - два запроса по первичным ключам."""
+        for i in range(5):
+            Post.objects.create(author=self.user, group=self.group,
+                                text=f'Пост {i}')
+        trending.refresh()
+        with self.assertNumQueries(2):
+            Client().get(reverse('posts:trending'))
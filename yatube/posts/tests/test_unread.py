@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from core.jobs import Worker
+from core.models import Job
+
+from .. import follow_cache, unread
+from ..follows import follow
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+class UnreadTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        follow_cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def tearDown(self):
+        cache.clear()
+        follow_cache.clear()
+
+    def publish(self, author, number=1):
+        """Посты автора и выполненные задачи их рассылки."""
+        posts = [Post.objects.create(text='Пост', author=author)
+                 for _ in range(number)]
+        Worker(mode='sync', poll_interval=0, leader=False).run(burst=True)
+        return posts
+
+    def unread_json(self):
+        return self.client.get(reverse('posts:follow_unread')).json()
+
+    def test_new_posts_bump_count(self):
+        """Посты авторов из подписок увеличивают готовый счётчик."""
+        self.assertEqual(unread.count(self.reader.id), 0)
+        self.publish(self.author, 2)
+        self.publish(self.other)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread.count(self.reader.id), 2)
+
+    def test_fan_out_is_queued(self):
+        """Рассылка по подписчикам - задача в очереди, а не работа
+        запроса; увиденные посты она не считает."""
+        unread.count(self.reader.id)
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.assertTrue(Job.objects.filter(status=Job.QUEUED).exists())
+        self.assertEqual(unread.count(self.reader.id), 0)
+        unread.mark_seen(self.reader.id)
+        unread.bump(self.author.id, post.id)
+        self.assertEqual(unread.count(self.reader.id), 0)
+        Post.objects.create(text='Пост', author=self.author)
+        Worker(mode='sync', poll_interval=0, leader=False).run(burst=True)
+        self.assertEqual(unread.count(self.reader.id), 1)
+
+    def test_follow_feed_marks_seen(self):
+        """Открытая лента подписок обнуляет счётчик."""
+        self.publish(self.author)
+        self.assertEqual(self.unread_json(), {'count': 0, 'label': '0'})
+        self.publish(self.author)
+        self.assertEqual(self.unread_json(), {'count': 1, 'label': '1'})
+        self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(self.unread_json(), {'count': 0, 'label': '0'})
+
+    def test_lazy_recount(self):
+        """Без счётчика он пересчитывается, а без новых постов у авторов
+        подписок - даже без запроса."""
+        unread.count(self.reader.id)
+        cache.delete(unread.COUNT_KEY.format(self.reader.id))
+        with self.assertNumQueries(0):
+            self.assertEqual(unread.count(self.reader.id), 0)
+        self.publish(self.author, 2)
+        cache.delete(unread.COUNT_KEY.format(self.reader.id))
+        self.assertEqual(unread.count(self.reader.id), 2)
+
+    def test_count_is_capped(self):
+        """Больше UNREAD_MAX постов не считается."""
+        unread.count(self.reader.id)
+        self.publish(self.author, 4)
+        cache.delete(unread.COUNT_KEY.format(self.reader.id))
+        with mock.patch.object(unread, 'UNREAD_MAX', 2):
+            self.assertEqual(unread.count(self.reader.id), 3)
+            self.assertEqual(unread.label(3), '2+')
+
+    def test_follow_resets_count(self):
+        """Новая подписка учитывает посты автора после отметки."""
+        unread.count(self.reader.id)
+        self.publish(self.other)
+        self.assertEqual(unread.count(self.reader.id), 0)
+        follow(self.reader, self.other)
+        self.assertEqual(unread.count(self.reader.id), 1)
+
+    def test_switcher_badge(self):
+        """Переключатель лент подгружает значок, кроме самой ленты
+        подписок."""
+        url = reverse('posts:follow_unread')
+        self.assertContains(self.client.get(reverse('posts:index')), url)
+        self.assertNotContains(
+            self.client.get(reverse('posts:follow_index')), url
+        )
+
+    def test_anonymous_redirected(self):
+        """Гостя отправляют на вход."""
+        response = Client().get(reverse('posts:follow_unread'))
+        self.assertEqual(response.status_code, 302)
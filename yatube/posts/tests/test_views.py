@@ -123,12 +123,13 @@ class PostsPagesTests(TestCase):
         response = self.post_author_client.get(PostsPagesTests.INDEX_URL)
         first_post_object = response.context['page_obj'][0]
         post_text_0 = first_post_object.text
-        post_author_0 = first_post_object.author
-        post_group_0 = first_post_object.group
+        post_author_0 = first_post_object.author_username
+        post_group_0 = first_post_object.group_slug
         post_image_0 = first_post_object.image
         self.assertEqual(post_text_0, PostsPagesTests.posts[-1].text)
-        self.assertEqual(post_author_0, PostsPagesTests.posts[-1].author)
-        self.assertEqual(post_group_0, PostsPagesTests.posts[-1].group)
+        self.assertEqual(post_author_0,
+                         PostsPagesTests.posts[-1].author.username)
+        self.assertEqual(post_group_0, PostsPagesTests.posts[-1].group.slug)
         self.assertEqual(post_image_0,
                          PostsPagesTests.posts[-1].image,
                          )
@@ -147,12 +148,13 @@ class PostsPagesTests(TestCase):
 
         first_post_object = response.context['page_obj'][0]
         post_text_0 = first_post_object.text
-        post_author_0 = first_post_object.author
-        post_group_0 = first_post_object.group
+        post_author_0 = first_post_object.author_username
+        post_group_0 = first_post_object.group_slug
         post_image_0 = first_post_object.image
         self.assertEqual(post_text_0, PostsPagesTests.posts[-1].text)
-        self.assertEqual(post_author_0, PostsPagesTests.posts[-1].author)
-        self.assertEqual(post_group_0, PostsPagesTests.posts[-1].group)
+        self.assertEqual(post_author_0,
+                         PostsPagesTests.posts[-1].author.username)
+        self.assertEqual(post_group_0, PostsPagesTests.posts[-1].group.slug)
         self.assertEqual(post_image_0,
                          PostsPagesTests.posts[-1].image,
                          )
@@ -167,12 +169,13 @@ class PostsPagesTests(TestCase):
 
         first_post_object = response.context['page_obj'][0]
         post_text_0 = first_post_object.text
-        post_author_0 = first_post_object.author
-        post_group_0 = first_post_object.group
+        post_author_0 = first_post_object.author_username
+        post_group_0 = first_post_object.group_slug
         post_image_0 = first_post_object.image
         self.assertEqual(post_text_0, PostsPagesTests.posts[-1].text)
-        self.assertEqual(post_author_0, PostsPagesTests.posts[-1].author)
-        self.assertEqual(post_group_0, PostsPagesTests.posts[-1].group)
+        self.assertEqual(post_author_0,
+                         PostsPagesTests.posts[-1].author.username)
+        self.assertEqual(post_group_0, PostsPagesTests.posts[-1].group.slug)
         self.assertEqual(post_image_0,
                          PostsPagesTests.posts[-1].image,
                          )
@@ -228,9 +231,9 @@ class PostsPagesTests(TestCase):
         response = (self.post_author_client.
                     get(PostsPagesTests.GROUP_LIST_URL))
         first_post_object = response.context['page_obj'][0]
-        post_group_0 = first_post_object.group
-        self.assertEqual(post_group_0, PostsPagesTests.group)
-        self.assertNotEqual(post_group_0, PostsPagesTests.second_group)
+        post_group_0 = first_post_object.group_slug
+        self.assertEqual(post_group_0, PostsPagesTests.group.slug)
+        self.assertNotEqual(post_group_0, PostsPagesTests.second_group.slug)
 
     def test_pages_contains_expected_records(self):
         """Записи на страницах соответствуют содержанию и количеству."""
@@ -261,9 +264,10 @@ class PostsPagesTests(TestCase):
                                        + (page_number - 1) * POST_DISPLAY)
                         inverse_num = (len(PostsPagesTests.posts)
                                        - num_element - 1)
-                        self.assertEqual(PostsPagesTests.posts[inverse_num],
-                                         post_obj,
-                                         )
+                        self.assertEqual(
+                            PostsPagesTests.posts[inverse_num].id,
+                            post_obj.id,
+                        )
 
     def test_index_cache(self):
         """Кеш на главной странице сохраняется."""
@@ -296,12 +300,12 @@ class PostsPagesTests(TestCase):
         response = self.follower_1_client.get(PostsPagesTests.FOLLOW_URL)
         first_post_object = response.context['page_obj'][0]
         post_text_0 = first_post_object.text
-        post_author_0 = first_post_object.author
-        post_group_0 = first_post_object.group
+        post_author_0 = first_post_object.author_username
+        post_group_0 = first_post_object.group_slug
         post_image_0 = first_post_object.image
         self.assertEqual(post_text_0, post.text)
-        self.assertEqual(post_author_0, post.author)
-        self.assertEqual(post_group_0, post.group)
+        self.assertEqual(post_author_0, post.author.username)
+        self.assertEqual(post_group_0, post.group.slug)
         self.assertEqual(post_image_0, post.image)
 
         response = self.follower_2_client.get(PostsPagesTests.FOLLOW_URL)
@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from .. import feed_ids, warmup
+from ..models import Group, Post
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class PostsWarmupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.big = Group.objects.create(title='Большая', slug='big',
+                                       description='Описание')
+        cls.small = Group.objects.create(title='Маленькая', slug='small',
+                                         description='Описание')
+        cls.posts = [
+            Post.objects.create(text='Пост {}'.format(number),
+                                author=cls.user, group=cls.big)
+            for number in range(2)
+        ]
+        cls.posts.append(Post.objects.create(
+            text='С картинкой', author=cls.user, group=cls.small,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                     content_type='image/gif'),
+        ))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    def tearDown(self):
+        cache.clear()
+
+    @override_settings(WARMUP_GROUPS=1)
+    def test_feeds_primed(self):
+        """Шаг feeds собирает буферы главной и самых больших групп."""
+        self.assertEqual(warmup.prime_feeds(), 2)
+        self.assertEqual(cache.get(feed_ids.index_key())['ids'],
+                         [post.id for post in reversed(self.posts)])
+        self.assertIsNotNone(cache.get(feed_ids.group_key(self.big.id)))
+        self.assertIsNone(cache.get(feed_ids.group_key(self.small.id)))
+
+    def test_thumbnails_primed(self):
+        """Шаг thumbnails нарезает миниатюры картинок первых страниц."""
+        self.assertEqual(warmup.prime_thumbnails(), 1)
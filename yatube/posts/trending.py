@@ -0,0 +1,189 @@
+"""Популярные посты и группы по потоку новых постов и комментариев.
+
+Для каждого окна хранится сводка Space-Saving с экспоненциальным
+затуханием: не больше TRENDING_CAPACITY счётчиков на вид объекта, каждый
+- (значение, время последнего обновления). Когда сводка заполнена, новый
+объект вытесняет самый слабый счётчик и наследует его значение, так что
+тяжёлые объекты не теряются. После каждого обновления пересчитывается
+top-N, и страница популярного читает готовый список одним обращением
+к кешу.
+
+Запросы сводку не трогают: буфер событий - сами строки постов и
+комментариев в базе. Периодическая задача (posts.tasks.fold_trending)
+добирает строки с id больше запомненных в сводке, не больше FOLD_LIMIT
+за проход, и кладёт обновлённую сводку в общий кеш (settings.CACHES).
+Если сводки в кеше нет, задача собирает её заново из событий за
+REBUILD_HALF_LIVES периодов самого длинного окна, не больше
+REBUILD_LIMIT постов и комментариев. До первого прохода страница пуста,
+дальше отстаёт от базы не больше чем на период задачи. Комментарии,
+которые ещё ждут в очереди (posts/comment_queue.py), попадут в сводку
+после слива очереди.
+"""
+import time
+from datetime import timedelta
+from heapq import merge
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Comment, Post
+
+TRENDING_WINDOWS = {
+    'hour': 60 * 60,
+    'day': 60 * 60 * 24,
+}
+DEFAULT_WINDOW = 'day'
+TRENDING_CAPACITY = 200
+TRENDING_TOP = 10
+POST_WEIGHT = 3
+COMMENT_WEIGHT = 1
+
+STATE_KEY = 'trending:state'
+LOCK_KEY = 'trending:lock'
+LOCK_TIMEOUT = 60
+FOLD_LIMIT = 5000
+REBUILD_HALF_LIVES = 4
+REBUILD_LIMIT = 5000
+
+
+def decayed(value, updated, now, window):
+    """Значение счётчика на момент now при периоде полураспада window."""
+    return value * 0.5 ** ((now - updated) / window)
+
+
+class DecayedSpaceSaving:
+    """Затухающие счётчики с ограниченной ёмкостью."""
+
+    def __init__(self, window, capacity=TRENDING_CAPACITY):
+        self.window = window
+        self.capacity = capacity
+        self.counters = {}
+
+    def add(self, key, weight, now):
+        counters = self.counters
+        if key in counters:
+            value, updated = counters[key]
+            counters[key] = (decayed(value, updated, now, self.window)
+                             + weight, now)
+            return
+        if len(counters) >= self.capacity:
+            weakest = min(counters, key=lambda item: decayed(
+                *counters[item], now, self.window
+            ))
+            value, updated = counters.pop(weakest)
+            weight += decayed(value, updated, now, self.window)
+        counters[key] = (weight, now)
+
+    def top(self, count, now):
+        scores = {key: decayed(value, updated, now, self.window)
+                  for key, (value, updated) in self.counters.items()}
+        return sorted(scores, key=lambda key: (-scores[key], key))[:count]
+
+
+def new_summaries():
+    return {
+        window: {
+            'posts': DecayedSpaceSaving(length),
+            'groups': DecayedSpaceSaving(length),
+            'top': {'posts': [], 'groups': []},
+        }
+        for window, length in TRENDING_WINDOWS.items()
+    }
+
+
+def apply_events(summaries, events):
+    for post_id, group_id, weight, now in events:
+        for summary in summaries.values():
+            summary['posts'].add(post_id, weight, now)
+            if group_id is not None:
+                summary['groups'].add(group_id, weight, now)
+    now = time.time()
+    for summary in summaries.values():
+        summary['top'] = {
+            kind: summary[kind].top(TRENDING_TOP, now)
+            for kind in ('posts', 'groups')
+        }
+
+
+def merged_events(posts, comments):
+    """События из строк (момент, id поста, id группы) по возрастанию
+    времени."""
+    rows = merge(
+        [(moment, post_id, group_id, POST_WEIGHT)
+         for moment, post_id, group_id in posts],
+        [(moment, post_id, group_id, COMMENT_WEIGHT)
+         for moment, post_id, group_id in comments],
+    )
+    for moment, post_id, group_id, weight in rows:
+        yield post_id, group_id, weight, moment.timestamp()
+
+
+def rebuild():
+    """Сводка заново из постов и комментариев в базе."""
+    since = timezone.now() - timedelta(
+        seconds=REBUILD_HALF_LIVES * max(TRENDING_WINDOWS.values())
+    )
+    last_post = Post.objects.order_by('-id').values_list(
+        'id', flat=True).first() or 0
+    last_comment = Comment.objects.order_by('-id').values_list(
+        'id', flat=True).first() or 0
+    posts = (Post.objects.filter(pub_date__gte=since, id__lte=last_post)
+             .order_by('-pub_date')
+             .values_list('pub_date', 'id', 'group_id')[:REBUILD_LIMIT])
+    comments = (Comment.objects
+                .filter(created__gte=since, id__lte=last_comment)
+                .order_by('-created')
+                .values_list('created', 'post_id', 'post__group_id')
+                [:REBUILD_LIMIT])
+    summaries = new_summaries()
+    apply_events(summaries, merged_events(reversed(posts),
+                                          reversed(comments)))
+    return {'last_post': last_post, 'last_comment': last_comment,
+            'windows': summaries}
+
+
+def fold(state):
+    """Добавляет в сводку посты и комментарии, появившиеся после неё."""
+    posts = list(Post.objects.filter(id__gt=state['last_post'])
+                 .order_by('id')
+                 .values_list('pub_date', 'id', 'group_id')[:FOLD_LIMIT])
+    comments = list(Comment.objects.filter(id__gt=state['last_comment'])
+                    .order_by('id')
+                    .values_list('created', 'post_id', 'post__group_id',
+                                 'id')[:FOLD_LIMIT])
+    if not posts and not comments:
+        return False
+    if posts:
+        state['last_post'] = posts[-1][1]
+    if comments:
+        state['last_comment'] = comments[-1][3]
+    apply_events(state['windows'], merged_events(
+        sorted(posts), sorted(row[:3] for row in comments)
+    ))
+    return True
+
+
+def refresh():
+    """Проход периодической задачи: догоняет сводку по базе или собирает
+    её заново. Если предыдущий проход ещё идёт, ничего не делает."""
+    if not cache.add(LOCK_KEY, 1, timeout=LOCK_TIMEOUT):
+        return False
+    try:
+        state = cache.get(STATE_KEY)
+        if state is None:
+            state = rebuild()
+        elif not fold(state):
+            return False
+        cache.set(STATE_KEY, state, timeout=None)
+        return True
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def top(window=DEFAULT_WINDOW):
+    """Готовые списки id: {'posts': [...], 'groups': [...]}. Отдаёт
+    последнюю сводку задачи и в базу не ходит."""
+    state = cache.get(STATE_KEY)
+    if state is None or window not in state['windows']:
+        return {'posts': [], 'groups': []}
+    return state['windows'][window]['top']
@@ -0,0 +1,137 @@
+"""Счётчики новых постов в ленте подписок.
+
+Считать их запросом Follow JOIN Post на каждой странице дорого, поэтому
+счётчик ведётся по частям в общем кеше:
+
+- отметка просмотра: id самого нового поста подписок, который был на
+  момент последнего открытия ленты подписок (FollowIndexView);
+- номер последнего поста каждого автора - его id: AUTOINCREMENT
+  не выдаёт id повторно, так что id растут вместе со временем;
+- сам счётчик живёт UNREAD_TIMEOUT секунд. Новый пост после коммита
+  сразу обновляет номер автора, а счётчики тех его подписчиков, у кого
+  они уже есть и кто этот пост ещё не видел, увеличивает задача
+  bump_unread в очереди core.jobs: у автора могут быть тысячи
+  подписчиков, и запрос, создавший пост, их не ждёт. Задача ставится
+  в одной транзакции с постом. Остальные счётчики пересчитываются при
+  следующем чтении. Пересчёт без запроса
+  знает ответ 0, если ни у одного автора из подписок номер последнего
+  поста не больше отметки, а иначе считает не больше UNREAD_MAX + 1
+  постов только этих авторов.
+
+Удалённые посты и гонки отметки с новым постом не исправляются сразу:
+счётчик может ошибиться, но не дольше UNREAD_TIMEOUT. Изменение подписок
+сбрасывает счётчик пользователя.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from . import follow_cache
+from .models import Follow, Post
+
+UNREAD_MAX = 99
+UNREAD_TIMEOUT = 10 * 60
+LATEST_TIMEOUT = 24 * 60 * 60
+SEEN_KEY = 'unread:seen:{}'
+COUNT_KEY = 'unread:count:{}'
+LATEST_KEY = 'unread:latest:{}'
+
+
+def latest(author_ids):
+    """author_id -> id последнего поста автора (0, если постов нет)."""
+    keys = {LATEST_KEY.format(author_id): author_id
+            for author_id in author_ids}
+    result = {keys[key]: value
+              for key, value in cache.get_many(keys).items()}
+    missing = set(author_ids) - set(result)
+    if missing:
+        rows = dict(Post.objects.filter(author_id__in=missing).order_by()
+                    .values('author_id').annotate(last_id=Max('id'))
+                    .values_list('author_id', 'last_id'))
+        for author_id in missing:
+            result[author_id] = rows.get(author_id, 0)
+            # add, а не set: номер из свежего поста важнее прочитанного
+            cache.add(LATEST_KEY.format(author_id), result[author_id],
+                      LATEST_TIMEOUT)
+    return result
+
+
+def newest(user_id):
+    """id самого нового поста авторов из подписок user_id и номера
+    последних постов этих авторов."""
+    sequences = latest(follow_cache.following([user_id])[user_id])
+    return max(sequences.values(), default=0), sequences
+
+
+def mark_seen(user_id):
+    """Лента подписок просмотрена: новых постов больше нет."""
+    seen, _ = newest(user_id)
+    cache.set(SEEN_KEY.format(user_id), seen, timeout=None)
+    cache.set(COUNT_KEY.format(user_id), 0, UNREAD_TIMEOUT)
+
+
+def recount(user_id):
+    top, sequences = newest(user_id)
+    seen = cache.get(SEEN_KEY.format(user_id))
+    if seen is None:
+        # ленту подписок ещё не открывали (или отметка вытеснена из
+        # кеша): новым считается только то, что выйдет дальше
+        cache.set(SEEN_KEY.format(user_id), top, timeout=None)
+        return 0
+    authors = [author_id for author_id, sequence in sequences.items()
+               if sequence > seen]
+    if not authors:
+        return 0
+    return (Post.objects.filter(author_id__in=authors, id__gt=seen)
+            .order_by()[:UNREAD_MAX + 1].count())
+
+
+def count(user_id):
+    """Число новых постов в ленте подписок; больше UNREAD_MAX не
+    считается."""
+    value = cache.get(COUNT_KEY.format(user_id))
+    if value is None:
+        value = recount(user_id)
+        cache.add(COUNT_KEY.format(user_id), value, UNREAD_TIMEOUT)
+    return min(value, UNREAD_MAX + 1)
+
+
+def label(value):
+    return '{}+'.format(UNREAD_MAX) if value > UNREAD_MAX else str(value)
+
+
+def bump(author_id, post_id):
+    """Новый пост: счётчики подписчиков автора, у которых они сейчас
+    есть и чья отметка просмотра старше поста. Выполняется задачей
+    posts.tasks.bump_unread."""
+    followers = list(Follow.objects.filter(author_id=author_id)
+                     .values_list('user_id', flat=True))
+    counts = cache.get_many([COUNT_KEY.format(user_id)
+                             for user_id in followers])
+    seen = cache.get_many([SEEN_KEY.format(user_id)
+                           for user_id in followers])
+    for user_id in followers:
+        key = COUNT_KEY.format(user_id)
+        if key not in counts or seen.get(SEEN_KEY.format(user_id),
+                                         0) >= post_id:
+            continue
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+
+
+def post_created(post):
+    from .tasks import bump_unread
+
+    author_id, post_id = post.author_id, post.id
+    transaction.on_commit(lambda: cache.set(LATEST_KEY.format(author_id),
+                                            post_id, LATEST_TIMEOUT))
+    bump_unread.delay(author_id, post_id)
+
+
+def invalidate_on_commit(user_ids):
+    """Подписки изменились: счётчики пересчитаются при чтении."""
+    keys = [COUNT_KEY.format(user_id) for user_id in set(user_ids)]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -16,6 +16,9 @@ urlpatterns = [
     path('posts/<int:post_id>/comment/', views.AddCommentView.as_view(),
          name='add_comment'),
     path('follow/', views.FollowIndexView.as_view(), name='follow_index'),
+    path('follow/unread/', views.FollowUnreadView.as_view(),
+         name='follow_unread'),
+    path('trending/', views.TrendingView.as_view(), name='trending'),
     path(
         'profile/<str:username>/follow/',
         views.ProfileFollowView.as_view(),
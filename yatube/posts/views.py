@@ -1,35 +1,76 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404, redirect
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import redirect
 from django.urls import reverse
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.views.decorators.cache import cache_page
+from django.views.decorators.cache import never_cache
 from django.views.generic import (ListView,
                                   DetailView,
                                   CreateView,
+                                  TemplateView,
                                   UpdateView,
                                   )
 
+from core import object_cache
+from core.jobs import enqueue
+from core.tracing import traced_view
+from core.view_cache import cache_view
+
+from . import comment_queue, feed_ids, follow_cache, trending, unread
+from .cards import CardFeed, cards_by_id
+from .follows import follow
 from .models import Group, Post, User, Follow, Comment
 from .forms import CommentForm
+from .hot import hot_queryset
+from .suggestions import suggestions_for
+from .tasks import make_thumbnail
 
 POST_DISPLAY = 10
 
 
-@method_decorator(cache_page(20, key_prefix='index_page'), name='dispatch')
-class IndexView(ListView):
+class PostsTemplateEngineMixin:
+    """Рендерит ленту движком из настройки POSTS_TEMPLATE_ENGINE."""
+
+    @property
+    def template_engine(self):
+        return settings.POSTS_TEMPLATE_ENGINE
+
+
+@traced_view
+@method_decorator(cache_view(20, key_prefix='index_page'), name='dispatch')
+class IndexView(PostsTemplateEngineMixin, ListView):
     template_name = 'posts/index.html'
-    queryset = Post.objects.select_related('author', 'group')
     paginate_by = POST_DISPLAY
 
+    def get_queryset(self):
+        if self.request.GET.get('mode') == 'hot':
+            return CardFeed(hot_queryset())
+        return CardFeed(feed_ids.RingFeed(feed_ids.index_key(),
+                                          Post.objects.all()))
 
-class GroupPostsView(ListView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['index'] = True
+        context['hot'] = self.request.GET.get('mode') == 'hot'
+        if context['hot']:
+            context['page_query'] = 'mode=hot&'
+        return context
+
+
+@traced_view
+class GroupPostsView(PostsTemplateEngineMixin, ListView):
     template_name = 'posts/group_list.html'
     paginate_by = POST_DISPLAY
 
     def get_queryset(self):
-        self.group = get_object_or_404(Group, slug=self.kwargs['slug'])
-        return self.group.posts.select_related('author')
+        self.group = object_cache.get_object_or_404(
+            Group, slug=self.kwargs['slug']
+        )
+        return CardFeed(feed_ids.RingFeed(feed_ids.group_key(self.group.id),
+                                          self.group.posts.all()))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -37,37 +78,63 @@ class GroupPostsView(ListView):
         return context
 
 
-class ProfileView(ListView):
+@traced_view
+class ProfileView(PostsTemplateEngineMixin, ListView):
     template_name = 'posts/profile.html'
     paginate_by = POST_DISPLAY
 
     def get_queryset(self):
-        self.author = get_object_or_404(User, username=self.kwargs['username'])
-        return self.author.posts.select_related('group')
+        self.author = object_cache.get_object_or_404(
+            User, username=self.kwargs['username']
+        )
+        return CardFeed(feed_ids.RingFeed(feed_ids.author_key(self.author.id),
+                                          self.author.posts.all()))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['hide_author'] = True
         context['author'] = self.author
-        context['following'] = Follow.objects.filter(user=self.request.user.id,
-                                                     author=self.author.id,
-                                                     ).exists()
+        context['following'] = follow_cache.is_following(
+            self.request.user.id, self.author.id
+        )
+        context['follows_you'] = follow_cache.is_following(
+            self.author.id, self.request.user.id
+        )
+        context['suggestions'] = suggestions_for(self.request.user)
         return context
 
 
+@traced_view
 class PostDetailView(DetailView):
     model = Post
     pk_url_kwarg = 'post_id'
     context_object_name = 'post'
     template_name = 'posts/post_detail.html'
 
+    def get_object(self, queryset=None):
+        post = object_cache.get_object_or_404(Post, pk=self.kwargs['post_id'])
+        return object_cache.hydrate([post], 'author', 'group')[0]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = CommentForm()
-        context['comments'] = self.object.comments.select_related('author')
+        context['comments'] = (self.object.comments.select_related('author')
+                               .cached())
+        pending = comment_queue.pending_for(self.object, self.request.user)
+        if pending:
+            context['comments'] = list(context['comments']) + pending
         return context
 
 
+def enqueue_thumbnail(form, post):
+    """Превью новой картинки нарезает воркер, а не первый просмотр.
+    Вызывается в одной транзакции с сохранением поста."""
+    if 'image' in form.changed_data and post.image:
+        enqueue(make_thumbnail, [post.id],
+                dedup_key='thumbnail:{}'.format(post.id))
+
+
+@traced_view
 class PostCreateView(LoginRequiredMixin, CreateView):
     model = Post
     fields = ('text', 'group', 'image')
@@ -78,9 +145,13 @@ class PostCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        with transaction.atomic():
+            response = super().form_valid(form)
+            enqueue_thumbnail(form, self.object)
+        return response
 
 
+@traced_view
 class PostEditView(LoginRequiredMixin, UpdateView):
     model = Post
     fields = ('text', 'group', 'image')
@@ -88,17 +159,22 @@ class PostEditView(LoginRequiredMixin, UpdateView):
     pk_url_kwarg = 'post_id'
 
     def get(self, *args, **kwargs):
-        post = get_object_or_404(Post, id=self.kwargs['post_id'])
-        if self.request.user != post.author:
+        if not self.get_object().is_editable_by(self.request.user):
             return redirect('posts:post_detail', self.kwargs['post_id'])
         return super().get(self, *args, **kwargs)
 
+    def get_object(self, queryset=None):
+        return object_cache.get_object_or_404(Post, pk=self.kwargs['post_id'])
+
     def get_success_url(self):
         return reverse('posts:post_detail', args=[self.kwargs['post_id']])
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        with transaction.atomic():
+            response = super().form_valid(form)
+            enqueue_thumbnail(form, self.object)
+        return response
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -106,6 +182,7 @@ class PostEditView(LoginRequiredMixin, UpdateView):
         return context
 
 
+@traced_view
 class AddCommentView(LoginRequiredMixin, CreateView):
     model = Comment
     fields = ('text',)
@@ -117,39 +194,92 @@ class AddCommentView(LoginRequiredMixin, CreateView):
         return reverse('posts:post_detail', args=[self.kwargs['post_id']])
 
     def form_valid(self, form):
-        form.instance.post = get_object_or_404(Post, id=self.kwargs['post_id'])
+        form.instance.post = object_cache.get_object_or_404(
+            Post, pk=self.kwargs['post_id']
+        )
         form.instance.author = self.request.user
+        if comment_queue.enabled():
+            comment_queue.push(form.instance.post.id, self.request.user.id,
+                               form.instance.text)
+            return redirect(self.get_success_url())
         return super().form_valid(form)
 
 
-class FollowIndexView(LoginRequiredMixin, ListView):
+@traced_view
+class FollowIndexView(LoginRequiredMixin, PostsTemplateEngineMixin,
+                      ListView):
     template_name = 'posts/follow.html'
     paginate_by = POST_DISPLAY
 
     def get_queryset(self):
-        return (Post.objects.select_related('author', 'group')
-                .filter(author__following__user=self.request.user))
+        return CardFeed(Post.objects
+                        .filter(author__following__user=self.request.user)
+                        .cached())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['follow'] = True
+        context['suggestions'] = suggestions_for(self.request.user)
+        unread.mark_seen(self.request.user.id)
+        return context
+
+
+@traced_view
+@method_decorator(never_cache, name='dispatch')
+class FollowUnreadView(LoginRequiredMixin, View):
+    """Число новых постов в ленте подписок для значка в switcher.html:
+    главная кешируется общей для всех, поэтому значок заполняется
+    отдельным запросом."""
+
+    def get(self, request, *args, **kwargs):
+        count = unread.count(request.user.id)
+        return JsonResponse({'count': count, 'label': unread.label(count)})
+
+
+@traced_view
+class TrendingView(TemplateView):
+    template_name = 'posts/trending.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        window = self.request.GET.get('window')
+        if window not in trending.TRENDING_WINDOWS:
+            window = trending.DEFAULT_WINDOW
+        top = trending.top(window)
+        groups = object_cache.get_many(Group, top['groups'])
+        context['window'] = window
+        context['windows'] = trending.TRENDING_WINDOWS
+        context['posts'] = cards_by_id(top['posts'])
+        context['groups'] = [groups[pk] for pk in top['groups']
+                             if pk in groups]
+        return context
 
 
+@traced_view
 class ProfileFollowView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         return self.post(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
-        author = get_object_or_404(User, username=self.kwargs['username'])
+        author = object_cache.get_object_or_404(
+            User, username=self.kwargs['username']
+        )
         user = self.request.user
-        if author != user:
-            Follow.objects.get_or_create(user=user, author=author)
+        if Follow.can_follow(user, author):
+            follow(user, author)
         return redirect('posts:profile', username=self.kwargs['username'])
 
 
+@traced_view
 class ProfileUnfollowView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         return self.post(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
         user = self.request.user
-        author = get_object_or_404(User, username=self.kwargs['username'])
+        author = object_cache.get_object_or_404(
+            User, username=self.kwargs['username']
+        )
         Follow.objects.filter(
             user=user,
             author=author,
@@ -0,0 +1,64 @@
+"""Шаги прогрева приложения posts (см. core.warmup): первые страницы
+главной и самых больших групп и миниатюры их картинок."""
+import logging
+
+from django.conf import settings
+from django.db.models import Count
+from sorl.thumbnail import get_thumbnail
+
+from core import object_cache
+from core.warmup import step
+
+from . import feed_ids
+from .cards import cards_by_id
+from .hot import hot_queryset
+from .models import Group, Post
+from .tasks import THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS
+from .views import POST_DISPLAY
+
+logger = logging.getLogger(__name__)
+
+
+def first_pages():
+    """Ленты, первые страницы которых стоит прогреть: (ключ буфера,
+    queryset ленты)."""
+    yield feed_ids.index_key(), Post.objects.all()
+    groups = (Group.objects.annotate(posts_count=Count('posts'))
+              .order_by('-posts_count')[:settings.WARMUP_GROUPS])
+    for group in groups:
+        object_cache.get(Group, slug=group.slug)
+        yield feed_ids.group_key(group.id), group.posts.all()
+
+
+@step('feeds')
+def prime_feeds():
+    """Буферы id и карточки первых страниц лент, а заодно группы
+    в кеше объектов."""
+    primed = 0
+    for key, queryset in first_pages():
+        entry = feed_ids.load(key, queryset)
+        cards_by_id(entry['ids'][:POST_DISPLAY])
+        primed += 1
+    return primed
+
+
+@step('thumbnails')
+def prime_thumbnails():
+    """Миниатюры картинок постов с первых страниц лент и горячей ленты:
+    метаданные миниатюр ложатся в хранилище ключей sorl, и шаблону
+    остаётся только построить URL."""
+    ids = set(hot_queryset().values_list('id', flat=True)[:POST_DISPLAY])
+    for key, queryset in first_pages():
+        ids.update(feed_ids.load(key, queryset)['ids'][:POST_DISPLAY])
+    made = 0
+    for post in Post.objects.filter(pk__in=ids).exclude(image='').only(
+            'image'):
+        try:
+            get_thumbnail(post.image, THUMBNAIL_GEOMETRY,
+                          **THUMBNAIL_OPTIONS)
+        except Exception:
+            logger.warning('Thumbnail of post %s failed', post.pk,
+                           exc_info=True)
+            continue
+        made += 1
+    return made
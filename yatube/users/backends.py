@@ -0,0 +1,46 @@
+"""Загрузка пользователя из кеша.
+
+AuthenticationMiddleware на каждом запросе достаёт пользователя по id из
+сессии. CachedModelBackend сначала смотрит в кеш: объект хранится вместе
+с хешем пароля, так что django.contrib.auth.get_user по-прежнему сверяет
+хеш из сессии с get_session_auth_hash() и выкидывает сессии, открытые до
+смены пароля. Запись сбрасывается при любом сохранении или удалении
+пользователя (смена пароля, правка профиля) - см. users.signals.
+
+Сброс виден всем воркерам, только если кеш default общий для процессов
+(по умолчанию так и есть, иначе `manage.py check` выдаёт core.W001):
+с кешем в памяти процесса остальные воркеры ещё USER_CACHE_TIMEOUT
+пускали бы сессии, закрытые сменой пароля.
+
+CachedModelBackend - единственный бэкенд в AUTHENTICATION_BACKENDS, так
+что неудачный вход проверяет пароль один раз. Сессии, открытые до
+включения кеша, переводит на него users.middleware.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+USER_CACHE_TIMEOUT = 5 * 60
+
+
+def user_cache_key(user_id):
+    return 'auth:user:{}'.format(user_id)
+
+
+def invalidate_user(user_id):
+    """Сбрасывает запись сразу и ещё раз после коммита, чтобы параллельный
+    запрос не успел положить в кеш незакоммиченное старое состояние."""
+    key = user_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,22 @@
+from django.contrib.auth import BACKEND_SESSION_KEY
+
+LEGACY_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+CACHED_BACKEND = 'users.backends.CachedModelBackend'
+
+
+class LegacySessionBackendMiddleware:
+    """Переводит сессии, открытые до CachedModelBackend, на него.
+
+    Такие сессии помнят путь ModelBackend, а его нет в
+    AUTHENTICATION_BACKENDS: get_user не нашёл бы бэкенд сессии и
+    разлогинил пользователя. Путь переписывается один раз, при первом
+    запросе со старой сессией. Стоит перед AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.session.get(BACKEND_SESSION_KEY) == LEGACY_BACKEND:
+            request.session[BACKEND_SESSION_KEY] = CACHED_BACKEND
+        return self.get_response(request)
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.contrib.auth import BACKEND_SESSION_KEY, get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..backends import user_cache_key
+
+User = get_user_model()
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='Тестер',
+                                             password='old-password-1')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('about:author')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_repeat_request_skips_queries(self):
+        """Повторный запрос берёт сессию и пользователя из кеша."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_profile_edit_invalidates(self):
+        """Правка пользователя сбрасывает кеш, изменения видны сразу."""
+        self.client.get(self.url)
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.id)))
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['user'].first_name, 'Новое имя')
+
+    def test_password_change_logs_out_other_sessions(self):
+        """После смены пароля другие сессии не пускает даже кеш."""
+        other = Client()
+        other.force_login(self.user)
+        other.get(self.url)
+        response = self.client.post(reverse('users:password_change'), {
+            'old_password': 'old-password-1',
+            'new_password1': 'new-password-2',
+            'new_password2': 'new-password-2',
+        })
+        self.assertRedirects(response, reverse('users:password_change_done'))
+        self.assertTrue(
+            self.client.get(self.url).context['user'].is_authenticated
+        )
+        self.assertFalse(
+            other.get(self.url).context['user'].is_authenticated
+        )
+
+    def test_sessions_of_plain_backend_survive(self):
+        """Сессии, открытые через ModelBackend, не разлогиниваются."""
+        old = Client()
+        old.force_login(self.user)
+        session = old.session
+        session[BACKEND_SESSION_KEY] = (
+            'django.contrib.auth.backends.ModelBackend'
+        )
+        session.save()
+        self.assertTrue(old.get(self.url).context['user'].is_authenticated)
+        self.assertEqual(old.session[BACKEND_SESSION_KEY],
+                         'users.backends.CachedModelBackend')
+
+    def test_failed_login_checks_password_once(self):
+        """Неверный пароль проверяется одним бэкендом."""
+        with mock.patch('django.contrib.auth.base_user.check_password',
+                        return_value=False) as check:
+            response = self.client.post(reverse('users:login'), {
+                'username': self.user.username,
+                'password': 'wrong-password',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(check.call_count, 1)
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 
     # Default Django Apps
@@ -53,11 +54,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.tracing.TracingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.static.PrecompressedStaticMiddleware',
+    'core.middleware.identity_map.IdentityMapMiddleware',
+    'core.middleware.slow_queries.SlowQueryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'users.middleware.LegacySessionBackendMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.profiler.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,6 +90,22 @@ TEMPLATES = [
     },
 ]
 
+# Ленты постов (index, group_list, profile, follow) можно рендерить через
+# Jinja2: POSTS_TEMPLATE_ENGINE=jinja2 в окружении (нужен пакет Jinja2).
+# Шаблоны для него лежат в jinja2/.
+POSTS_TEMPLATE_ENGINE = os.environ.get('POSTS_TEMPLATE_ENGINE', 'django')
+JINJA2_TEMPLATES = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [os.path.join(BASE_DIR, 'jinja2')],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        'environment': 'core.jinja2.environment',
+        'context_processors': TEMPLATES[0]['OPTIONS']['context_processors'],
+    },
+}
+if POSTS_TEMPLATE_ENGINE == 'jinja2':
+    TEMPLATES.append(JINJA2_TEMPLATES)
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -137,13 +160,26 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+# сюда collectstatic складывает статику с хешами в именах и .gz/.br копиями
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+# хешированные файлы кешируются клиентом на год, остальные - на час
+STATIC_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+STATIC_DEFAULT_MAX_AGE = 60 * 60
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-#  подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# письма из запросов только ставятся в очередь (core/mail.py), а отправляет
+# их воркер `manage.py runworker` через движок filebased.EmailBackend
+EMAIL_BACKEND = 'core.mail.OutboxBackend'
+OUTBOX_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# писем за одно соединение, писем в секунду и попыток на письмо
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_RATE = 10
+OUTBOX_MAX_ATTEMPTS = 5
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
@@ -153,9 +189,113 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
+# отдачу медиа можно переложить на прокси: 'x-accel-redirect' для nginx
+# (internal location с префиксом MEDIA_ACCEL_PREFIX) или 'x-sendfile'
+MEDIA_ACCEL = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_MAX_AGE = 60 * 60 * 24
+MEDIA_BLOCK_SIZE = 64 * 1024
+
+# Отложенная запись комментариев: вместо INSERT на каждый комментарий
+# они копятся в локальной очереди и выгружаются пачками процессом
+# `manage.py flush_comments --loop` (см. posts/comment_queue.py).
+COMMENT_WRITE_BEHIND = False
+COMMENT_QUEUE_PATH = os.path.join(BASE_DIR, 'comment_queue.sqlite3')
+
+# Фоновые задачи (core/jobs.py) выполняет `manage.py runworker`.
+# Режим пула: 'thread', 'process' или 'sync' (в текущем потоке).
+JOB_WORKERS = 4
+JOB_WORKER_MODE = 'thread'
+JOB_POLL_INTERVAL = 1.0
+# на сколько секунд воркер арендует задачу (продлевается, пока работает)
+JOB_LEASE = 5 * 60
+JOB_MAX_ATTEMPTS = 5
+# задержка повтора удваивается с каждой попыткой, но не больше максимума
+JOB_RETRY_DELAY = 10
+JOB_RETRY_MAX_DELAY = 60 * 60
+# аренда лидера, который ставит в очередь периодические задачи
+JOB_LEADER_LEASE = 30
+JOB_KEEP_FINISHED = 60 * 60 * 24
+
+# Кеш двухуровневый: маленький L1 в памяти процесса (TinyLFU с бюджетом
+# в байтах, статистика по префиксам ключей - на странице /admin/cache/)
+# перед общим для процессов хоста L2 - файлом SQLite в режиме WAL
+# (core/cache.py). Инвалидации расходятся по процессам через журнал
+# изменений. На общий кеш полагаются токены версий, сбросы кешей,
+# блокировки, счётчики и сводки фоновых задач, поэтому кеш только в памяти
+# процесса по умолчанию не годится: воркеры gunicorn и runworker
+# разошлись бы. Путь к файлу кеша задаёт YATUBE_SHARED_CACHE.
+SHARED_CACHE_PATH = os.getenv('YATUBE_SHARED_CACHE',
+                              os.path.join(BASE_DIR, 'cache.sqlite3'))
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'L1': 'local',
+            'L2': 'shared',
+            'CHANGE_LOG': SHARED_CACHE_PATH + '.log',
+            'L1_TIMEOUT': 30,
+            'POLL_INTERVAL': 0.1,
+        },
+    },
+    'local': {
+        'BACKEND': 'core.cache.TinyLFUCache',
+        'OPTIONS': {
+            'MAX_BYTES': 8 * 1024 * 1024,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': SHARED_CACHE_PATH,
+        'OPTIONS': {
+            'MAX_BYTES': 64 * 1024 * 1024,
+        },
+    },
 }
+# `manage.py test` переносит файлы кеша во временный каталог
+TEST_RUNNER = 'core.test_runner.SharedCacheRunner'
+
+# страницы с cache_view (core/view_cache.py) после истечения ещё столько
+# секунд отдаются устаревшими, пока их пересчитывает фоновый поток
+VIEW_CACHE_STALE = 60
+VIEW_CACHE_BACKGROUND = True
+
+# сессии читаются из кеша и записываются в него и в базу
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# пользователь для AuthenticationMiddleware тоже берётся из кеша;
+# сессии, открытые до CachedModelBackend, переводит на него
+# users.middleware.LegacySessionBackendMiddleware
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CachedModelBackend',
+]
+
+# Профилирование запросов (core/profiler.py): сотрудник добавляет к URL
+# ?profile, остальные - заголовок X-Profile с токеном из
+# `manage.py profile_token`. Снимки смотреть на /admin/profiles/.
+PROFILER_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILER_KEEP = 100
+PROFILER_TOP = 50
+PROFILER_TOKEN_MAX_AGE = 60 * 60
+
+# Журнал медленных запросов (core/slow_queries.py): запросы дольше порога
+# пишутся в буфер процесса и в журнал, сводка - `manage.py slow_queries`.
+# None отключает замеры.
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_BUFFER = 200
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.log')
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+# значения параметров (хеши паролей, сессии) пишутся только для отладки,
+# иначе - только их типы
+SLOW_QUERY_LOG_PARAMS = False
+
+# Трассировка запросов (core/tracing.py): доля запросов, попадающих
+# в трассу, и файл, куда трассы пишутся строками OTLP JSON.
+TRACING_SAMPLE_RATE = 0.0
+TRACING_FILE = os.path.join(BASE_DIR, 'traces.jsonl')
+TRACING_FILE_MAX_BYTES = 50 * 1024 * 1024
+
+# Прогрев процесса (core/warmup.py, `manage.py warmup`): при
+# WARMUP_ON_START=1 в окружении каждый воркер прогревается при загрузке
+# yatube/wsgi.py. WARMUP_GROUPS - сколько самых больших групп прогревать.
+WARMUP_ON_START = os.getenv('WARMUP_ON_START') == '1'
+WARMUP_GROUPS = 10
@@ -14,23 +14,26 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.views import cache_stats, profile_detail, profiles, serve_media
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
+    path('admin/cache/', cache_stats, name='cache_stats'),
+    path('admin/profiles/', profiles, name='profiles'),
+    path('admin/profiles/<str:name>/', profile_detail,
+         name='profile_detail'),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    re_path(r'^{}(?P<path>.+)$'.format(settings.MEDIA_URL.lstrip('/')),
+            serve_media, name='media'),
 ]
 
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.csrf_failure'
 handler500 = 'core.views.internal_server_error'
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )